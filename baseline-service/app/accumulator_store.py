@@ -0,0 +1,418 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+from collections import Counter, defaultdict
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from app.recipient_sketch import HeavyHitterSketch, RecipientSketchConfig
+
+LOGGER = logging.getLogger(__name__)
+
+SCALAR_FIELDS = ("message_count", "weekend_messages", "attachment_messages")
+PARTICIPANT_SKETCH = ""
+
+
+@dataclass
+class SenderAccumulator:
+    known_participants: Counter[str] = field(default_factory=Counter)
+    participant_sketch: HeavyHitterSketch | None = None
+    known_external_domains: set[str] = field(default_factory=set)
+    hour_histogram: Counter[int] = field(default_factory=Counter)
+    weekend_messages: int = 0
+    message_count: int = 0
+    recipient_count_histogram: Counter[int] = field(default_factory=Counter)
+    attachment_messages: int = 0
+    attachment_types: Counter[str] = field(default_factory=Counter)
+    topic_histogram: Counter[str] = field(default_factory=Counter)
+    topic_recipient_counts: dict[str, Counter[str]] = field(default_factory=lambda: defaultdict(Counter))
+    topic_recipient_sketches: dict[str, HeavyHitterSketch] = field(default_factory=dict)
+    topic_external_domain_counts: dict[str, Counter[str]] = field(default_factory=lambda: defaultdict(Counter))
+    columnar_stats: dict[str, Any] | None = None
+
+    def add_participant(self, recipient: str, sketch_config: RecipientSketchConfig | None) -> None:
+        if self.participant_sketch is not None:
+            self.participant_sketch.add(recipient)
+            return
+        self.known_participants[recipient] += 1
+        if sketch_config is not None and len(self.known_participants) > sketch_config.exact_threshold:
+            self.participant_sketch = HeavyHitterSketch.from_counter(self.known_participants, sketch_config)
+            self.known_participants = Counter()
+
+    def participants(self) -> list[str]:
+        if self.participant_sketch is not None:
+            return sorted(self.participant_sketch.heavy_hitters())
+        return sorted(self.known_participants)
+
+    def sketches(self) -> Iterator[tuple[str, HeavyHitterSketch]]:
+        if self.participant_sketch is not None:
+            yield PARTICIPANT_SKETCH, self.participant_sketch
+        yield from self.topic_recipient_sketches.items()
+
+    def add_topic_recipient(self, topic: str, recipient: str, sketch_config: RecipientSketchConfig | None) -> None:
+        sketch = self.topic_recipient_sketches.get(topic)
+        if sketch is not None:
+            sketch.add(recipient)
+            return
+        counter = self.topic_recipient_counts[topic]
+        counter[recipient] += 1
+        if sketch_config is not None and len(counter) > sketch_config.exact_threshold:
+            self.topic_recipient_sketches[topic] = HeavyHitterSketch.from_counter(counter, sketch_config)
+            del self.topic_recipient_counts[topic]
+
+
+class AccumulatorStore:
+    def __init__(self, sender_ids: Iterable[str]) -> None:
+        self._sender_ids = list(sender_ids)
+        self._known = set(self._sender_ids)
+        self._accumulators: dict[str, SenderAccumulator] = {}
+
+    def __contains__(self, sender_id: object) -> bool:
+        return sender_id in self._known
+
+    def __getitem__(self, sender_id: str) -> SenderAccumulator:
+        if sender_id not in self._known:
+            raise KeyError(sender_id)
+        accumulator = self._accumulators.get(sender_id)
+        if accumulator is None:
+            accumulator = SenderAccumulator()
+            self._accumulators[sender_id] = accumulator
+        return accumulator
+
+    def record_updates(self, count: int) -> None:
+        return None
+
+    def items(self) -> Iterator[tuple[str, SenderAccumulator]]:
+        for sender_id in self._sender_ids:
+            yield sender_id, self._accumulators.get(sender_id) or SenderAccumulator()
+
+    def close(self) -> None:
+        self._accumulators.clear()
+
+
+class SpillingAccumulatorStore(AccumulatorStore):
+    def __init__(
+        self,
+        sender_ids: Iterable[str],
+        spill_dir: Path,
+        memory_budget: int = 500_000,
+        sketch_config: RecipientSketchConfig | None = None,
+    ) -> None:
+        super().__init__(sender_ids)
+        self.memory_budget = max(memory_budget, 1)
+        self.sketch_config = sketch_config
+        self.flush_count = 0
+        self._buffered_updates = 0
+        spill_dir.mkdir(parents=True, exist_ok=True)
+        handle, raw_path = tempfile.mkstemp(prefix="accumulators-", suffix=".sqlite", dir=spill_dir)
+        os.close(handle)
+        self.path = Path(raw_path)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=OFF")
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.execute(
+            """
+            CREATE TABLE counters (
+                sender_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                topic TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value INTEGER NOT NULL,
+                PRIMARY KEY (sender_id, kind, topic, key)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE sketches (
+                sender_id TEXT NOT NULL,
+                topic TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                PRIMARY KEY (sender_id, topic)
+            ) WITHOUT ROWID
+            """
+        )
+
+    def record_updates(self, count: int) -> None:
+        self._buffered_updates += count
+        if self._buffered_updates >= self.memory_budget:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._accumulators:
+            self._buffered_updates = 0
+            return
+        with self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO counters (sender_id, kind, topic, key, value) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (sender_id, kind, topic, key) DO UPDATE SET value = value + excluded.value
+                """,
+                (row for sender_id, accumulator in self._accumulators.items() for row in _counter_rows(sender_id, accumulator)),
+            )
+            for sender_id, accumulator in self._accumulators.items():
+                for topic, sketch in accumulator.sketches():
+                    self._merge_sketch(sender_id, topic, sketch)
+        self.flush_count += 1
+        LOGGER.info("Spilled %d sender accumulators (%d updates) to %s", len(self._accumulators), self._buffered_updates, self.path)
+        self._accumulators.clear()
+        self._buffered_updates = 0
+
+    def items(self) -> Iterator[tuple[str, SenderAccumulator]]:
+        self.flush()
+        for sender_id in self._sender_ids:
+            yield sender_id, self._load(sender_id)
+
+    def close(self) -> None:
+        self._accumulators.clear()
+        self._conn.close()
+        self.path.unlink(missing_ok=True)
+
+    def _merge_sketch(self, sender_id: str, topic: str, sketch: HeavyHitterSketch) -> None:
+        row = self._conn.execute(
+            "SELECT payload FROM sketches WHERE sender_id = ? AND topic = ?",
+            (sender_id, topic),
+        ).fetchone()
+        if row is not None:
+            stored = _sketch_from_json(row[0])
+            stored.merge(sketch)
+            sketch = stored
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sketches (sender_id, topic, payload) VALUES (?, ?, ?)",
+            (sender_id, topic, _sketch_to_json(sketch)),
+        )
+
+    def _load(self, sender_id: str) -> SenderAccumulator:
+        accumulator = SenderAccumulator()
+        rows = self._conn.execute(
+            "SELECT kind, topic, key, value FROM counters WHERE sender_id = ?",
+            (sender_id,),
+        )
+        for kind, topic, key, value in rows:
+            _apply_counter_row(accumulator, kind, topic, key, value)
+        for topic, payload in self._conn.execute("SELECT topic, payload FROM sketches WHERE sender_id = ?", (sender_id,)):
+            _fold_sketch(accumulator, topic, _sketch_from_json(payload))
+        _finish_accumulator(accumulator, self.sketch_config)
+        return accumulator
+
+
+class PartialAccumulatorFile:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            rows = self._conn.execute("SELECT key, value FROM meta").fetchall()
+        except sqlite3.DatabaseError:
+            self._conn.close()
+            raise ValueError(f"{path} is not a partial accumulator file") from None
+        self.meta: dict[str, Any] = {key: json.loads(value) for key, value in rows}
+
+    def fold_into(self, accumulator: SenderAccumulator, window: int, sender_id: str) -> None:
+        rows = self._conn.execute(
+            "SELECT kind, topic, key, value FROM counters WHERE window = ? AND sender_id = ?",
+            (window, sender_id),
+        )
+        for kind, topic, key, value in rows:
+            _apply_counter_row(accumulator, kind, topic, key, value)
+        sketches = self._conn.execute(
+            "SELECT topic, payload FROM sketches WHERE window = ? AND sender_id = ?",
+            (window, sender_id),
+        )
+        for topic, payload in sketches:
+            _fold_sketch(accumulator, topic, _sketch_from_json(payload))
+
+    def keyword_terms(self) -> Iterator[tuple[str, str, str, int]]:
+        yield from self._conn.execute("SELECT topic, term_type, term, occurrences FROM keyword_terms")
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class MergedAccumulatorStore(AccumulatorStore):
+    def __init__(
+        self,
+        sender_ids: Iterable[str],
+        partials: list[PartialAccumulatorFile],
+        window: int,
+        sketch_config: RecipientSketchConfig | None = None,
+    ) -> None:
+        super().__init__(sender_ids)
+        self.partials = partials
+        self.window = window
+        self.sketch_config = sketch_config
+
+    def items(self) -> Iterator[tuple[str, SenderAccumulator]]:
+        for sender_id in self._sender_ids:
+            accumulator = SenderAccumulator()
+            for partial in self.partials:
+                partial.fold_into(accumulator, self.window, sender_id)
+            _finish_accumulator(accumulator, self.sketch_config)
+            yield sender_id, accumulator
+
+
+def write_partial_accumulators(
+    path: Path,
+    stores: dict[int, AccumulatorStore],
+    meta: dict[str, Any],
+    keyword_terms: Iterable[tuple[str, str, str, int]],
+) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handle, raw_path = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    os.close(handle)
+    temp_path = Path(raw_path)
+    try:
+        conn = sqlite3.connect(temp_path)
+        try:
+            conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            conn.execute(
+                """
+                CREATE TABLE counters (
+                    window INTEGER NOT NULL,
+                    sender_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    topic TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value INTEGER NOT NULL,
+                    PRIMARY KEY (window, sender_id, kind, topic, key)
+                ) WITHOUT ROWID
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE sketches (
+                    window INTEGER NOT NULL,
+                    sender_id TEXT NOT NULL,
+                    topic TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    PRIMARY KEY (window, sender_id, topic)
+                ) WITHOUT ROWID
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE keyword_terms (
+                    topic TEXT NOT NULL,
+                    term_type TEXT NOT NULL,
+                    term TEXT NOT NULL,
+                    occurrences INTEGER NOT NULL,
+                    PRIMARY KEY (topic, term_type, term)
+                ) WITHOUT ROWID
+                """
+            )
+            with conn:
+                conn.executemany(
+                    "INSERT INTO meta (key, value) VALUES (?, ?)",
+                    ((key, json.dumps(value)) for key, value in meta.items()),
+                )
+                for window, store in stores.items():
+                    for sender_id, accumulator in store.items():
+                        conn.executemany(
+                            "INSERT INTO counters VALUES (?, ?, ?, ?, ?, ?)",
+                            ((window, *row) for row in _counter_rows(sender_id, accumulator) if row[4]),
+                        )
+                        conn.executemany(
+                            "INSERT INTO sketches VALUES (?, ?, ?, ?)",
+                            (
+                                (window, sender_id, topic, _sketch_to_json(sketch))
+                                for topic, sketch in accumulator.sketches()
+                            ),
+                        )
+                conn.executemany("INSERT INTO keyword_terms VALUES (?, ?, ?, ?)", keyword_terms)
+        finally:
+            conn.close()
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    finally:
+        temp_path.unlink(missing_ok=True)
+
+
+def _counter_rows(sender_id: str, accumulator: SenderAccumulator) -> Iterator[tuple[str, str, str, str, int]]:
+    for name in SCALAR_FIELDS:
+        yield sender_id, "scalar", "", name, int(getattr(accumulator, name))
+    for participant, count in accumulator.known_participants.items():
+        yield sender_id, "participant", "", participant, count
+    for domain in accumulator.known_external_domains:
+        yield sender_id, "external_domain", "", domain, 1
+    for hour, count in accumulator.hour_histogram.items():
+        yield sender_id, "hour", "", str(hour), count
+    for recipient_count, count in accumulator.recipient_count_histogram.items():
+        yield sender_id, "recipient_count", "", str(recipient_count), count
+    for kind, count in accumulator.attachment_types.items():
+        yield sender_id, "attachment_type", "", kind, count
+    for topic, count in accumulator.topic_histogram.items():
+        yield sender_id, "topic", "", topic, count
+    for topic, counter in accumulator.topic_recipient_counts.items():
+        for recipient, count in counter.items():
+            yield sender_id, "topic_recipient", topic, recipient, count
+    for topic, counter in accumulator.topic_external_domain_counts.items():
+        for domain, count in counter.items():
+            yield sender_id, "topic_external_domain", topic, domain, count
+
+
+def _apply_counter_row(accumulator: SenderAccumulator, kind: str, topic: str, key: str, value: int) -> None:
+    if kind == "scalar":
+        setattr(accumulator, key, getattr(accumulator, key) + int(value))
+    elif kind == "participant":
+        accumulator.known_participants[key] += value
+    elif kind == "external_domain":
+        accumulator.known_external_domains.add(key)
+    elif kind == "hour":
+        accumulator.hour_histogram[int(key)] += value
+    elif kind == "recipient_count":
+        accumulator.recipient_count_histogram[int(key)] += value
+    elif kind == "attachment_type":
+        accumulator.attachment_types[key] += value
+    elif kind == "topic":
+        accumulator.topic_histogram[key] += value
+    elif kind == "topic_recipient":
+        accumulator.topic_recipient_counts[topic][key] += value
+    elif kind == "topic_external_domain":
+        accumulator.topic_external_domain_counts[topic][key] += value
+
+
+def _fold_sketch(accumulator: SenderAccumulator, topic: str, sketch: HeavyHitterSketch) -> None:
+    if topic == PARTICIPANT_SKETCH:
+        if accumulator.participant_sketch is None:
+            accumulator.participant_sketch = sketch
+        else:
+            accumulator.participant_sketch.merge(sketch)
+        return
+    existing = accumulator.topic_recipient_sketches.get(topic)
+    if existing is None:
+        accumulator.topic_recipient_sketches[topic] = sketch
+    else:
+        existing.merge(sketch)
+
+
+def _finish_accumulator(accumulator: SenderAccumulator, sketch_config: RecipientSketchConfig | None) -> None:
+    if accumulator.participant_sketch is not None:
+        for participant, count in accumulator.known_participants.items():
+            accumulator.participant_sketch.add(participant, count)
+        accumulator.known_participants = Counter()
+    elif sketch_config is not None and len(accumulator.known_participants) > sketch_config.exact_threshold:
+        accumulator.participant_sketch = HeavyHitterSketch.from_counter(accumulator.known_participants, sketch_config)
+        accumulator.known_participants = Counter()
+    for topic, sketch in accumulator.topic_recipient_sketches.items():
+        for recipient, count in accumulator.topic_recipient_counts.pop(topic, Counter()).items():
+            sketch.add(recipient, count)
+    if sketch_config is not None:
+        for topic in list(accumulator.topic_recipient_counts):
+            counter = accumulator.topic_recipient_counts[topic]
+            if len(counter) > sketch_config.exact_threshold:
+                accumulator.topic_recipient_sketches[topic] = HeavyHitterSketch.from_counter(counter, sketch_config)
+                del accumulator.topic_recipient_counts[topic]
+
+
+def _sketch_to_json(sketch: HeavyHitterSketch) -> str:
+    return json.dumps({"sketch": sketch.to_dict(), "heavy": sketch.heavy, "top_k": sketch.top_k}, separators=(",", ":"))
+
+
+def _sketch_from_json(raw: str) -> HeavyHitterSketch:
+    payload = json.loads(raw)
+    return HeavyHitterSketch.from_dict(payload["sketch"], payload["heavy"], int(payload["top_k"]))
@@ -1,20 +1,43 @@
 from __future__ import annotations
 
+import hashlib
 import json
 import logging
-from collections import Counter, defaultdict
-from dataclasses import dataclass, field
+import time
+import zlib
+from collections import Counter
+from collections.abc import Iterable
+from dataclasses import dataclass
 from datetime import UTC, datetime, timedelta
+from fractions import Fraction
+from math import sqrt
 from pathlib import Path
-from statistics import pstdev
 from typing import Any
 
+from app.accumulator_store import (
+    AccumulatorStore,
+    MergedAccumulatorStore,
+    PartialAccumulatorFile,
+    SenderAccumulator,
+    SpillingAccumulatorStore,
+    write_partial_accumulators,
+)
+from app.baseline_writer import IndexedBaselineWriter, JsonBaselineWriter
+from app.build_metrics import BuildMetrics
+from app.columnar_stats import ATTACHMENT_KINDS, RARE_TOPIC_SHARE, MessageColumns, columnar_available
+from app.feature_cache import FeatureCacheReader, FeatureCacheWriter, MessageFeatures
 from app.graph_client import GraphClient
-from app.keyword_miner import KeywordMinerClient
-from app.topic_classifier import classify_topic
+from app.keyword_cache import TERM_TYPES, KeywordCountCache, TermCounts, attribute_counts, content_hash
+from app.keyword_miner import KEYWORD_ENGINES, KeywordMinerClient, KeywordMiningPool, approx_tokens
+from app.keyword_store import KeywordStatsStore, keyword_store_path
+from app.local_keyword_miner import LocalKeywordMiner
+from app.recipient_sketch import RecipientSketchConfig
+from app.review_journal import ReviewJournal, review_journal_path
+from app.topic_classifier import TopicRules, classify_topic, reload_topic_rules, topic_rules_path
 
 NOW_FIXED = datetime(2026, 2, 15, 0, 0, 0, tzinfo=UTC)
 COMPANY_DOMAIN = "company.com"
+OUTPUT_FORMATS = ("json", "indexed")
 LOGGER = logging.getLogger(__name__)
 
 
@@ -24,21 +47,34 @@ class BuildStatus:
     users_processed: int = 0
     messages_processed: int = 0
     error: str | None = None
+    generation: int | None = None
+    topic_cache: dict[str, Any] | None = None
+    metrics: dict[str, Any] | None = None
 
 
-@dataclass
-class SenderAccumulator:
-    known_participants: set[str] = field(default_factory=set)
-    known_external_domains: set[str] = field(default_factory=set)
-    hour_histogram: Counter[int] = field(default_factory=Counter)
-    weekend_messages: int = 0
-    message_count: int = 0
-    recipient_counts: list[int] = field(default_factory=list)
-    attachment_messages: int = 0
-    attachment_types: Counter[str] = field(default_factory=Counter)
-    topic_histogram: Counter[str] = field(default_factory=Counter)
-    topic_recipient_counts: dict[str, Counter[str]] = field(default_factory=lambda: defaultdict(Counter))
-    topic_external_domain_counts: dict[str, Counter[str]] = field(default_factory=lambda: defaultdict(Counter))
+@dataclass(frozen=True)
+class ShardSpec:
+    index: int
+    count: int
+
+    @classmethod
+    def parse(cls, raw: str) -> ShardSpec:
+        index_raw, separator, count_raw = raw.partition("/")
+        if not separator or not index_raw.strip().isdigit() or not count_raw.strip().isdigit():
+            raise ValueError(f"Shard must look like i/N, got {raw!r}")
+        shard = cls(int(index_raw), int(count_raw))
+        if shard.count < 1 or shard.index >= shard.count:
+            raise ValueError(f"Shard index must be in 0..N-1, got {raw!r}")
+        return shard
+
+    def partial_name(self) -> str:
+        return f"partial-{self.index:03d}-of-{self.count:03d}.sqlite"
+
+    def owns(self, chat_id: str) -> bool:
+        return zlib.crc32(chat_id.encode("utf-8")) % self.count == self.index
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
 
 
 class BaselineBuilder:
@@ -50,34 +86,345 @@ class BaselineBuilder:
         keyword_miner: KeywordMinerClient | None = None,
         keyword_stats_path: Path | None = None,
         keyword_batch_size: int = 200,
+        recipient_sketch: RecipientSketchConfig | None = None,
+        spill_dir: Path | None = None,
+        spill_budget: int = 500_000,
+        output_indent: int | None = 2,
+        output_format: str = "json",
+        shard: ShardSpec | None = None,
+        feature_cache_path: Path | None = None,
+        columnar: bool = False,
+        metrics: BuildMetrics | None = None,
+        keyword_cache_path: Path | None = None,
+        keyword_cache_entries: int = 500_000,
     ) -> None:
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported baseline output format: {output_format}")
+        if keyword_miner is not None and keyword_miner.config.engine not in KEYWORD_ENGINES:
+            raise ValueError(f"Unsupported keyword miner engine: {keyword_miner.config.engine}")
         self.graph_client = graph_client
         self.output_path = output_path
         self.status = status
         self.keyword_miner = keyword_miner
         self.keyword_stats_path = keyword_stats_path or output_path.with_name("keyword_stats.json")
         self.keyword_batch_size = max(keyword_batch_size, 10)
+        self.keyword_cache_path = keyword_cache_path
+        self.keyword_cache_entries = keyword_cache_entries
+        self.recipient_sketch = recipient_sketch
+        self.spill_dir = spill_dir
+        self.spill_budget = spill_budget
+        self.output_indent = output_indent
+        self.output_format = output_format
+        self.shard = shard
+        self.feature_cache_path = feature_cache_path
+        self.columnar = columnar
+        self.metrics = metrics or BuildMetrics()
+        if isinstance(graph_client, GraphClient):
+            graph_client.metrics = self.metrics
+        if columnar and not columnar_available():
+            LOGGER.warning("numpy is not installed; using per-sender counters for finalize")
+            self.columnar = False
+        self._columns: dict[int, MessageColumns] | None = None
+        self._feature_cache: FeatureCacheWriter | None = None
+        self._term_deltas: Counter[tuple[str, str, str]] = Counter()
         self._keyword_buffer: list[str] = []
+        self._keyword_buffer_tokens = 0
+        self._keyword_pool: KeywordMiningPool | None = None
+        self._local_miner: LocalKeywordMiner | None = None
+        self._keyword_cache: KeywordCountCache | None = None
+        self._keyword_pending: dict[bytes, int] = {}
+        self._keyword_counts: Counter[str] = Counter()
+        self._window_message_counts: Counter[int] = Counter()
+        self._topic_rules: TopicRules | None = None
         self._topic_term_stats: dict[str, dict[str, dict[str, dict[str, int | bool]]]] = self._load_existing_keyword_stats()
 
-    async def build(self, days: int = 35) -> dict[str, Any]:
-        cutoff = NOW_FIXED - timedelta(days=days)
-        cutoff_iso = cutoff.isoformat().replace("+00:00", "Z")
-        LOGGER.info("Starting baseline build with cutoff=%s", cutoff_iso)
+    async def build(self, days: int = 35, windows: list[int] | None = None) -> dict[str, Any]:
+        window_days, cutoffs, cutoff_iso = _window_cutoffs(days, windows)
+        LOGGER.info("Starting baseline build with cutoff=%s windows=%s", cutoff_iso, window_days)
+        self._reset_status()
+
+        with self.metrics.phase("list_users"):
+            users = await self.graph_client.list_users()
+        users_by_id = {user.get("id"): user for user in users if isinstance(user, dict) and isinstance(user.get("id"), str)}
+
+        stores: dict[int, AccumulatorStore] = {}
+        try:
+            for window in window_days:
+                stores[window] = self._open_accumulator_store(users_by_id)
+            self._columns = self._open_columns(users_by_id, window_days)
+            if self.feature_cache_path is None:
+                await self._collect(users_by_id, stores, cutoffs, cutoff_iso)
+            else:
+                cache_meta = {
+                    "base_url": self.graph_client.base_url,
+                    "cutoff": cutoff_iso,
+                    "shard": str(self.shard) if self.shard is not None else None,
+                }
+                with FeatureCacheWriter(self.feature_cache_path, cache_meta, list(users_by_id.values())) as cache:
+                    self._feature_cache = cache
+                    await self._collect(users_by_id, stores, cutoffs, cutoff_iso)
+                LOGGER.info("Cached features of %d messages in %s", cache.row_count, self.feature_cache_path)
+            meta = self._emit(users_by_id, days, window_days, stores)
+        finally:
+            self._feature_cache = None
+            self._columns = None
+            for store in stores.values():
+                store.close()
+
+        if self.shard is None:
+            self._write_keyword_stats(window_days[-1])
+        self.status.state = "completed"
+        self._publish_metrics(finished=True)
+        LOGGER.info(
+            "Completed baseline build: users=%d messages=%d",
+            self.status.users_processed,
+            self.status.messages_processed,
+        )
+        return meta
+
+    def replay(self, cache_path: Path, days: int = 35, windows: list[int] | None = None) -> dict[str, Any]:
+        window_days, cutoffs, _ = _window_cutoffs(days, windows)
+        cache = self._open_feature_cache(cache_path, cutoffs[window_days[-1]])
+        LOGGER.info("Replaying baseline build from %s with windows=%s", cache_path, window_days)
+        self._reset_status()
+
+        users_by_id = {user["id"]: user for user in cache.users if isinstance(user, dict) and isinstance(user.get("id"), str)}
+        self.status.users_processed = len(users_by_id)
+        stores: dict[int, AccumulatorStore] = {}
+        try:
+            for window in window_days:
+                stores[window] = self._open_accumulator_store(users_by_id)
+            self._columns = self._open_columns(users_by_id, window_days)
+            for features, topic in cache.classified(self._topic_rules, metrics=self.metrics):
+                if features.sender_id in users_by_id:
+                    self._accumulate(features, stores, cutoffs, users_by_id, topic)
+                    self._publish_metrics()
+            meta = self._emit(
+                users_by_id,
+                days,
+                window_days,
+                stores,
+                {"base_url": cache.meta.get("base_url"), "replayed_from": cache_path.name},
+            )
+        finally:
+            self._columns = None
+            for store in stores.values():
+                store.close()
+
+        self.status.state = "completed"
+        self._publish_metrics(finished=True)
+        LOGGER.info("Completed baseline replay: users=%d messages=%d", len(users_by_id), self.status.messages_processed)
+        return meta
+
+    def rebuild_senders(
+        self,
+        cache_path: Path,
+        sender_ids: list[str],
+        days: int,
+        windows: list[int] | None = None,
+    ) -> dict[str, dict[str, Any]]:
+        window_days, cutoffs, _ = _window_cutoffs(days, windows)
+        cache = self._open_feature_cache(cache_path, cutoffs[window_days[-1]])
+        users_by_id = {user["id"]: user for user in cache.users if isinstance(user, dict) and isinstance(user.get("id"), str)}
+        wanted = [sender_id for sender_id in sender_ids if sender_id in users_by_id]
+        self._topic_rules = reload_topic_rules()
+        stores: dict[int, AccumulatorStore] = {window: AccumulatorStore(wanted) for window in window_days}
+        for features, topic in cache.classified(self._topic_rules, metrics=self.metrics, sender_ids=set(wanted)):
+            self._accumulate(features, stores, cutoffs, users_by_id, topic)
+        extra_windows = [window for window in window_days if window != days]
+        return {
+            sender_id: self._user_payload(stats, {window: stores[window][sender_id] for window in extra_windows})
+            for sender_id, stats in stores[days].items()
+        }
+
+    def write_patched(
+        self,
+        meta: dict[str, Any],
+        users: Iterable[tuple[str, dict[str, Any]]],
+        replacements: dict[str, dict[str, Any]],
+    ) -> dict[str, Any]:
+        patched_meta = dict(meta)
+        patched_meta["generated_at"] = datetime.now(UTC).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+        with self._open_writer(patched_meta) as writer:
+            for user_id, payload in users:
+                writer.write_user(user_id, replacements.get(user_id, payload))
+        LOGGER.info("Republished baseline with %d updated users to %s", len(replacements), self.output_path)
+        return patched_meta
+
+    def merge(self, partial_paths: list[Path]) -> dict[str, Any]:
+        self.status.state = "running"
+        self.status.error = None
+        self.metrics.start()
+        partials = [PartialAccumulatorFile(path) for path in partial_paths]
+        try:
+            first = _validate_partials(partials)
+            days = int(first["days"])
+            window_days = [int(window) for window in first["windows"]]
+            users_by_id: dict[str, dict[str, Any]] = {user_id: {} for user_id in first["user_ids"]}
+            self._window_message_counts = Counter()
+            self.status.users_processed = len(users_by_id)
+            self.status.messages_processed = 0
+            if any(partial.meta.get("keyword_mining") for partial in partials):
+                self._reset_keyword_occurrences()
+            for partial in partials:
+                self.status.messages_processed += int(partial.meta["messages_processed"])
+                for window, count in partial.meta["message_counts"].items():
+                    self._window_message_counts[int(window)] += int(count)
+                for topic, term_type, term, occurrences in partial.keyword_terms():
+                    self._increment_term(topic, term_type, term, occurrences)
+
+            stores: dict[int, AccumulatorStore] = {
+                window: MergedAccumulatorStore(users_by_id, partials, window, self.recipient_sketch) for window in window_days
+            }
+            meta = self._emit(users_by_id, days, window_days, stores, {"base_url": first["base_url"], "shards": len(partials)})
+        finally:
+            for partial in partials:
+                partial.close()
 
+        self._write_keyword_stats(window_days[-1])
+        self.status.state = "completed"
+        self._publish_metrics(finished=True)
+        LOGGER.info("Merged %d baseline shards: users=%d messages=%d", len(partials), len(users_by_id), self.status.messages_processed)
+        return meta
+
+    def _open_feature_cache(self, cache_path: Path, cutoff: datetime) -> FeatureCacheReader:
+        cache = FeatureCacheReader(cache_path)
+        cached_cutoff = cache.meta.get("cutoff")
+        if not isinstance(cached_cutoff, str) or _parse_iso(cached_cutoff) > cutoff:
+            cutoff_iso = cutoff.isoformat().replace("+00:00", "Z")
+            raise ValueError(f"Feature cache {cache_path.name} starts at {cached_cutoff}, which does not cover {cutoff_iso}")
+        if cache.meta.get("shard") != (str(self.shard) if self.shard is not None else None):
+            raise ValueError(f"Feature cache {cache_path.name} was written for shard {cache.meta.get('shard')}")
+        return cache
+
+    def _reset_status(self) -> None:
         self.status.state = "running"
         self.status.users_processed = 0
         self.status.messages_processed = 0
         self.status.error = None
+        self._window_message_counts = Counter()
+        self._topic_rules = reload_topic_rules()
+        self.metrics.start()
 
-        users = await self.graph_client.list_users()
-        users_by_id = {user.get("id"): user for user in users if isinstance(user, dict) and isinstance(user.get("id"), str)}
+    def _emit(
+        self,
+        users_by_id: dict[str, dict[str, Any]],
+        days: int,
+        window_days: list[int],
+        stores: dict[int, AccumulatorStore],
+        extra_meta: dict[str, Any] | None = None,
+    ) -> dict[str, Any]:
+        if self.shard is not None:
+            return self._write_partial(users_by_id, days, stores)
+        meta = self._build_meta(users_by_id, days, window_days)
+        meta.update(extra_meta or {})
+        self._write_baseline(meta, days, stores)
+        return meta
+
+    def _write_partial(
+        self,
+        users_by_id: dict[str, dict[str, Any]],
+        days: int,
+        stores: dict[int, AccumulatorStore],
+    ) -> dict[str, Any]:
+        if self.shard is None:
+            raise RuntimeError("Partial output requires a shard")
+        meta = {
+            "shard": [self.shard.index, self.shard.count],
+            "base_url": self.graph_client.base_url,
+            "days": days,
+            "windows": sorted(stores),
+            "user_ids": list(users_by_id),
+            "messages_processed": self.status.messages_processed,
+            "message_counts": {str(window): self._window_message_counts[window] for window in sorted(stores)},
+            "keyword_mining": self._mining_enabled(),
+        }
+        terms = ((topic, term_type, term, count) for (topic, term_type, term), count in sorted(self._term_deltas.items()))
+        with self.metrics.phase("write"):
+            write_partial_accumulators(self.output_path, stores, meta, terms)
+        LOGGER.info(
+            "Wrote baseline shard %s to %s: messages=%d",
+            self.shard,
+            self.output_path,
+            self.status.messages_processed,
+        )
+        return meta
+
+    def _open_accumulator_store(self, users_by_id: dict[str, dict[str, Any]]) -> AccumulatorStore:
+        if self.spill_dir is None:
+            return AccumulatorStore(users_by_id)
+        return SpillingAccumulatorStore(
+            users_by_id,
+            self.spill_dir,
+            memory_budget=self.spill_budget,
+            sketch_config=self.recipient_sketch,
+        )
 
-        senders: dict[str, SenderAccumulator] = {user_id: SenderAccumulator() for user_id in users_by_id}
-        processed_message_ids: set[str] = set()
+    def _publish_metrics(self, finished: bool = False) -> None:
+        self.metrics.messages_processed = self.status.messages_processed
+        if finished:
+            self.metrics.finish()
+        else:
+            self.metrics.publish()
 
+    def _open_columns(self, users_by_id: dict[str, dict[str, Any]], window_days: list[int]) -> dict[int, MessageColumns] | None:
+        if not self.columnar or self.spill_dir is not None or self.shard is not None:
+            return None
+        return {window: MessageColumns(list(users_by_id)) for window in window_days}
+
+    async def _collect(
+        self,
+        users_by_id: dict[str, dict[str, Any]],
+        stores: dict[int, AccumulatorStore],
+        cutoffs: dict[int, datetime],
+        cutoff_iso: str,
+    ) -> None:
+        processed_message_ids: set[str] = set()
+        if self._mining_enabled():
+            self._reset_keyword_occurrences()
+            if self.keyword_miner.config.engine == "local":
+                self._local_miner = LocalKeywordMiner(top_terms=self.keyword_miner.config.local_top_terms)
+            else:
+                if self.keyword_cache_path is not None:
+                    self._keyword_cache = KeywordCountCache(self.keyword_cache_path, self.keyword_cache_entries)
+                self._keyword_pool = KeywordMiningPool(self.keyword_miner, self._merge_keyword_result)
+        try:
+            await self._collect_users(users_by_id, stores, cutoffs, cutoff_iso, processed_message_ids)
+            await self._flush_keyword_buffer()
+            if self._local_miner is not None:
+                with self.metrics.phase("keyword_mining"):
+                    merged = self._merge_term_counts(self._local_miner.result()["topics"])
+                self._keyword_counts["mined"] = self._local_miner.messages
+                LOGGER.info("Local keyword miner merged terms: %d from %d messages", merged, self._local_miner.messages)
+            if self._keyword_pool is not None:
+                with self.metrics.phase("keyword_mining"):
+                    await self._keyword_pool.drain()
+                LOGGER.info(
+                    "Keyword mining: %d messages from cache, %d sent to the miner",
+                    self._keyword_counts["cached"],
+                    self._keyword_counts["mined"],
+                )
+        finally:
+            self._local_miner = None
+            if self._keyword_pool is not None:
+                self._keyword_pool.cancel()
+                self._keyword_pool = None
+            if self._keyword_cache is not None:
+                self._keyword_cache.close()
+                self._keyword_cache = None
+            self._keyword_pending.clear()
+
+    async def _collect_users(
+        self,
+        users_by_id: dict[str, dict[str, Any]],
+        stores: dict[int, AccumulatorStore],
+        cutoffs: dict[int, datetime],
+        cutoff_iso: str,
+        processed_message_ids: set[str],
+    ) -> None:
         for user_id in users_by_id:
-            chats = await self.graph_client.list_user_chats(user_id)
+            with self.metrics.phase("list_chats"):
+                chats = await self.graph_client.list_user_chats(user_id)
             self.status.users_processed += 1
             LOGGER.info("Processing user %s (%d chats)", user_id, len(chats))
 
@@ -88,181 +435,270 @@ class BaselineBuilder:
                 members = chat.get("members", [])
                 if not isinstance(chat_id, str) or not isinstance(members, list):
                     continue
+                if self.shard is not None and not self.shard.owns(chat_id):
+                    continue
 
                 member_ids = [m.get("userId") for m in members if isinstance(m, dict) and isinstance(m.get("userId"), str)]
                 if not member_ids:
                     continue
 
-                messages = await self.graph_client.list_chat_messages_since(chat_id, cutoff_iso)
+                with self.metrics.phase("fetch_messages"):
+                    messages = await self.graph_client.list_chat_messages_since(chat_id, cutoff_iso)
                 for message in messages:
                     try:
-                        mining_text = self._process_message(message, member_ids, users_by_id, senders, processed_message_ids)
-                        if mining_text:
-                            await self._enqueue_for_keyword_mining(mining_text)
+                        mining = self._process_message(
+                            message, chat_id, member_ids, users_by_id, stores, cutoffs, processed_message_ids
+                        )
+                        if mining is not None:
+                            await self._enqueue_for_keyword_mining(*mining)
                     except Exception as exc:
                         LOGGER.warning("Skipping malformed message in chat %s: %s", chat_id, exc)
                         continue
-
-        await self._flush_keyword_buffer()
-        baseline = self._finalize(users_by_id, senders, days)
-        self.output_path.write_text(json.dumps(baseline, indent=2), encoding="utf-8")
-        self._write_keyword_stats(days)
-        self.status.state = "completed"
-        LOGGER.info(
-            "Completed baseline build: users=%d messages=%d",
-            self.status.users_processed,
-            self.status.messages_processed,
-        )
-        return baseline
+                self.metrics.flush_deferred_phases()
+                self._publish_metrics()
 
     def _process_message(
         self,
         message: dict[str, Any],
+        chat_id: str,
         member_ids: list[str],
         users_by_id: dict[str, dict[str, Any]],
-        senders: dict[str, SenderAccumulator],
+        stores: dict[int, AccumulatorStore],
+        cutoffs: dict[int, datetime],
         processed_message_ids: set[str],
-    ) -> str | None:
+    ) -> tuple[str, str] | None:
         message_id = message.get("id")
         if not isinstance(message_id, str):
             raise ValueError("Missing message id")
         if message_id in processed_message_ids:
             return None
 
-        from_user = message.get("from", {}).get("user", {})
-        sender_id = from_user.get("id")
-        if not isinstance(sender_id, str) or sender_id not in senders:
-            raise ValueError("Unknown sender")
-
-        created = _parse_iso(message.get("createdDateTime"))
-        attachments = message.get("attachments", [])
-        if not isinstance(attachments, list):
-            attachments = []
-        body_content = str(message.get("body", {}).get("content", ""))
-
-        recipients = [uid for uid in member_ids if uid != sender_id and uid in users_by_id]
-        recipient_count = len(recipients)
-
-        accumulator = senders[sender_id]
-        accumulator.message_count += 1
-        self.status.messages_processed += 1
-
-        accumulator.hour_histogram[created.hour] += 1
-        if created.weekday() >= 5:
-            accumulator.weekend_messages += 1
-        accumulator.recipient_counts.append(recipient_count)
-
-        attachment_kind = _detect_attachment_kind(attachments)
-        accumulator.attachment_types[attachment_kind] += 1
-        if attachments:
-            accumulator.attachment_messages += 1
-
-        attachment_names = [str(item.get("name", "")) for item in attachments if isinstance(item, dict)]
-        topic = classify_topic(body_content, attachment_names)
-        accumulator.topic_histogram[topic] += 1
-
-        for recipient in recipients:
-            accumulator.known_participants.add(recipient)
-            accumulator.topic_recipient_counts[topic][recipient] += 1
-
-            external_domain = _extract_external_domain(users_by_id[recipient])
-            if external_domain:
-                accumulator.known_external_domains.add(external_domain)
-                accumulator.topic_external_domain_counts[topic][external_domain] += 1
+        features = _extract_features(message, chat_id, member_ids, users_by_id)
+        topic = self._accumulate(features, stores, cutoffs, users_by_id)
+        if self._feature_cache is not None:
+            self._feature_cache.append(features)
 
         processed_message_ids.add(message_id)
-        if body_content or attachment_names:
-            return f"{body_content} {' '.join(attachment_names)}".strip()
+        if features.body or features.attachment_names:
+            return f"{features.body} {' '.join(features.attachment_names)}".strip(), topic
         return None
 
-    async def _enqueue_for_keyword_mining(self, text: str) -> None:
+    def _accumulate(
+        self,
+        features: MessageFeatures,
+        stores: dict[int, AccumulatorStore],
+        cutoffs: dict[int, datetime],
+        users_by_id: dict[str, dict[str, Any]],
+        topic: str | None = None,
+    ) -> str:
+        created = _parse_iso(features.created)
+        modified = datetime.fromtimestamp(features.modified, UTC)
+        recipient_count = len(features.recipient_ids)
+        if topic is None:
+            started = time.perf_counter()
+            topic = classify_topic(features.body, features.attachment_names, self._topic_rules)
+            self.metrics.defer_phase("classify", time.perf_counter() - started)
+        recipient_domains = [(recipient, _extract_external_domain(users_by_id[recipient])) for recipient in features.recipient_ids]
+
+        self.status.messages_processed += 1
+        for window, senders in stores.items():
+            if modified < cutoffs[window]:
+                continue
+            self._window_message_counts[window] += 1
+            accumulator = senders[features.sender_id]
+            if self._columns is not None:
+                self._columns[window].append(
+                    features.sender_id,
+                    created.hour,
+                    created.weekday(),
+                    recipient_count,
+                    features.attachment_kind,
+                    bool(features.attachment_names),
+                    topic,
+                )
+            else:
+                accumulator.message_count += 1
+                accumulator.hour_histogram[created.hour] += 1
+                if created.weekday() >= 5:
+                    accumulator.weekend_messages += 1
+                accumulator.recipient_count_histogram[recipient_count] += 1
+
+                accumulator.attachment_types[features.attachment_kind] += 1
+                if features.attachment_names:
+                    accumulator.attachment_messages += 1
+                accumulator.topic_histogram[topic] += 1
+
+            for recipient, external_domain in recipient_domains:
+                accumulator.add_participant(recipient, self.recipient_sketch)
+                accumulator.add_topic_recipient(topic, recipient, self.recipient_sketch)
+                if external_domain:
+                    accumulator.known_external_domains.add(external_domain)
+                    accumulator.topic_external_domain_counts[topic][external_domain] += 1
+            senders.record_updates(1 + recipient_count)
+        return topic
+
+    def _mining_enabled(self) -> bool:
         if self.keyword_miner is None:
-            return
+            return False
+        return self.keyword_miner.config.enabled or self.keyword_miner.config.engine == "local"
+
+    async def _enqueue_for_keyword_mining(self, text: str, topic: str) -> None:
         cleaned = text.strip()
         if not cleaned:
             return
+        if self._local_miner is not None:
+            started = time.perf_counter()
+            self._local_miner.add(topic, cleaned)
+            self.metrics.defer_phase("keyword_mining", time.perf_counter() - started)
+            return
+        if self._keyword_pool is None:
+            return
+        if self._keyword_cache is not None:
+            digest = content_hash(cleaned)
+            if digest in self._keyword_pending:
+                self._keyword_pending[digest] += 1
+                return
+            cached = self._keyword_cache.get(digest)
+            if cached is not None:
+                self._keyword_counts["cached"] += 1
+                self._merge_term_counts(cached)
+                return
+            self._keyword_pending[digest] = 1
         self._keyword_buffer.append(cleaned)
-        if len(self._keyword_buffer) >= self.keyword_batch_size:
+        self._keyword_buffer_tokens += approx_tokens(cleaned)
+        if (
+            self._keyword_buffer_tokens >= self.keyword_miner.token_budget
+            or len(self._keyword_buffer) >= self.keyword_batch_size
+        ):
             await self._flush_keyword_buffer()
 
     async def _flush_keyword_buffer(self) -> None:
-        if self.keyword_miner is None or not self._keyword_buffer:
+        if self._keyword_pool is None or not self._keyword_buffer:
             return
         batch = list(self._keyword_buffer)
         self._keyword_buffer.clear()
-        result = await self.keyword_miner.extract(batch)
+        self._keyword_buffer_tokens = 0
+        with self.metrics.phase("keyword_mining"):
+            await self._keyword_pool.submit(batch)
+
+    def _merge_keyword_result(self, batch: list[str], result: dict[str, dict[str, dict[str, int]]] | None) -> None:
+        if self._keyword_cache is None:
+            self._keyword_counts["mined"] += len(batch)
+            topics = result.get("topics") if result is not None else None
+            merged = self._merge_term_counts(topics) if isinstance(topics, dict) else 0
+            LOGGER.info("Keyword miner batch merged terms: %d from %d messages", merged, len(batch))
+            return
+        digests = [content_hash(text) for text in batch]
+        per_message = attribute_counts(batch, result or {})
+        if result is not None:
+            self._keyword_cache.put_many(zip(digests, per_message))
         merged = 0
-        for topic, payload in result.get("topics", {}).items():
-            keywords = payload.get("keywords", {})
-            phrases = payload.get("phrases", {})
-            if isinstance(keywords, dict):
-                for term, count in keywords.items():
-                    self._increment_term(topic, "keywords", str(term), int(count))
-                    merged += int(count)
-            if isinstance(phrases, dict):
-                for term, count in phrases.items():
-                    self._increment_term(topic, "phrases", str(term), int(count))
-                    merged += int(count)
+        for digest, counts in zip(digests, per_message):
+            copies = self._keyword_pending.pop(digest, 1)
+            self._keyword_counts["mined"] += copies
+            merged += self._merge_term_counts(counts, copies)
         LOGGER.info("Keyword miner batch merged terms: %d from %d messages", merged, len(batch))
 
-    def _finalize(
-        self,
-        users_by_id: dict[str, dict[str, Any]],
-        senders: dict[str, SenderAccumulator],
-        days: int,
-    ) -> dict[str, Any]:
-        users_payload: dict[str, dict[str, Any]] = {}
-
-        for sender_id, stats in senders.items():
-            total = stats.message_count
-            recipient_mean = _safe_mean(stats.recipient_counts)
-            recipient_std = float(pstdev(stats.recipient_counts)) if len(stats.recipient_counts) > 1 else 0.0
-
-            hour_hist = {str(hour): stats.hour_histogram.get(hour, 0) for hour in range(24)}
-            attachment_types = {
-                key: stats.attachment_types.get(key, 0)
-                for key in ["none", "link", "zip", "xlsx", "pdf", "other"]
+    def _merge_term_counts(self, counts: TermCounts, copies: int = 1) -> int:
+        merged = 0
+        for topic, payload in counts.items():
+            if not isinstance(payload, dict):
+                continue
+            for term_type in TERM_TYPES:
+                terms = payload.get(term_type, {})
+                if not isinstance(terms, dict):
+                    continue
+                for term, count in terms.items():
+                    self._increment_term(str(topic), term_type, str(term), int(count) * copies)
+                    merged += int(count) * copies
+        return merged
+
+    def _reset_keyword_occurrences(self) -> None:
+        for payload in self._topic_term_stats.values():
+            for term_type in ("keywords", "phrases"):
+                bucket = payload[term_type]
+                for term in list(bucket):
+                    if bucket[term]["ignored"] or bucket[term]["reasonForIgnore"]:
+                        bucket[term]["occurrences"] = 0
+                    else:
+                        del bucket[term]
+        self._term_deltas.clear()
+        self._keyword_counts.clear()
+
+    def _write_baseline(self, meta: dict[str, Any], days: int, stores: dict[int, AccumulatorStore]) -> None:
+        extra_windows = [window for window in stores if window != days]
+        started = time.perf_counter()
+        with self.metrics.phase("finalize"):
+            summaries = {window: columns.summarize() for window, columns in self._columns.items()} if self._columns else None
+        finalize_seconds = 0.0
+        with self._open_writer(meta) as writer:
+            iterators = [stores[window].items() for window in extra_windows]
+            for sender_id, stats in stores[days].items():
+                extra_stats = [next(iterator)[1] for iterator in iterators]
+                finalize_started = time.perf_counter()
+                if summaries is not None:
+                    stats.columnar_stats = summaries[days].sender_stats(sender_id)
+                    for window, window_stats in zip(extra_windows, extra_stats):
+                        window_stats.columnar_stats = summaries[window].sender_stats(sender_id)
+                payload = self._user_payload(stats, dict(zip(extra_windows, extra_stats)))
+                finalize_seconds += time.perf_counter() - finalize_started
+                writer.write_user(sender_id, payload)
+        self.metrics.add_phase("finalize", finalize_seconds)
+        self.metrics.add_phase("write", time.perf_counter() - started - finalize_seconds)
+
+    def _open_writer(self, meta: dict[str, Any]) -> JsonBaselineWriter | IndexedBaselineWriter:
+        if self.output_format == "indexed":
+            return IndexedBaselineWriter(self.output_path, meta)
+        return JsonBaselineWriter(self.output_path, meta, indent=self.output_indent)
+
+    def _user_payload(self, stats: SenderAccumulator, extra_windows: dict[int, SenderAccumulator]) -> dict[str, Any]:
+        user_payload = self._finalize_sender(stats)
+        if extra_windows:
+            user_payload["windows"] = {
+                str(window): self._finalize_sender(window_stats) for window, window_stats in extra_windows.items()
             }
-            topic_hist = dict(stats.topic_histogram)
-
-            rare_topics: list[str] = []
-            if total > 0:
-                for topic, count in stats.topic_histogram.items():
-                    if topic != "normal" and (count / total) < 0.02:
-                        rare_topics.append(topic)
-
-            users_payload[sender_id] = {
-                "known_participants": sorted(stats.known_participants),
-                "known_external_domains": sorted(stats.known_external_domains),
-                "hour_histogram": hour_hist,
-                "weekend_rate": _round(stats.weekend_messages / total if total else 0.0),
-                "recipient_mean": _round(recipient_mean),
-                "recipient_std": _round(recipient_std),
-                "attachment_rate": _round(stats.attachment_messages / total if total else 0.0),
-                "attachment_types": attachment_types,
-                "topic_histogram": topic_hist,
-                "rare_topics": sorted(rare_topics),
-                "topic_recipient_counts": {
-                    topic: dict(counter)
-                    for topic, counter in sorted(stats.topic_recipient_counts.items(), key=lambda item: item[0])
-                },
-                "topic_external_domain_counts": {
-                    topic: dict(counter)
-                    for topic, counter in sorted(stats.topic_external_domain_counts.items(), key=lambda item: item[0])
-                },
+        return user_payload
+
+    def _build_meta(self, users_by_id: dict[str, dict[str, Any]], days: int, window_days: list[int]) -> dict[str, Any]:
+        meta: dict[str, Any] = {
+            "base_url": self.graph_client.base_url,
+            "days": days,
+            "now_fixed": NOW_FIXED.isoformat().replace("+00:00", "Z"),
+            "generated_at": datetime.now(UTC).replace(microsecond=0).isoformat().replace("+00:00", "Z"),
+            "user_count": len(users_by_id),
+            "message_count": self._window_message_counts[days],
+        }
+        if len(window_days) > 1:
+            meta["windows"] = {
+                str(window): {"days": window, "message_count": self._window_message_counts[window]}
+                for window in window_days
             }
-
-        return {
-            "meta": {
-                "base_url": self.graph_client.base_url,
-                "days": days,
-                "now_fixed": NOW_FIXED.isoformat().replace("+00:00", "Z"),
-                "generated_at": datetime.now(UTC).replace(microsecond=0).isoformat().replace("+00:00", "Z"),
-                "user_count": len(users_by_id),
-                "message_count": self.status.messages_processed,
+        return meta
+
+    def _finalize_sender(self, stats: SenderAccumulator) -> dict[str, Any]:
+        counts = stats.columnar_stats or _counter_stats(stats)
+        user_payload: dict[str, Any] = {
+            "known_participants": stats.participants(),
+            "known_external_domains": sorted(stats.known_external_domains),
+            "hour_histogram": counts["hour_histogram"],
+            "weekend_rate": _round(counts["weekend_rate"]),
+            "recipient_mean": _round(counts["recipient_mean"]),
+            "recipient_std": _round(counts["recipient_std"]),
+            "attachment_rate": _round(counts["attachment_rate"]),
+            "attachment_types": counts["attachment_types"],
+            "topic_histogram": counts["topic_histogram"],
+            "rare_topics": counts["rare_topics"],
+            "topic_recipient_counts": _topic_recipient_counts_payload(stats),
+            "topic_external_domain_counts": {
+                topic: dict(counter)
+                for topic, counter in sorted(stats.topic_external_domain_counts.items(), key=lambda item: item[0])
             },
-            "users": users_payload,
         }
+        if self.recipient_sketch is not None:
+            user_payload["topic_recipient_sketches"] = {
+                topic: sketch.to_dict() for topic, sketch in sorted(stats.topic_recipient_sketches.items())
+            }
+        return user_payload
 
     def _write_keyword_stats(self, days: int) -> None:
         sorted_topics: dict[str, dict[str, dict[str, dict[str, int | bool]]]] = {}
@@ -284,33 +720,49 @@ class BaselineBuilder:
                 "days": days,
                 "message_count": self.status.messages_processed,
                 "batch_size": self.keyword_batch_size,
+                "token_budget": self.keyword_miner.token_budget if self.keyword_miner is not None else None,
+                "mined_messages": self._keyword_counts["mined"],
+                "cached_messages": self._keyword_counts["cached"],
             },
             "topics": sorted_topics,
         }
         self.keyword_stats_path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
 
     def _load_existing_keyword_stats(self) -> dict[str, dict[str, dict[str, dict[str, int | bool]]]]:
-        if not self.keyword_stats_path.exists():
-            return {}
+        parsed: dict[str, dict[str, dict[str, dict[str, int | bool]]]] = {}
         try:
             raw = json.loads(self.keyword_stats_path.read_text(encoding="utf-8"))
         except Exception:
-            return {}
-        topics = raw.get("topics", {})
-        if not isinstance(topics, dict):
-            return {}
-        parsed: dict[str, dict[str, dict[str, dict[str, int | bool]]]] = {}
-        for topic, payload in topics.items():
-            if not isinstance(topic, str) or not isinstance(payload, dict):
-                continue
-            keywords_raw = payload.get("keywords", {})
-            phrases_raw = payload.get("phrases", {})
-            parsed[topic] = {
-                "keywords": _parse_term_map(keywords_raw),
-                "phrases": _parse_term_map(phrases_raw),
-            }
+            raw = {}
+        topics = raw.get("topics", {}) if isinstance(raw, dict) else {}
+        if isinstance(topics, dict):
+            for topic, payload in topics.items():
+                if not isinstance(topic, str) or not isinstance(payload, dict):
+                    continue
+                keywords_raw = payload.get("keywords", {})
+                phrases_raw = payload.get("phrases", {})
+                parsed[topic] = {
+                    "keywords": _parse_term_map(keywords_raw),
+                    "phrases": _parse_term_map(phrases_raw),
+                }
+        self._overlay_reviewed_terms(parsed)
         return parsed
 
+    def _overlay_reviewed_terms(self, parsed: dict[str, dict[str, dict[str, dict[str, int | bool]]]]) -> None:
+        store_path = keyword_store_path(self.keyword_stats_path)
+        if not store_path.exists():
+            return
+        store = KeywordStatsStore(store_path, journal=ReviewJournal(review_journal_path(topic_rules_path())))
+        try:
+            store.sync()
+            for topic, term_type, term, reason in store.reviewed():
+                bucket = parsed.setdefault(topic, {"keywords": {}, "phrases": {}})[term_type]
+                entry = bucket.setdefault(term, {"occurrences": 0, "ignored": False, "reasonForIgnore": 0})
+                entry["ignored"] = True
+                entry["reasonForIgnore"] = reason or int(entry["reasonForIgnore"])
+        finally:
+            store.close()
+
     def _increment_term(self, topic: str, term_type: str, term: str, delta: int) -> None:
         cleaned_topic = topic.strip().lower()
         cleaned_term = term.strip().lower()
@@ -321,12 +773,105 @@ class BaselineBuilder:
         if cleaned_term not in bucket:
             bucket[cleaned_term] = {"occurrences": 0, "ignored": False, "reasonForIgnore": 0}
         bucket[cleaned_term]["occurrences"] = int(bucket[cleaned_term]["occurrences"]) + int(delta)
-
-
-def _safe_mean(values: list[int]) -> float:
-    if not values:
-        return 0.0
-    return float(sum(values) / len(values))
+        self._term_deltas[(cleaned_topic, term_type, cleaned_term)] += int(delta)
+
+
+def _window_cutoffs(days: int, windows: list[int] | None) -> tuple[list[int], dict[int, datetime], str]:
+    window_days = sorted({days, *(windows or [])})
+    if window_days[0] < 1:
+        raise ValueError("Baseline windows must be at least 1 day")
+    cutoffs = {window: NOW_FIXED - timedelta(days=window) for window in window_days}
+    cutoff_iso = cutoffs[window_days[-1]].isoformat().replace("+00:00", "Z")
+    return window_days, cutoffs, cutoff_iso
+
+
+def _extract_features(
+    message: dict[str, Any],
+    chat_id: str,
+    member_ids: list[str],
+    users_by_id: dict[str, dict[str, Any]],
+) -> MessageFeatures:
+    from_user = message.get("from", {}).get("user", {})
+    sender_id = from_user.get("id")
+    if not isinstance(sender_id, str) or sender_id not in users_by_id:
+        raise ValueError("Unknown sender")
+
+    created_raw = message.get("createdDateTime")
+    _parse_iso(created_raw)
+    modified = _parse_iso(message.get("lastModifiedDateTime") or created_raw)
+    if modified.tzinfo is None:
+        raise ValueError("Timestamp without timezone")
+    attachments = message.get("attachments", [])
+    if not isinstance(attachments, list):
+        attachments = []
+    body_content = str(message.get("body", {}).get("content", ""))
+    return MessageFeatures(
+        message_id=str(message.get("id")),
+        chat_id=chat_id,
+        sender_id=sender_id,
+        created=str(created_raw),
+        modified=modified.timestamp(),
+        recipient_ids=[uid for uid in member_ids if uid != sender_id and uid in users_by_id],
+        attachment_kind=_detect_attachment_kind(attachments),
+        attachment_names=[str(item.get("name", "")) for item in attachments if isinstance(item, dict)],
+        body_hash=hashlib.blake2b(body_content.encode("utf-8"), digest_size=8).hexdigest(),
+        body=body_content,
+    )
+
+
+def _validate_partials(partials: list[PartialAccumulatorFile]) -> dict[str, Any]:
+    if not partials:
+        raise ValueError("No partial baselines to merge")
+    first = partials[0].meta
+    shard_count = int(first["shard"][1])
+    indexes = sorted(int(partial.meta["shard"][0]) for partial in partials)
+    if indexes != list(range(shard_count)):
+        raise ValueError(f"Expected shards 0..{shard_count - 1}, got {indexes}")
+    for partial in partials[1:]:
+        for key in ("days", "windows", "user_ids"):
+            if partial.meta[key] != first[key]:
+                raise ValueError(f"Partial {partial.path.name} has a different {key} than {partials[0].path.name}")
+        if int(partial.meta["shard"][1]) != shard_count:
+            raise ValueError(f"Partial {partial.path.name} belongs to a different shard count")
+    return first
+
+
+def _topic_recipient_counts_payload(stats: SenderAccumulator) -> dict[str, dict[str, int]]:
+    payload: dict[str, dict[str, int]] = {topic: dict(counter) for topic, counter in stats.topic_recipient_counts.items()}
+    for topic, sketch in stats.topic_recipient_sketches.items():
+        payload[topic] = sketch.heavy_hitters()
+    return {topic: payload[topic] for topic in sorted(payload)}
+
+
+def _counter_stats(stats: SenderAccumulator) -> dict[str, Any]:
+    total = stats.message_count
+    recipient_mean, recipient_std = _histogram_mean_std(stats.recipient_count_histogram)
+    rare_topics: list[str] = []
+    if total > 0:
+        for topic, count in stats.topic_histogram.items():
+            if topic != "normal" and (count / total) < RARE_TOPIC_SHARE:
+                rare_topics.append(topic)
+    return {
+        "message_count": total,
+        "hour_histogram": {str(hour): stats.hour_histogram.get(hour, 0) for hour in range(24)},
+        "weekend_rate": stats.weekend_messages / total if total else 0.0,
+        "recipient_mean": recipient_mean,
+        "recipient_std": recipient_std,
+        "attachment_rate": stats.attachment_messages / total if total else 0.0,
+        "attachment_types": {key: stats.attachment_types.get(key, 0) for key in ATTACHMENT_KINDS},
+        "topic_histogram": dict(stats.topic_histogram),
+        "rare_topics": sorted(rare_topics),
+    }
+
+
+def _histogram_mean_std(histogram: Counter[int]) -> tuple[float, float]:
+    samples = sum(histogram.values())
+    if samples == 0:
+        return 0.0, 0.0
+    total = sum(value * count for value, count in histogram.items())
+    mean = Fraction(total, samples)
+    variance = sum(count * (value - mean) ** 2 for value, count in histogram.items()) / samples
+    return float(total / samples), sqrt(variance)
 
 
 def _round(value: float) -> float:
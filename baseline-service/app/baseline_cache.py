@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+from app.baseline_reader import IndexedBaselineReader, is_indexed_baseline
+
+LOGGER = logging.getLogger(__name__)
+
+
+class LoadedBaseline:
+    def __init__(self, path: Path, signature: tuple[int, int, int]) -> None:
+        self.path = path
+        self.signature = signature
+        self.meta: dict[str, Any] = {}
+        self._users: dict[str, Any] = {}
+        self._reader: IndexedBaselineReader | None = None
+        self._etags: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._leases = 0
+        self._retired = False
+        self._closed = False
+        if is_indexed_baseline(path):
+            self._reader = IndexedBaselineReader(path)
+            self.meta = self._reader.meta
+            return
+        raw = json.loads(path.read_text(encoding="utf-8"))
+        if isinstance(raw, dict):
+            meta = raw.get("meta", {})
+            users = raw.get("users", {})
+            self.meta = meta if isinstance(meta, dict) else {}
+            self._users = users if isinstance(users, dict) else {}
+
+    def __len__(self) -> int:
+        return len(self._reader) if self._reader is not None else len(self._users)
+
+    def items(self) -> Iterator[tuple[str, dict[str, Any]]]:
+        if self._reader is not None:
+            for user_id in self._reader.user_ids():
+                baseline = self._reader.get(user_id)
+                if baseline is not None:
+                    yield user_id, baseline
+            return
+        for user_id, baseline in self._users.items():
+            if isinstance(baseline, dict):
+                yield user_id, baseline
+
+    def get(self, user_id: str) -> tuple[dict[str, Any], str] | None:
+        if self._reader is not None:
+            record = self._reader.get_raw(user_id)
+            if record is None:
+                return None
+            baseline = json.loads(record)
+            return baseline, _etag(record)
+        baseline = self._users.get(user_id)
+        if not isinstance(baseline, dict):
+            return None
+        with self._lock:
+            etag = self._etags.get(user_id)
+            if etag is None:
+                etag = _etag(json.dumps(baseline, separators=(",", ":")).encode("utf-8"))
+                self._etags[user_id] = etag
+        return baseline, etag
+
+    def acquire(self) -> bool:
+        with self._lock:
+            if self._closed:
+                return False
+            self._leases += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self._leases -= 1
+            if self._retired and not self._leases:
+                self._close()
+
+    def retire(self) -> None:
+        with self._lock:
+            self._retired = True
+            if not self._leases:
+                self._close()
+
+    def _close(self) -> None:
+        if self._reader is not None and not self._closed:
+            self._reader.close()
+        self._closed = True
+
+
+class BaselineCache:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._loaded: LoadedBaseline | None = None
+        self.loads = 0
+
+    def get(self, path: Path) -> LoadedBaseline | None:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        signature = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        loaded = self._loaded
+        if loaded is not None and loaded.path == path and loaded.signature == signature:
+            return loaded
+        with self._lock:
+            loaded = self._loaded
+            if loaded is None or loaded.path != path or loaded.signature != signature:
+                previous = loaded
+                loaded = LoadedBaseline(path, signature)
+                self._loaded = loaded
+                self.loads += 1
+                LOGGER.info("Cached baseline %s (%d users)", path.name, len(loaded))
+                if previous is not None:
+                    previous.retire()
+            return loaded
+
+    @contextmanager
+    def lease(self, path: Path) -> Iterator[LoadedBaseline | None]:
+        while True:
+            loaded = self.get(path)
+            if loaded is None or loaded.acquire():
+                break
+        try:
+            yield loaded
+        finally:
+            if loaded is not None:
+                loaded.release()
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def _etag(record: bytes) -> str:
+    return '"' + hashlib.blake2b(record, digest_size=16).hexdigest() + '"'
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import json
+import os
+import struct
+import tempfile
+from pathlib import Path
+from types import TracebackType
+from typing import Any, BinaryIO, TextIO
+
+INDEXED_MAGIC = b"BLIDX\x00\x00\x01"
+INDEXED_HEADER = struct.Struct("<8sQQ")
+RECORD_LENGTH = struct.Struct("<I")
+COMPACT_KEYS = frozenset({"topic_recipient_sketches"})
+
+
+class JsonBaselineWriter:
+    def __init__(self, path: Path, meta: dict[str, Any], indent: int | None = 2) -> None:
+        self.path = path
+        self.meta = meta
+        self.indent = indent if indent and indent > 0 else None
+        self.user_count = 0
+        self._handle: TextIO | None = None
+        self._temp_path: Path | None = None
+
+    def __enter__(self) -> JsonBaselineWriter:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, raw_path = tempfile.mkstemp(prefix=f".{self.path.name}.", suffix=".tmp", dir=self.path.parent)
+        self._temp_path = Path(raw_path)
+        self._handle = os.fdopen(fd, "w", encoding="utf-8")
+        self._handle.write("{" + self._newline(1) + '"meta": ' + self._dumps(self.meta, 1) + ",")
+        self._handle.write(self._newline(1) + '"users": {')
+        return self
+
+    def write_user(self, user_id: str, payload: dict[str, Any]) -> None:
+        if self._handle is None:
+            raise RuntimeError("Baseline writer is not open")
+        separator = "," if self.user_count else ""
+        key_separator = ": " if self.indent else ":"
+        self._handle.write(separator + self._newline(2) + json.dumps(user_id) + key_separator + self._dumps(payload, 2))
+        self.user_count += 1
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        if self._handle is None or self._temp_path is None:
+            return
+        try:
+            if exc_type is None:
+                closing = self._newline(1) + "}" if self.user_count else "}"
+                self._handle.write(closing + self._newline(0) + "}")
+                self._handle.flush()
+                os.fsync(self._handle.fileno())
+            self._handle.close()
+            if exc_type is None:
+                publish_file(self._temp_path, self.path)
+        finally:
+            self._temp_path.unlink(missing_ok=True)
+            self._handle = None
+            self._temp_path = None
+
+    def _newline(self, level: int) -> str:
+        if self.indent is None:
+            return ""
+        return "\n" + " " * (self.indent * level)
+
+    def _dumps(self, value: Any, level: int) -> str:
+        if self.indent is None:
+            return json.dumps(value, separators=(",", ":"))
+        if isinstance(value, dict) and not COMPACT_KEYS.isdisjoint(value):
+            fields = [
+                self._newline(level + 1)
+                + json.dumps(key)
+                + ": "
+                + (json.dumps(item, separators=(",", ":")) if key in COMPACT_KEYS else self._dumps(item, level + 1))
+                for key, item in value.items()
+            ]
+            return "{" + ",".join(fields) + self._newline(level) + "}"
+        return json.dumps(value, indent=self.indent).replace("\n", self._newline(level))
+
+
+class IndexedBaselineWriter:
+    def __init__(self, path: Path, meta: dict[str, Any]) -> None:
+        self.path = path
+        self.meta = meta
+        self.user_count = 0
+        self._index: dict[str, list[int]] = {}
+        self._handle: BinaryIO | None = None
+        self._temp_path: Path | None = None
+
+    def __enter__(self) -> IndexedBaselineWriter:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, raw_path = tempfile.mkstemp(prefix=f".{self.path.name}.", suffix=".tmp", dir=self.path.parent)
+        self._temp_path = Path(raw_path)
+        self._handle = os.fdopen(fd, "wb")
+        self._handle.write(INDEXED_HEADER.pack(INDEXED_MAGIC, 0, 0))
+        return self
+
+    def write_user(self, user_id: str, payload: dict[str, Any]) -> None:
+        if self._handle is None:
+            raise RuntimeError("Baseline writer is not open")
+        record = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        self._handle.write(RECORD_LENGTH.pack(len(record)))
+        self._index[user_id] = [self._handle.tell(), len(record)]
+        self._handle.write(record)
+        self.user_count += 1
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        if self._handle is None or self._temp_path is None:
+            return
+        try:
+            if exc_type is None:
+                index_offset = self._handle.tell()
+                index = json.dumps({"meta": self.meta, "users": self._index}, separators=(",", ":")).encode("utf-8")
+                self._handle.write(index)
+                self._handle.seek(0)
+                self._handle.write(INDEXED_HEADER.pack(INDEXED_MAGIC, index_offset, len(index)))
+                self._handle.flush()
+                os.fsync(self._handle.fileno())
+            self._handle.close()
+            if exc_type is None:
+                publish_file(self._temp_path, self.path)
+        finally:
+            self._temp_path.unlink(missing_ok=True)
+            self._index = {}
+            self._handle = None
+            self._temp_path = None
+
+
+def publish_file(temp_path: Path, path: Path) -> None:
+    os.chmod(temp_path, 0o644)
+    os.replace(temp_path, path)
+    fsync_directory(path.parent)
+
+
+def fsync_directory(path: Path) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import resource
+import sys
+import time
+from collections import Counter
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUILD_PHASES = ("list_users", "list_chats", "fetch_messages", "classify", "keyword_mining", "finalize", "write")
+
+
+@dataclass
+class LatencyHistogram:
+    counts: list[int] = field(default_factory=lambda: [0] * len(LATENCY_BUCKETS))
+    total_seconds: float = 0.0
+    samples: int = 0
+
+    def observe(self, seconds: float) -> None:
+        self.samples += 1
+        self.total_seconds += seconds
+        for slot, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.counts[slot] += 1
+                return
+
+    def to_dict(self) -> dict[str, Any]:
+        cumulative: dict[str, int] = {}
+        running = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            running += count
+            cumulative[str(bound)] = running
+        cumulative["+Inf"] = self.samples
+        return {"buckets": cumulative, "sum": round(self.total_seconds, 6), "count": self.samples}
+
+
+class BuildMetrics:
+    def __init__(self, publish_interval: float = 2.0) -> None:
+        self.publish_interval = publish_interval
+        self.publisher: Callable[[dict[str, Any]], None] | None = None
+        self.phase_listener: Callable[[str], None] | None = None
+        self.start()
+
+    def start(self) -> None:
+        self.started_at = time.time()
+        self.finished_at: float | None = None
+        self.phase_seconds: dict[str, float] = {phase: 0.0 for phase in BUILD_PHASES}
+        self.graph_latency: dict[str, LatencyHistogram] = {}
+        self.graph_retries: Counter[str] = Counter()
+        self.messages_processed = 0
+        self._deferred_seconds: Counter[str] = Counter()
+        self._last_publish = 0.0
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - started)
+
+    def add_phase(self, name: str, seconds: float) -> None:
+        self.phase_seconds[name] = self.phase_seconds.get(name, 0.0) + seconds
+        if self.phase_listener is not None:
+            self.phase_listener(name)
+
+    def defer_phase(self, name: str, seconds: float) -> None:
+        self._deferred_seconds[name] += seconds
+
+    def flush_deferred_phases(self) -> None:
+        deferred = self._deferred_seconds
+        self._deferred_seconds = Counter()
+        for name, seconds in deferred.items():
+            self.add_phase(name, seconds)
+
+    def observe_graph(self, endpoint: str, seconds: float) -> None:
+        histogram = self.graph_latency.get(endpoint)
+        if histogram is None:
+            histogram = self.graph_latency[endpoint] = LatencyHistogram()
+        histogram.observe(seconds)
+
+    def record_retry(self, endpoint: str) -> None:
+        self.graph_retries[endpoint] += 1
+
+    def finish(self) -> None:
+        self.finished_at = time.time()
+        self.publish(force=True)
+
+    def publish(self, force: bool = False) -> None:
+        if self.publisher is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_publish < self.publish_interval:
+            return
+        self._last_publish = now
+        self.publisher(self.snapshot())
+
+    def snapshot(self) -> dict[str, Any]:
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return {
+            "elapsed_seconds": round(elapsed, 3),
+            "phase_seconds": {phase: round(seconds, 3) for phase, seconds in self.phase_seconds.items()},
+            "messages_per_second": round(self.messages_processed / elapsed, 2) if elapsed > 0 else 0.0,
+            "peak_rss_bytes": peak_rss_bytes(),
+            "graph_requests": {endpoint: histogram.to_dict() for endpoint, histogram in sorted(self.graph_latency.items())},
+            "graph_retries": dict(sorted(self.graph_retries.items())),
+        }
+
+
+def peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return int(peak if sys.platform == "darwin" else peak * 1024)
+
+
+def render_prometheus(status: dict[str, Any]) -> str:
+    lines = [
+        "# HELP baseline_build_state Current baseline build state.",
+        "# TYPE baseline_build_state gauge",
+    ]
+    for state in ("idle", "running", "completed", "failed", "cancelled"):
+        lines.append(f'baseline_build_state{{state="{state}"}} {1 if status.get("state") == state else 0}')
+    lines += [
+        "# TYPE baseline_build_users_processed gauge",
+        f"baseline_build_users_processed {int(status.get('users_processed') or 0)}",
+        "# TYPE baseline_build_messages_processed gauge",
+        f"baseline_build_messages_processed {int(status.get('messages_processed') or 0)}",
+    ]
+    if status.get("generation") is not None:
+        lines += ["# TYPE baseline_generation gauge", f"baseline_generation {int(status['generation'])}"]
+
+    metrics = status.get("metrics") or {}
+    if metrics:
+        lines += [
+            "# HELP baseline_build_phase_seconds Wall time spent in each build phase.",
+            "# TYPE baseline_build_phase_seconds gauge",
+        ]
+        for phase, seconds in metrics["phase_seconds"].items():
+            lines.append(f'baseline_build_phase_seconds{{phase="{phase}"}} {seconds}')
+        lines += [
+            "# TYPE baseline_build_elapsed_seconds gauge",
+            f"baseline_build_elapsed_seconds {metrics['elapsed_seconds']}",
+            "# TYPE baseline_build_messages_per_second gauge",
+            f"baseline_build_messages_per_second {metrics['messages_per_second']}",
+            "# TYPE baseline_build_peak_rss_bytes gauge",
+            f"baseline_build_peak_rss_bytes {metrics['peak_rss_bytes']}",
+            "# HELP baseline_graph_request_duration_seconds Graph request latency per attempt.",
+            "# TYPE baseline_graph_request_duration_seconds histogram",
+        ]
+        for endpoint, histogram in metrics["graph_requests"].items():
+            for bound, count in histogram["buckets"].items():
+                lines.append(f'baseline_graph_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}')
+            lines.append(f'baseline_graph_request_duration_seconds_sum{{endpoint="{endpoint}"}} {histogram["sum"]}')
+            lines.append(f'baseline_graph_request_duration_seconds_count{{endpoint="{endpoint}"}} {histogram["count"]}')
+        lines.append("# TYPE baseline_graph_retries_total counter")
+        for endpoint, count in metrics["graph_retries"].items():
+            lines.append(f'baseline_graph_retries_total{{endpoint="{endpoint}"}} {count}')
+
+    topic_cache = status.get("topic_cache") or {}
+    if topic_cache:
+        lines += [
+            "# TYPE baseline_topic_cache_hits_total counter",
+            f"baseline_topic_cache_hits_total {topic_cache['hits']}",
+            "# TYPE baseline_topic_cache_misses_total counter",
+            f"baseline_topic_cache_misses_total {topic_cache['misses']}",
+        ]
+    return "\n".join(lines) + "\n"
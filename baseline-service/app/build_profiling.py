@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import cProfile
+import io
+import math
+import pstats
+import statistics
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+from app.build_metrics import BuildMetrics
+
+
+@dataclass
+class PhaseMemory:
+    peak_bytes: int = 0
+    top_sites: list[dict[str, Any]] = field(default_factory=list)
+
+
+class MemoryTracer:
+    def __init__(self, top_n: int = 10, frames: int = 1, snapshot_growth: float = 1.1) -> None:
+        self.top_n = top_n
+        self.frames = frames
+        self.snapshot_growth = snapshot_growth
+        self.phases: dict[str, PhaseMemory] = {}
+
+    def start(self, metrics: BuildMetrics) -> None:
+        tracemalloc.start(self.frames)
+        metrics.phase_listener = self.phase_ended
+
+    def stop(self, metrics: BuildMetrics) -> None:
+        metrics.phase_listener = None
+        tracemalloc.stop()
+
+    def phase_ended(self, name: str) -> None:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        phase = self.phases.setdefault(name, PhaseMemory())
+        if peak <= phase.peak_bytes:
+            return
+        grown = peak > phase.peak_bytes * self.snapshot_growth
+        phase.peak_bytes = peak
+        if grown:
+            phase.top_sites = _top_sites(tracemalloc.take_snapshot(), self.top_n)
+
+    def report(self) -> dict[str, Any]:
+        return {
+            name: {"peak_bytes": phase.peak_bytes, "top_sites": phase.top_sites}
+            for name, phase in sorted(self.phases.items(), key=lambda item: -item[1].peak_bytes)
+        }
+
+
+def profile_summary(profiler: cProfile.Profile, output_path: Path, top_n: int) -> str:
+    profiler.dump_stats(str(output_path))
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.strip_dirs().sort_stats("cumulative").print_stats(top_n)
+    return stream.getvalue()
+
+
+def bench_report(runs: list[dict[str, Any]], settings: dict[str, Any]) -> dict[str, Any]:
+    wall = [run["wall_seconds"] for run in runs]
+    rates = [run["messages_per_second"] for run in runs]
+    phases = sorted({phase for run in runs for phase in run["phase_seconds"]})
+    return {
+        "generated_at": datetime.now(UTC).replace(microsecond=0).isoformat().replace("+00:00", "Z"),
+        "settings": settings,
+        "runs": len(runs),
+        "messages": runs[0]["messages"] if runs else 0,
+        "wall_seconds": {
+            "mean": round(statistics.fmean(wall), 4),
+            "p95": round(_percentile(wall, 0.95), 4),
+            "min": round(min(wall), 4),
+            "max": round(max(wall), 4),
+        },
+        "messages_per_second": {
+            "mean": round(statistics.fmean(rates), 2),
+            "p95": round(_percentile(rates, 0.95), 2),
+        },
+        "phase_seconds_mean": {
+            phase: round(statistics.fmean(run["phase_seconds"].get(phase, 0.0) for run in runs), 4) for phase in phases
+        },
+        "peak_rss_bytes": max(run["peak_rss_bytes"] for run in runs),
+        "samples": runs,
+    }
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    rank = max(math.ceil(fraction * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+def _top_sites(snapshot: tracemalloc.Snapshot, top_n: int) -> list[dict[str, Any]]:
+    snapshot = snapshot.filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+    sites: list[dict[str, Any]] = []
+    for stat in snapshot.statistics("lineno")[:top_n]:
+        frame = stat.traceback[0]
+        sites.append({"site": f"{frame.filename}:{frame.lineno}", "bytes": stat.size, "blocks": stat.count})
+    return sites
@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+from dataclasses import dataclass, field
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import Any
+
+from app.baseline_builder import BaselineBuilder, BuildStatus, ShardSpec
+from app.graph_client import GraphClient
+from app.keyword_miner import KeywordMinerClient, KeywordMinerConfig, keyword_miner_config_from_env
+from app.recipient_sketch import RecipientSketchConfig, recipient_sketch_config_from_env
+from app.topic_classifier import topic_cache_stats
+
+LOGGER = logging.getLogger(__name__)
+
+USERS_PROCESSED = 0
+MESSAGES_PROCESSED = 1
+
+
+class BuildCancelled(Exception):
+    pass
+
+
+@dataclass
+class BuildJob:
+    days: int
+    base_url: str
+    output_path: Path
+    output_format: str
+    keyword_miner: KeywordMinerConfig
+    keyword_stats_path: Path
+    keyword_batch_size: int = 200
+    keyword_cache_path: Path | None = None
+    keyword_cache_entries: int = 500_000
+    recipient_sketch: RecipientSketchConfig | None = None
+    spill_dir: Path | None = None
+    spill_budget: int = 500_000
+    output_indent: int | None = 2
+    windows: list[int] = field(default_factory=list)
+    shard: ShardSpec | None = None
+    feature_cache_path: Path | None = None
+    replay: bool = False
+    columnar: bool = False
+
+
+def build_job_settings_from_env() -> dict[str, Any]:
+    return {
+        "keyword_miner": keyword_miner_config_from_env(),
+        "keyword_batch_size": int(os.getenv("KEYWORD_MINER_BATCH_SIZE", "200")),
+        "keyword_cache_entries": int(os.getenv("KEYWORD_MINER_CACHE_ENTRIES", "500000")),
+        "recipient_sketch": recipient_sketch_config_from_env(),
+        "spill_dir": Path(os.environ["BASELINE_SPILL_DIR"]) if os.getenv("BASELINE_SPILL_DIR") else None,
+        "spill_budget": int(os.getenv("BASELINE_SPILL_BUDGET", "500000")),
+        "output_indent": int(os.getenv("BASELINE_JSON_INDENT", "2") or "0"),
+        "columnar": os.getenv("BASELINE_COLUMNAR_FINALIZE", "false").lower() == "true",
+    }
+
+
+class SharedBuildStatus(BuildStatus):
+    def __init__(self, counters: Any) -> None:
+        # BuildStatus.__init__ assigns the counters through the properties below, so attach the array first.
+        self._counters = counters
+        super().__init__(
+            users_processed=int(counters[USERS_PROCESSED]),
+            messages_processed=int(counters[MESSAGES_PROCESSED]),
+        )
+
+    @property
+    def users_processed(self) -> int:
+        return int(self._counters[USERS_PROCESSED])
+
+    @users_processed.setter
+    def users_processed(self, value: int) -> None:
+        self._counters[USERS_PROCESSED] = value
+
+    @property
+    def messages_processed(self) -> int:
+        return int(self._counters[MESSAGES_PROCESSED])
+
+    @messages_processed.setter
+    def messages_processed(self, value: int) -> None:
+        self._counters[MESSAGES_PROCESSED] = value
+
+
+class BuildProcess:
+    def __init__(self, poll_interval: float = 0.2, terminate_timeout: float = 10.0) -> None:
+        self.poll_interval = poll_interval
+        self.terminate_timeout = terminate_timeout
+        self._context = multiprocessing.get_context("spawn")
+        self._counters = self._context.Array("q", 2, lock=False)
+        self._process: multiprocessing.process.BaseProcess | None = None
+        self._connection: Connection | None = None
+        self._cancelled = False
+        self.topic_cache: dict[str, Any] | None = None
+        self.metrics: dict[str, Any] | None = None
+
+    def start(self, job: BuildJob) -> None:
+        if self.is_running():
+            raise RuntimeError("A build worker is already running")
+        self._counters[USERS_PROCESSED] = 0
+        self._counters[MESSAGES_PROCESSED] = 0
+        self._cancelled = False
+        self.topic_cache = None
+        self.metrics = None
+        parent_connection, child_connection = self._context.Pipe(duplex=False)
+        self._process = self._context.Process(
+            target=_run_job,
+            args=(job, self._counters, child_connection),
+            name="baseline-build",
+            daemon=True,
+        )
+        self._process.start()
+        child_connection.close()
+        self._connection = parent_connection
+        LOGGER.info("Started baseline build worker pid=%s", self._process.pid)
+
+    def is_running(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    def progress(self) -> tuple[int, int]:
+        return int(self._counters[USERS_PROCESSED]), int(self._counters[MESSAGES_PROCESSED])
+
+    def cancel(self) -> bool:
+        if not self.is_running() or self._process is None:
+            return False
+        self._cancelled = True
+        self._process.terminate()
+        LOGGER.info("Cancelling baseline build worker pid=%s", self._process.pid)
+        return True
+
+    async def wait(self) -> dict[str, Any]:
+        if self._process is None or self._connection is None:
+            raise RuntimeError("No build worker was started")
+        process = self._process
+        connection = self._connection
+        result: tuple[str, Any] | None = None
+        try:
+            while result is None:
+                if connection.poll():
+                    try:
+                        message = connection.recv()
+                    except EOFError:
+                        break
+                    if message[0] == "metrics":
+                        self.metrics = message[1]
+                    else:
+                        result = message
+                elif not process.is_alive():
+                    if connection.poll():
+                        continue
+                    break
+                else:
+                    await asyncio.sleep(self.poll_interval)
+            await asyncio.to_thread(process.join, self.terminate_timeout)
+            if process.is_alive():
+                process.kill()
+                await asyncio.to_thread(process.join)
+        finally:
+            connection.close()
+            self._connection = None
+
+        if result is None:
+            if self._cancelled:
+                raise BuildCancelled("baseline build was cancelled")
+            raise RuntimeError(f"baseline build worker exited with code {process.exitcode}")
+        state, value = result
+        if state == "cancelled":
+            raise BuildCancelled("baseline build was cancelled")
+        if state == "failed":
+            raise RuntimeError(value)
+        self.topic_cache = value["topic_cache"]
+        self.metrics = value["metrics"]
+        return value["meta"]
+
+
+def _run_job(job: BuildJob, counters: Any, connection: Connection) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    status = SharedBuildStatus(counters)
+    try:
+        builder = make_builder(job, status)
+        builder.metrics.publisher = lambda snapshot: connection.send(("metrics", snapshot))
+        if job.replay:
+            if job.feature_cache_path is None:
+                raise ValueError("Replay needs a feature cache path")
+            signal.signal(signal.SIGTERM, _cancel_replay)
+            meta = builder.replay(job.feature_cache_path, job.days, job.windows)
+        else:
+            meta = asyncio.run(_build(builder, job))
+        result = {"meta": meta, "topic_cache": topic_cache_stats(), "metrics": builder.metrics.snapshot()}
+        connection.send(("completed", result))
+    except asyncio.CancelledError:
+        connection.send(("cancelled", None))
+    except Exception as exc:
+        LOGGER.exception("Baseline build worker failed")
+        connection.send(("failed", str(exc)))
+    finally:
+        connection.close()
+
+
+def _cancel_replay(signum: int, frame: Any) -> None:
+    raise asyncio.CancelledError()
+
+
+async def _build(builder: BaselineBuilder, job: BuildJob) -> dict[str, Any]:
+    task = asyncio.current_task()
+    if task is not None:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, task.cancel)
+    return await builder.build(days=job.days, windows=job.windows)
+
+
+def make_builder(job: BuildJob, status: BuildStatus) -> BaselineBuilder:
+    return BaselineBuilder(
+        GraphClient(base_url=job.base_url),
+        job.output_path,
+        status,
+        keyword_miner=KeywordMinerClient(job.keyword_miner),
+        keyword_stats_path=job.keyword_stats_path,
+        keyword_batch_size=job.keyword_batch_size,
+        keyword_cache_path=job.keyword_cache_path,
+        keyword_cache_entries=job.keyword_cache_entries,
+        recipient_sketch=job.recipient_sketch,
+        spill_dir=job.spill_dir,
+        spill_budget=job.spill_budget,
+        output_indent=job.output_indent,
+        output_format=job.output_format,
+        shard=job.shard,
+        feature_cache_path=None if job.replay else job.feature_cache_path,
+        columnar=job.columnar,
+    )
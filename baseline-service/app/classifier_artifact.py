@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+from datetime import UTC, datetime
+from pathlib import Path
+
+from app.baseline_writer import publish_file
+from app.topic_classifier import TopicRules
+
+LOGGER = logging.getLogger(__name__)
+
+ARTIFACT_FORMAT = 1
+ARTIFACT_NAME = "topic_classifier.pkl"
+
+
+def rules_id(rules: TopicRules) -> str:
+    canonical = json.dumps(
+        {"normal_threshold": rules.normal_threshold, "patterns": sorted(rules.pattern_meta.items())},
+        separators=(",", ":"),
+    )
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def write_classifier_artifact(path: Path, rules: TopicRules) -> str:
+    version = rules_id(rules)
+    artifact = {
+        "format": ARTIFACT_FORMAT,
+        "version": version,
+        "generated_at": datetime.now(UTC).replace(microsecond=0).isoformat().replace("+00:00", "Z"),
+        "normal_threshold": rules.normal_threshold,
+        "topics": list(rules.topics),
+        "pattern_meta": rules.pattern_meta,
+        "matcher": rules.matcher,
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, raw_path = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    temp_path = Path(raw_path)
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            pickle.dump(artifact, handle, protocol=pickle.HIGHEST_PROTOCOL)
+            handle.flush()
+            os.fsync(handle.fileno())
+        publish_file(temp_path, path)
+    finally:
+        temp_path.unlink(missing_ok=True)
+    LOGGER.info("Published topic classifier %s (%d patterns) to %s", version, len(rules.pattern_meta), path)
+    return version
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+from array import array
+from dataclasses import dataclass
+from typing import Any
+try:
+    import numpy as np
+except ModuleNotFoundError:  # pragma: no cover
+    np = None  # type: ignore[assignment]
+
+ATTACHMENT_KINDS = ("none", "link", "zip", "xlsx", "pdf", "other")
+RARE_TOPIC_SHARE = 0.02
+
+
+def columnar_available() -> bool:
+    return np is not None
+
+
+class MessageColumns:
+    def __init__(self, sender_ids: list[str]) -> None:
+        if np is None:
+            raise RuntimeError("numpy is required for columnar baseline aggregation")
+        self.sender_ids = sender_ids
+        self.sender_slots = {sender_id: slot for slot, sender_id in enumerate(sender_ids)}
+        self.topic_slots: dict[str, int] = {}
+        self._kind_slots = {kind: slot for slot, kind in enumerate(ATTACHMENT_KINDS)}
+        self._senders = array("i")
+        self._hours = array("b")
+        self._weekend = array("b")
+        self._recipients = array("i")
+        self._kinds = array("b")
+        self._with_attachment = array("b")
+        self._topics = array("h")
+
+    def __len__(self) -> int:
+        return len(self._senders)
+
+    def append(
+        self,
+        sender_id: str,
+        hour: int,
+        weekday: int,
+        recipient_count: int,
+        attachment_kind: str,
+        has_attachment: bool,
+        topic: str,
+    ) -> None:
+        topic_slot = self.topic_slots.get(topic)
+        if topic_slot is None:
+            topic_slot = self.topic_slots[topic] = len(self.topic_slots)
+        self._senders.append(self.sender_slots[sender_id])
+        self._hours.append(hour)
+        self._weekend.append(1 if weekday >= 5 else 0)
+        self._recipients.append(recipient_count)
+        self._kinds.append(self._kind_slots.get(attachment_kind, len(ATTACHMENT_KINDS)))
+        self._with_attachment.append(1 if has_attachment else 0)
+        self._topics.append(topic_slot)
+
+    def summarize(self) -> ColumnarSummary:
+        senders = np.frombuffer(self._senders, dtype=np.int32).astype(np.int64)
+        sender_count = len(self.sender_ids)
+        topic_count = max(len(self.topic_slots), 1)
+        kind_count = len(ATTACHMENT_KINDS) + 1
+
+        def per_sender(values: Any = None) -> Any:
+            return np.bincount(senders, weights=values, minlength=sender_count)
+
+        message_count = per_sender().astype(np.int64)
+        recipients = np.frombuffer(self._recipients, dtype=np.int32).astype(np.int64)
+        recipient_sum = np.bincount(senders, weights=recipients, minlength=sender_count).astype(np.int64)
+        recipient_squares = np.bincount(senders, weights=recipients * recipients, minlength=sender_count).astype(np.int64)
+        safe_count = np.maximum(message_count, 1)
+        variance = (message_count * recipient_squares - recipient_sum * recipient_sum) / (safe_count * safe_count).astype(np.float64)
+
+        hours = np.frombuffer(self._hours, dtype=np.int8).astype(np.int64)
+        kinds = np.frombuffer(self._kinds, dtype=np.int8).astype(np.int64)
+        topics = np.frombuffer(self._topics, dtype=np.int16).astype(np.int64)
+        topic_histogram = np.bincount(senders * topic_count + topics, minlength=sender_count * topic_count)
+        return ColumnarSummary(
+            sender_slots=self.sender_slots,
+            topic_names=sorted(self.topic_slots, key=self.topic_slots.__getitem__),
+            message_count=message_count,
+            hour_histogram=np.bincount(senders * 24 + hours, minlength=sender_count * 24).reshape(sender_count, 24),
+            weekend_rate=per_sender(np.frombuffer(self._weekend, dtype=np.int8).astype(np.float64)) / safe_count,
+            attachment_rate=per_sender(np.frombuffer(self._with_attachment, dtype=np.int8).astype(np.float64)) / safe_count,
+            recipient_mean=recipient_sum / safe_count,
+            recipient_std=np.sqrt(np.maximum(variance, 0.0)),
+            attachment_types=np.bincount(senders * kind_count + kinds, minlength=sender_count * kind_count).reshape(
+                sender_count, kind_count
+            ),
+            topic_histogram=topic_histogram.reshape(sender_count, topic_count),
+        )
+
+
+@dataclass
+class ColumnarSummary:
+    sender_slots: dict[str, int]
+    topic_names: list[str]
+    message_count: Any
+    hour_histogram: Any
+    weekend_rate: Any
+    attachment_rate: Any
+    recipient_mean: Any
+    recipient_std: Any
+    attachment_types: Any
+    topic_histogram: Any
+
+    def sender_stats(self, sender_id: str) -> dict[str, Any]:
+        slot = self.sender_slots[sender_id]
+        total = int(self.message_count[slot])
+        hours = self.hour_histogram[slot].tolist()
+        kinds = self.attachment_types[slot].tolist()
+        counts = self.topic_histogram[slot].tolist()
+        topic_histogram = {topic: count for topic, count in zip(self.topic_names, counts) if count}
+        return {
+            "message_count": total,
+            "hour_histogram": {str(hour): hours[hour] for hour in range(24)},
+            "weekend_rate": float(self.weekend_rate[slot]) if total else 0.0,
+            "recipient_mean": float(self.recipient_mean[slot]) if total else 0.0,
+            "recipient_std": float(self.recipient_std[slot]) if total else 0.0,
+            "attachment_rate": float(self.attachment_rate[slot]) if total else 0.0,
+            "attachment_types": dict(zip(ATTACHMENT_KINDS, kinds)),
+            "topic_histogram": topic_histogram,
+            "rare_topics": sorted(
+                topic for topic, count in topic_histogram.items() if topic != "normal" and count / total < RARE_TOPIC_SHARE
+            ),
+        }
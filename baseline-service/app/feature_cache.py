@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import time
+import zlib
+from collections import defaultdict
+from collections.abc import Container, Iterable, Iterator
+from dataclasses import dataclass, fields
+from pathlib import Path
+from types import TracebackType
+from typing import Any, BinaryIO
+
+from app.baseline_writer import RECORD_LENGTH, publish_file
+from app.build_metrics import BuildMetrics
+from app.topic_classifier import TopicRules, classify_topics
+
+FEATURE_CACHE_MAGIC = b"BLFEAT\x00\x01"
+
+
+@dataclass
+class MessageFeatures:
+    message_id: str
+    chat_id: str
+    sender_id: str
+    created: str
+    modified: float
+    recipient_ids: list[str]
+    attachment_kind: str
+    attachment_names: list[str]
+    body_hash: str
+    body: str
+
+
+FEATURE_COLUMNS = tuple(field.name for field in fields(MessageFeatures))
+
+RowLocation = tuple[int, int]
+
+
+class FeatureCacheWriter:
+    def __init__(self, path: Path, meta: dict[str, Any], users: list[dict[str, Any]], chunk_rows: int = 4096) -> None:
+        self.path = path
+        self.meta = meta
+        self.users = users
+        self.chunk_rows = max(chunk_rows, 1)
+        self.row_count = 0
+        self._columns: dict[str, list[Any]] = {name: [] for name in FEATURE_COLUMNS}
+        self._handle: BinaryIO | None = None
+        self._temp_path: Path | None = None
+
+    def __enter__(self) -> FeatureCacheWriter:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, raw_path = tempfile.mkstemp(prefix=f".{self.path.name}.", suffix=".tmp", dir=self.path.parent)
+        self._temp_path = Path(raw_path)
+        self._handle = os.fdopen(fd, "wb")
+        self._handle.write(FEATURE_CACHE_MAGIC)
+        self._write_chunk({"meta": self.meta, "users": self.users})
+        return self
+
+    def append(self, features: MessageFeatures) -> None:
+        for name in FEATURE_COLUMNS:
+            self._columns[name].append(getattr(features, name))
+        self.row_count += 1
+        if len(self._columns["message_id"]) >= self.chunk_rows:
+            self._flush()
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        if self._handle is None or self._temp_path is None:
+            return
+        try:
+            if exc_type is None:
+                self._flush()
+                self._handle.flush()
+                os.fsync(self._handle.fileno())
+            self._handle.close()
+            if exc_type is None:
+                publish_file(self._temp_path, self.path)
+        finally:
+            self._temp_path.unlink(missing_ok=True)
+            self._columns = {name: [] for name in FEATURE_COLUMNS}
+            self._handle = None
+            self._temp_path = None
+
+    def _flush(self) -> None:
+        if not self._columns["message_id"]:
+            return
+        self._write_chunk(self._columns)
+        self._columns = {name: [] for name in FEATURE_COLUMNS}
+
+    def _write_chunk(self, payload: dict[str, Any]) -> None:
+        if self._handle is None:
+            raise RuntimeError("Feature cache writer is not open")
+        chunk = zlib.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+        self._handle.write(RECORD_LENGTH.pack(len(chunk)))
+        self._handle.write(chunk)
+
+
+class FeatureCacheReader:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with path.open("rb") as handle:
+            if handle.read(len(FEATURE_CACHE_MAGIC)) != FEATURE_CACHE_MAGIC:
+                raise ValueError(f"{path} is not a message feature cache")
+            header = _read_chunk(handle)
+        if header is None or not isinstance(header.get("meta"), dict) or not isinstance(header.get("users"), list):
+            raise ValueError(f"{path} has no feature cache header")
+        self.meta: dict[str, Any] = header["meta"]
+        self.users: list[dict[str, Any]] = header["users"]
+
+    def __iter__(self) -> Iterator[MessageFeatures]:
+        for _, features in self.located():
+            yield features
+
+    def located(self) -> Iterator[tuple[RowLocation, MessageFeatures]]:
+        with self.path.open("rb") as handle:
+            handle.seek(len(FEATURE_CACHE_MAGIC))
+            _read_chunk(handle)
+            while True:
+                offset = handle.tell()
+                columns = _read_chunk(handle)
+                if columns is None:
+                    return
+                for slot, row in enumerate(zip(*(columns[name] for name in FEATURE_COLUMNS))):
+                    yield (offset, slot), MessageFeatures(*row)
+
+    def rows(self, locations: Iterable[RowLocation]) -> Iterator[MessageFeatures]:
+        slots_by_chunk: dict[int, list[int]] = defaultdict(list)
+        for offset, slot in locations:
+            slots_by_chunk[offset].append(slot)
+        with self.path.open("rb") as handle:
+            for offset, slots in slots_by_chunk.items():
+                handle.seek(offset)
+                columns = _read_chunk(handle)
+                if columns is None:
+                    raise ValueError(f"{self.path} has no chunk at offset {offset}")
+                for slot in slots:
+                    yield MessageFeatures(*(columns[name][slot] for name in FEATURE_COLUMNS))
+
+    def classified(
+        self,
+        rules: TopicRules,
+        batch_size: int = 1024,
+        metrics: BuildMetrics | None = None,
+        sender_ids: Container[str] | None = None,
+    ) -> Iterator[tuple[MessageFeatures, str]]:
+        for _, features, topic in self.classified_locations(rules, batch_size, metrics, sender_ids):
+            yield features, topic
+
+    def classified_locations(
+        self,
+        rules: TopicRules,
+        batch_size: int = 1024,
+        metrics: BuildMetrics | None = None,
+        sender_ids: Container[str] | None = None,
+    ) -> Iterator[tuple[RowLocation, MessageFeatures, str]]:
+        batch: list[tuple[RowLocation, MessageFeatures]] = []
+        for location, features in self.located():
+            if sender_ids is not None and features.sender_id not in sender_ids:
+                continue
+            batch.append((location, features))
+            if len(batch) >= batch_size:
+                yield from _classify_batch(batch, rules, metrics)
+                batch = []
+        if batch:
+            yield from _classify_batch(batch, rules, metrics)
+
+
+def _classify_batch(
+    batch: list[tuple[RowLocation, MessageFeatures]],
+    rules: TopicRules,
+    metrics: BuildMetrics | None,
+) -> Iterator[tuple[RowLocation, MessageFeatures, str]]:
+    started = time.perf_counter()
+    topics = classify_topics(((features.body, features.attachment_names) for _, features in batch), rules).topics
+    if metrics is not None:
+        metrics.add_phase("classify", time.perf_counter() - started)
+    return ((location, features, topic) for (location, features), topic in zip(batch, topics))
+
+
+def _read_chunk(handle: BinaryIO) -> dict[str, Any] | None:
+    prefix = handle.read(RECORD_LENGTH.size)
+    if not prefix:
+        return None
+    if len(prefix) != RECORD_LENGTH.size:
+        raise ValueError("Truncated feature cache chunk header")
+    (length,) = RECORD_LENGTH.unpack(prefix)
+    chunk = handle.read(length)
+    if len(chunk) != length:
+        raise ValueError("Truncated feature cache chunk")
+    return json.loads(zlib.decompress(chunk))
@@ -2,12 +2,15 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import time
 from dataclasses import dataclass
 from typing import Any
-from urllib.parse import quote, urljoin
+from urllib.parse import quote, urljoin, urlsplit
 
 import httpx
 
+from app.build_metrics import BuildMetrics
+
 LOGGER = logging.getLogger(__name__)
 
 
@@ -16,6 +19,7 @@ class GraphClient:
     base_url: str
     timeout_seconds: float = 15.0
     max_retries: int = 4
+    metrics: BuildMetrics | None = None
 
     async def list_users(self) -> list[dict[str, Any]]:
         return await self._fetch_all("/v1.0/users")
@@ -51,11 +55,15 @@ class GraphClient:
 
     async def _get_json_with_retry(self, client: httpx.AsyncClient, endpoint_or_url: str) -> dict[str, Any]:
         url = endpoint_or_url if endpoint_or_url.startswith("http") else urljoin(self.base_url, endpoint_or_url)
+        label = _endpoint_label(url)
 
         last_error: Exception | None = None
         for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
             try:
                 response = await client.get(url)
+                if self.metrics is not None:
+                    self.metrics.observe_graph(label, time.perf_counter() - started)
                 if response.status_code in {429, 500, 502, 503, 504}:
                     raise httpx.HTTPStatusError(
                         f"Retryable status code {response.status_code}",
@@ -71,6 +79,8 @@ class GraphClient:
                 last_error = exc
                 if attempt >= self.max_retries:
                     break
+                if self.metrics is not None:
+                    self.metrics.record_retry(label)
                 delay = min(0.5 * (2**attempt), 4.0)
                 LOGGER.warning("Graph request failed (%s). Retrying in %.1fs", exc, delay)
                 await asyncio.sleep(delay)
@@ -78,3 +88,14 @@ class GraphClient:
         if last_error is None:
             raise RuntimeError(f"Graph request failed for url={url}")
         raise RuntimeError(f"Graph request failed for url={url}: {last_error}") from last_error
+
+
+def _endpoint_label(url: str) -> str:
+    path = urlsplit(url).path
+    if path.endswith("/messages"):
+        return "messages"
+    if path.endswith("/chats"):
+        return "chats"
+    if path.endswith("/users"):
+        return "users"
+    return "other"
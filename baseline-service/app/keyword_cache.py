@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import time
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+LOGGER = logging.getLogger(__name__)
+
+TERM_TYPES = ("keywords", "phrases")
+LOOKUP_CHUNK = 500
+
+TermCounts = dict[str, dict[str, dict[str, int]]]
+
+
+def content_hash(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def attribute_counts(messages: list[str], result: dict[str, Any]) -> list[TermCounts]:
+    lowered = [message.lower() for message in messages]
+    per_message: list[TermCounts] = [{} for _ in messages]
+    topics = result.get("topics", {})
+    if not isinstance(topics, dict):
+        return per_message
+    for topic, payload in topics.items():
+        if not isinstance(payload, dict):
+            continue
+        for term_type in TERM_TYPES:
+            terms = payload.get(term_type, {})
+            if not isinstance(terms, dict):
+                continue
+            for term in terms:
+                cleaned = str(term).strip().lower()
+                if not cleaned:
+                    continue
+                pattern = re.compile(rf"(?<!\w){re.escape(cleaned)}(?!\w)")
+                for slot, text in enumerate(lowered):
+                    if cleaned not in text:
+                        continue
+                    occurrences = len(pattern.findall(text))
+                    if occurrences:
+                        bucket = per_message[slot].setdefault(topic, {"keywords": {}, "phrases": {}})
+                        bucket[term_type][cleaned] = occurrences
+    return per_message
+
+
+class KeywordCountCache:
+    def __init__(self, path: Path, max_entries: int = 500_000) -> None:
+        self.path = path
+        self.max_entries = max(max_entries, 1)
+        self.hits = 0
+        self.misses = 0
+        self._stamp = int(time.time())
+        self._touched: list[bytes] = []
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS mined (
+                digest BLOB PRIMARY KEY,
+                counts TEXT NOT NULL,
+                last_used INTEGER NOT NULL
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS mined_last_used ON mined (last_used)")
+
+    def get(self, digest: bytes) -> TermCounts | None:
+        row = self._conn.execute("SELECT counts FROM mined WHERE digest = ?", (digest,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touched.append(digest)
+        if len(self._touched) >= LOOKUP_CHUNK:
+            self._flush_touched()
+        return json.loads(row[0])
+
+    def put_many(self, entries: Iterable[tuple[bytes, TermCounts]]) -> None:
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO mined (digest, counts, last_used) VALUES (?, ?, ?)",
+                ((digest, json.dumps(counts, separators=(",", ":")), self._stamp) for digest, counts in entries),
+            )
+
+    def __len__(self) -> int:
+        return int(self._conn.execute("SELECT COUNT(*) FROM mined").fetchone()[0])
+
+    def close(self) -> None:
+        try:
+            self._flush_touched()
+            excess = len(self) - self.max_entries
+            if excess > 0:
+                with self._conn:
+                    self._conn.execute(
+                        "DELETE FROM mined WHERE digest IN (SELECT digest FROM mined ORDER BY last_used LIMIT ?)",
+                        (excess,),
+                    )
+                LOGGER.info("Evicted %d least recently used entries from %s", excess, self.path)
+        finally:
+            self._conn.close()
+
+    def _flush_touched(self) -> None:
+        if not self._touched:
+            return
+        with self._conn:
+            self._conn.executemany(
+                "UPDATE mined SET last_used = ? WHERE digest = ?",
+                ((self._stamp, digest) for digest in self._touched),
+            )
+        self._touched.clear()
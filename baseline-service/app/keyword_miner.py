@@ -2,6 +2,9 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import os
+import time
+from collections.abc import Callable
 from dataclasses import dataclass
 from typing import Any
 
@@ -9,6 +12,15 @@ import httpx
 
 LOGGER = logging.getLogger(__name__)
 
+KEYWORD_ENGINES = ("llm", "local")
+
+
+OVERLOAD_STATUSES = {413, 429, 503}
+RETRYABLE_STATUSES = {500, 502, 504}
+CONTEXT_LENGTH_MARKERS = ("context_length", "context length", "maximum context")
+
+MinedChunk = tuple[list[str], dict[str, dict[str, dict[str, int]]] | None]
+
 
 @dataclass
 class KeywordMinerConfig:
@@ -16,41 +28,199 @@ class KeywordMinerConfig:
     service_url: str
     timeout_seconds: float = 3.0
     max_retries: int = 3
+    concurrency: int = 4
+    max_pending_batches: int = 8
+    engine: str = "llm"
+    local_top_terms: int = 50
+    token_budget: int = 6000
+    min_token_budget: int = 500
+    max_token_budget: int = 24000
+    max_batch_messages: int = 200
+    max_split_depth: int = 4
+    max_consecutive_failures: int = 3
+
+
+def keyword_miner_config_from_env() -> KeywordMinerConfig:
+    return KeywordMinerConfig(
+        enabled=os.getenv("USE_LLM_KEYWORD_MINER", "false").lower() == "true",
+        service_url=os.getenv("KEYWORD_MINER_URL", "http://127.0.0.1:8030"),
+        timeout_seconds=float(os.getenv("KEYWORD_MINER_TIMEOUT_SECONDS", "3.0")),
+        max_retries=int(os.getenv("KEYWORD_MINER_MAX_RETRIES", "3")),
+        concurrency=int(os.getenv("KEYWORD_MINER_CONCURRENCY", "4")),
+        max_pending_batches=int(os.getenv("KEYWORD_MINER_QUEUE_SIZE", "8")),
+        engine=os.getenv("KEYWORD_MINER_ENGINE", "llm").lower(),
+        local_top_terms=int(os.getenv("KEYWORD_MINER_LOCAL_TOP_TERMS", "50")),
+        token_budget=int(os.getenv("KEYWORD_MINER_TOKEN_BUDGET", "6000")),
+        max_token_budget=int(os.getenv("KEYWORD_MINER_MAX_TOKEN_BUDGET", "24000")),
+        max_batch_messages=int(os.getenv("KEYWORD_MINER_BATCH_SIZE", "200")),
+        max_split_depth=int(os.getenv("KEYWORD_MINER_MAX_SPLIT_DEPTH", "4")),
+        max_consecutive_failures=int(os.getenv("KEYWORD_MINER_MAX_FAILURES", "3")),
+    )
+
+
+def approx_tokens(text: str) -> int:
+    return len(text) // 4 + 1
 
 
 class KeywordMinerClient:
     def __init__(self, config: KeywordMinerConfig) -> None:
         self.config = config
+        self.token_budget = min(max(config.token_budget, config.min_token_budget), config.max_token_budget)
 
     async def extract(self, messages: list[str]) -> dict[str, dict[str, dict[str, int]]]:
+        merged: dict[str, dict[str, dict[str, int]]] = {}
+        for _, result in await self.mine(messages):
+            for topic, payload in (result or {}).get("topics", {}).items():
+                bucket = merged.setdefault(topic, {"keywords": {}, "phrases": {}})
+                for term_type in ("keywords", "phrases"):
+                    for term, count in payload.get(term_type, {}).items():
+                        bucket[term_type][term] = bucket[term_type].get(term, 0) + count
+        return {"topics": merged}
+
+    async def mine(self, messages: list[str]) -> list[MinedChunk]:
         if not self.config.enabled or not messages:
-            return {"topics": {}}
+            return []
+        mined: list[MinedChunk] = []
+        failures = 0
+        for chunk in self.split(messages):
+            if failures >= self.config.max_consecutive_failures:
+                mined.append((chunk, None))
+                continue
+            start = len(mined)
+            await self._mine_chunk(chunk, mined, 0)
+            failures = failures + 1 if all(result is None for _, result in mined[start:]) else 0
+            if failures == self.config.max_consecutive_failures:
+                LOGGER.warning("Keyword miner failed %d batches in a row, skipping the rest of this batch", failures)
+        return mined
 
-        endpoint = f"{self.config.service_url.rstrip('/')}/v1/keywords/extract"
-        payload = {"messages": messages}
+    def split(self, messages: list[str]) -> list[list[str]]:
+        chunks: list[list[str]] = []
+        current: list[str] = []
+        tokens = 0
+        for message in messages:
+            cost = approx_tokens(message)
+            if current and (tokens + cost > self.token_budget or len(current) >= self.config.max_batch_messages):
+                chunks.append(current)
+                current, tokens = [], 0
+            current.append(message)
+            tokens += cost
+        if current:
+            chunks.append(current)
+        return chunks
+
+    async def _mine_chunk(self, chunk: list[str], mined: list[MinedChunk], depth: int) -> None:
+        splittable = len(chunk) > 1 and depth < self.config.max_split_depth
+        result, overloaded = await self._request(chunk, splittable)
+        if result is None and overloaded and splittable:
+            middle = len(chunk) // 2
+            LOGGER.info("Splitting keyword batch of %d messages after overload", len(chunk))
+            await self._mine_chunk(chunk[:middle], mined, depth + 1)
+            await self._mine_chunk(chunk[middle:], mined, depth + 1)
+            return
+        mined.append((chunk, result))
 
+    async def _request(
+        self, chunk: list[str], splittable: bool
+    ) -> tuple[dict[str, dict[str, dict[str, int]]] | None, bool]:
         last_error: Exception | None = None
+        overloaded = False
         for attempt in range(self.config.max_retries + 1):
+            started = time.perf_counter()
             try:
-                async with httpx.AsyncClient(timeout=self.config.timeout_seconds) as client:
-                    response = await client.post(endpoint, json=payload)
-                    if response.status_code in {429, 500, 502, 503, 504}:
-                        raise httpx.HTTPStatusError(
-                            f"Retryable status {response.status_code}",
-                            request=response.request,
-                            response=response,
-                        )
-                    response.raise_for_status()
-                    raw = response.json()
-                    return _parse_counts(raw)
+                result = await self._post(chunk)
             except Exception as exc:
                 last_error = exc
+                if isinstance(exc, httpx.TimeoutException):
+                    self._shrink()
+                    break
+                if _is_overload(exc):
+                    overloaded = True
+                    self._shrink()
+                    if splittable:
+                        return None, True
                 if attempt >= self.config.max_retries:
                     break
                 await asyncio.sleep(min(0.5 * (2**attempt), 2.0))
+                continue
+            if time.perf_counter() - started < self.config.timeout_seconds / 4:
+                self._grow()
+            return result, False
 
-        LOGGER.warning("Keyword mining failed: %s", last_error)
-        return {"topics": {}}
+        LOGGER.warning("Keyword mining failed for %d messages: %s", len(chunk), last_error)
+        return None, overloaded
+
+    async def _post(self, chunk: list[str]) -> dict[str, dict[str, dict[str, int]]]:
+        endpoint = f"{self.config.service_url.rstrip('/')}/v1/keywords/extract"
+        async with httpx.AsyncClient(timeout=self.config.timeout_seconds) as client:
+            response = await client.post(endpoint, json={"messages": chunk})
+            if response.status_code in OVERLOAD_STATUSES | RETRYABLE_STATUSES or _is_context_length(response):
+                raise httpx.HTTPStatusError(
+                    f"Retryable status {response.status_code}",
+                    request=response.request,
+                    response=response,
+                )
+            response.raise_for_status()
+            return _parse_counts(response.json())
+
+    def _shrink(self) -> None:
+        budget = max(self.token_budget // 2, self.config.min_token_budget)
+        if budget != self.token_budget:
+            LOGGER.info("Keyword miner token budget shrunk to %d", budget)
+        self.token_budget = budget
+
+    def _grow(self) -> None:
+        self.token_budget = min(self.token_budget + self.token_budget // 4, self.config.max_token_budget)
+
+
+class KeywordMiningPool:
+    def __init__(
+        self,
+        client: KeywordMinerClient,
+        on_result: Callable[[list[str], dict[str, dict[str, dict[str, int]]] | None], None],
+    ) -> None:
+        self.client = client
+        self.on_result = on_result
+        self._queue: asyncio.Queue[list[str] | None] = asyncio.Queue(maxsize=max(client.config.max_pending_batches, 1))
+        self._workers = [asyncio.create_task(self._work()) for _ in range(max(client.config.concurrency, 1))]
+
+    async def submit(self, batch: list[str]) -> None:
+        await self._queue.put(batch)
+
+    async def drain(self) -> None:
+        for _ in self._workers:
+            await self._queue.put(None)
+        await asyncio.gather(*self._workers)
+
+    def cancel(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+
+    async def _work(self) -> None:
+        while True:
+            batch = await self._queue.get()
+            if batch is None:
+                return
+            try:
+                for chunk, result in await self.client.mine(batch):
+                    self.on_result(chunk, result)
+            except Exception:
+                LOGGER.exception("Keyword mining batch of %d messages failed", len(batch))
+
+
+def _is_overload(exc: Exception) -> bool:
+    if not isinstance(exc, httpx.HTTPStatusError):
+        return False
+    return exc.response.status_code in OVERLOAD_STATUSES or _is_context_length(exc.response)
+
+
+def _is_context_length(response: httpx.Response) -> bool:
+    if response.status_code != 400:
+        return False
+    try:
+        body = response.text.lower()
+    except Exception:
+        return False
+    return any(marker in body for marker in CONTEXT_LENGTH_MARKERS)
 
 
 def _parse_counts(raw: Any) -> dict[str, dict[str, dict[str, int]]]:
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import Any
+
+from app.keyword_cache import TERM_TYPES
+from app.review_journal import ReviewedTerm, ReviewJournal
+
+LOGGER = logging.getLogger(__name__)
+
+REVIEW_REASONS = {"add": 1, "ignore": 2}
+PREFIX_END = "\U0010ffff"
+UPSERT_REVIEW = """
+    INSERT INTO terms (topic, term_type, term, occurrences, ignored, reason) VALUES (?, ?, ?, 0, 1, ?)
+    ON CONFLICT (topic, term_type, term) DO UPDATE SET ignored = 1, reason = excluded.reason
+"""
+
+
+def keyword_store_path(stats_path: Path) -> Path:
+    return stats_path.with_suffix(".sqlite")
+
+
+class KeywordStatsStore:
+    def __init__(self, path: Path, stats_path: Path | None = None, journal: ReviewJournal | None = None) -> None:
+        self.path = path
+        self.stats_path = stats_path
+        self.journal = journal
+        self._conn: sqlite3.Connection | None = None
+        self._signature: str | None = None
+        self._journal_signature: tuple[int, int, int] | None = None
+        self._lock = threading.Lock()
+
+    def sync(self) -> bool:
+        imported = self._import_stats()
+        replayed = self._replay_journal()
+        return imported or replayed
+
+    def _import_stats(self) -> bool:
+        if self.stats_path is None:
+            return False
+        try:
+            stat = os.stat(self.stats_path)
+        except FileNotFoundError:
+            return False
+        signature = f"{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}"
+        if signature == self._signature:
+            return False
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT value FROM store_meta WHERE key = 'stats_signature'").fetchone()
+            if row is not None and row[0] == signature:
+                self._signature = signature
+                return False
+            try:
+                raw = json.loads(self.stats_path.read_text(encoding="utf-8"))
+            except ValueError:
+                LOGGER.warning("Skipping import of unreadable %s", self.stats_path)
+                return False
+            rows = list(_stats_rows(raw))
+            with conn:
+                conn.execute("DELETE FROM terms WHERE ignored = 0 AND reason = 0")
+                conn.execute("UPDATE terms SET occurrences = 0")
+                conn.executemany(
+                    """
+                    INSERT INTO terms (topic, term_type, term, occurrences, ignored, reason) VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (topic, term_type, term) DO UPDATE SET
+                        occurrences = excluded.occurrences,
+                        ignored = MAX(terms.ignored, excluded.ignored),
+                        reason = CASE WHEN terms.reason != 0 THEN terms.reason ELSE excluded.reason END
+                    """,
+                    rows,
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO store_meta (key, value) VALUES ('stats_signature', ?)",
+                    (signature,),
+                )
+            self._signature = signature
+        LOGGER.info("Imported %d keyword terms from %s", len(rows), self.stats_path.name)
+        return True
+
+    def _replay_journal(self) -> bool:
+        if self.journal is None:
+            return False
+        signature = self.journal.signature()
+        if signature is None or signature == self._journal_signature:
+            return False
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT value FROM store_meta WHERE key = 'journal_version'").fetchone()
+            applied = int(row[0]) if row is not None else 0
+            with self.journal.locked(shared=True):
+                signature = self.journal.signature()
+                version = self.journal.version()
+                entries = self.journal.entries(after=applied if version >= applied else 0)
+            with conn:
+                conn.executemany(UPSERT_REVIEW, [item for entry in entries for item in entry.items])
+                conn.execute("INSERT OR REPLACE INTO store_meta (key, value) VALUES ('journal_version', ?)", (str(version),))
+            self._journal_signature = signature
+        return bool(entries)
+
+    def topics(self) -> list[str]:
+        with self._lock:
+            return [row[0] for row in self._connection().execute("SELECT DISTINCT topic FROM terms ORDER BY topic")]
+
+    def suggestions(self, topic: str, limit: int, offset: int = 0, prefix: str = "") -> tuple[list[dict[str, Any]], int]:
+        where = "topic = ? AND ignored = 0"
+        params: list[Any] = [topic.strip().lower()]
+        cleaned_prefix = prefix.lstrip().lower()
+        if cleaned_prefix:
+            where += " AND term >= ? AND term < ?"
+            params += [cleaned_prefix, cleaned_prefix + PREFIX_END]
+        with self._lock:
+            conn = self._connection()
+            total = int(conn.execute(f"SELECT COUNT(*) FROM terms WHERE {where}", params).fetchone()[0])
+            rows = conn.execute(
+                f"SELECT term, term_type, occurrences FROM terms WHERE {where} ORDER BY occurrences DESC, term LIMIT ? OFFSET ?",
+                [*params, limit, offset],
+            ).fetchall()
+        value = [
+            {"term": term, "type": "keyword" if term_type == "keywords" else "phrase", "score": occurrences}
+            for term, term_type, occurrences in rows
+        ]
+        return value, total
+
+    def apply_review(self, reviews: Iterable[ReviewedTerm]) -> int:
+        rows = list(reviews)
+        with self._lock:
+            with self._connection() as conn:
+                conn.executemany(UPSERT_REVIEW, rows)
+        return len(rows)
+
+    def reviewed(self) -> Iterator[ReviewedTerm]:
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT topic, term_type, term, reason FROM terms WHERE ignored != 0 OR reason != 0"
+            ).fetchall()
+        yield from rows
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is not None:
+            return self._conn
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS terms (
+                topic TEXT NOT NULL,
+                term_type TEXT NOT NULL,
+                term TEXT NOT NULL,
+                occurrences INTEGER NOT NULL,
+                ignored INTEGER NOT NULL,
+                reason INTEGER NOT NULL,
+                PRIMARY KEY (topic, term_type, term)
+            ) WITHOUT ROWID
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS terms_ranked ON terms (topic, ignored, occurrences DESC, term)")
+        conn.execute("CREATE INDEX IF NOT EXISTS terms_prefix ON terms (topic, ignored, term)")
+        conn.execute("CREATE TABLE IF NOT EXISTS store_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID")
+        self._conn = conn
+        return conn
+
+
+def _stats_rows(raw: Any) -> Iterator[tuple[str, str, str, int, int, int]]:
+    topics = raw.get("topics", {}) if isinstance(raw, dict) else {}
+    if not isinstance(topics, dict):
+        return
+    for topic, payload in topics.items():
+        if not isinstance(payload, dict):
+            continue
+        cleaned_topic = str(topic).strip().lower()
+        for term_type in TERM_TYPES:
+            terms = payload.get(term_type, {})
+            if not isinstance(terms, dict):
+                continue
+            for term, meta in terms.items():
+                cleaned = str(term).strip().lower()
+                if not cleaned_topic or not cleaned or not isinstance(meta, dict):
+                    continue
+                reason = int(meta.get("reasonForIgnore", 0))
+                yield (
+                    cleaned_topic,
+                    term_type,
+                    cleaned,
+                    max(int(meta.get("occurrences", 0)), 0),
+                    int(bool(meta.get("ignored", False))),
+                    reason if reason in REVIEW_REASONS.values() else 0,
+                )
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Any
+
+TOKEN_RE = re.compile(r"[a-z][a-z0-9'_-]+")
+STOPWORDS = frozenset(
+    """
+    a about after again all also am an and any are as at be because been before being between both but by can
+    could did do does doing down during each few for from further had has have having he her here hers him his
+    how i if in into is it its itself just me more most my no nor not now of off on once only or other our ours
+    out over own same she should so some such than that the their theirs them then there these they this those
+    through to too under until up very was we were what when where which while who whom why will with would you
+    your yours ok okay thanks thank hi hello please yes get got let lets i'm it's don't can't we're you're
+    """.split()
+)
+BACKGROUND_TOPIC = "normal"
+
+
+class LocalKeywordMiner:
+    def __init__(self, top_terms: int = 50, min_count: int = 3, min_z_score: float = 1.96) -> None:
+        self.top_terms = top_terms
+        self.min_count = min_count
+        self.min_z_score = min_z_score
+        self.unigrams: dict[str, Counter[str]] = defaultdict(Counter)
+        self.bigrams: dict[str, Counter[str]] = defaultdict(Counter)
+        self.messages = 0
+
+    def add(self, topic: str, text: str) -> None:
+        tokens = [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+        self.unigrams[topic].update(tokens)
+        self.bigrams[topic].update(f"{first} {second}" for first, second in zip(tokens, tokens[1:]))
+        self.messages += 1
+
+    def result(self) -> dict[str, Any]:
+        keywords = self._rank(self.unigrams)
+        phrases = self._rank(self.bigrams)
+        topics: dict[str, dict[str, dict[str, int]]] = {}
+        for topic in sorted(set(keywords) | set(phrases)):
+            topics[topic] = {"keywords": keywords.get(topic, {}), "phrases": phrases.get(topic, {})}
+        return {"topics": topics}
+
+    def _rank(self, counts: dict[str, Counter[str]]) -> dict[str, dict[str, int]]:
+        totals: Counter[str] = Counter()
+        for counter in counts.values():
+            totals.update(counter)
+        corpus_size = sum(totals.values())
+        if not corpus_size:
+            return {}
+        # Log-odds ratio with an informative Dirichlet prior (Monroe et al., 2008), scaled so the
+        # prior carries as much weight as an average vocabulary entry.
+        prior_scale = len(totals) / corpus_size
+        prior_total = corpus_size * prior_scale
+        ranked: dict[str, dict[str, int]] = {}
+        for topic, counter in counts.items():
+            if topic == BACKGROUND_TOPIC:
+                continue
+            topic_size = sum(counter.values())
+            rest_size = corpus_size - topic_size
+            scored: list[tuple[float, str, int]] = []
+            for term, count in counter.items():
+                if count < self.min_count:
+                    continue
+                prior = totals[term] * prior_scale
+                rest = totals[term] - count
+                topic_other = topic_size + prior_total - count - prior
+                rest_other = rest_size + prior_total - rest - prior
+                if topic_other <= 0 or rest_other <= 0:
+                    continue
+                delta = math.log((count + prior) / topic_other) - math.log((rest + prior) / rest_other)
+                z_score = delta / math.sqrt(1 / (count + prior) + 1 / (rest + prior))
+                if z_score >= self.min_z_score:
+                    scored.append((z_score, term, count))
+            scored.sort(key=lambda item: (-item[0], item[1]))
+            if scored:
+                ranked[topic] = {term: count for _, term, count in scored[: self.top_terms]}
+        return ranked
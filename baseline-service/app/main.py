@@ -4,31 +4,89 @@ import asyncio
 import json
 import logging
 import os
+from collections.abc import Iterator
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Literal
+from typing import Annotated, Any, Literal
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query, Response
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel, Field
 
-from app.baseline_builder import BaselineBuilder, BuildStatus
-from app.graph_client import GraphClient
-from app.keyword_miner import KeywordMinerClient, KeywordMinerConfig
+from app.baseline_builder import BuildStatus, ShardSpec
+from app.build_metrics import render_prometheus
+from app.build_worker import BuildCancelled, BuildJob, BuildProcess, build_job_settings_from_env, make_builder
+from app.classifier_artifact import ARTIFACT_NAME, write_classifier_artifact
+from app.baseline_cache import BaselineCache, LoadedBaseline, etag_matches
+from app.keyword_store import REVIEW_REASONS, KeywordStatsStore, keyword_store_path
+from app.reload_notifier import ReloadNotifier, ReloadNotifierConfig, parse_webhook_urls
+from app.review_journal import ReviewJournal, add_terms_to_rules, mark_reviewed, review_journal_path, write_json_atomic
+from app.snapshots import Snapshot, SnapshotRegistry
+from app.term_index import ReclassificationResult, Reclassifier
+from app.topic_classifier import RULES_REGISTRY, reload_topic_rules, topic_rules_path
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
 
 BASE_URL_DEFAULT = "http://127.0.0.1:8000"
 OUTPUT_PATH = Path(__file__).resolve().parents[1] / "baseline.json"
+INDEXED_OUTPUT_PATH = Path(__file__).resolve().parents[1] / "baseline.bin"
+OUTPUT_FORMAT = os.getenv("BASELINE_OUTPUT_FORMAT", "json")
 KEYWORD_STATS_PATH = Path(__file__).resolve().parents[1] / "keyword_stats.json"
-TOPIC_RULES_PATH = Path(__file__).resolve().parent / "config" / "topic_keywords.json"
+KEYWORD_CACHE_SETTING = os.getenv("KEYWORD_MINER_CACHE", str(Path(__file__).resolve().parents[1] / "keyword_cache.sqlite"))
+KEYWORD_CACHE_PATH = Path(KEYWORD_CACHE_SETTING) if KEYWORD_CACHE_SETTING else None
+PARTIAL_DIR = Path(os.getenv("BASELINE_PARTIAL_DIR", str(Path(__file__).resolve().parents[1] / "partials")))
+FEATURE_CACHE_PATH = Path(os.environ["BASELINE_FEATURE_CACHE"]) if os.getenv("BASELINE_FEATURE_CACHE") else None
+SNAPSHOT_DIR = Path(os.getenv("BASELINE_SNAPSHOT_DIR", str(Path(__file__).resolve().parents[1] / "snapshots")))
+REVIEW_COMPACT_AFTER = int(os.getenv("KEYWORD_REVIEW_COMPACT_AFTER", "50"))
+CLASSIFIER_ARTIFACT_PATH = Path(
+    os.getenv("TOPIC_CLASSIFIER_ARTIFACT", str(Path(__file__).resolve().parents[1] / ARTIFACT_NAME))
+)
+TOPIC_RULES_POLL_SECONDS = float(os.getenv("TOPIC_RULES_POLL_SECONDS", "30"))
 
 app = FastAPI(title="Topic-Aware Baseline Builder", version="1.0.0")
 app.state.status = BuildStatus()
 app.state.task = None
+app.state.build_worker = BuildProcess()
 app.state.lock = asyncio.Lock()
+app.state.snapshots = SnapshotRegistry(
+    SNAPSHOT_DIR,
+    keep=int(os.getenv("BASELINE_SNAPSHOT_KEEP", "5")),
+    mirror_paths={"json": OUTPUT_PATH, "indexed": INDEXED_OUTPUT_PATH},
+)
+app.state.baseline_cache = BaselineCache()
+app.state.keyword_store = KeywordStatsStore(
+    keyword_store_path(KEYWORD_STATS_PATH),
+    KEYWORD_STATS_PATH,
+    ReviewJournal(review_journal_path(topic_rules_path())),
+)
+app.state.reclassifier = Reclassifier(FEATURE_CACHE_PATH) if FEATURE_CACHE_PATH is not None else None
+app.state.reload_notifier = ReloadNotifier(
+    ReloadNotifierConfig(
+        webhook_urls=parse_webhook_urls(os.getenv("BASELINE_RELOAD_WEBHOOKS")),
+        timeout_seconds=float(os.getenv("BASELINE_RELOAD_WEBHOOK_TIMEOUT_SECONDS", "2.0")),
+    )
+)
+
+
+@app.on_event("startup")
+def startup() -> None:
+    RULES_REGISTRY.start_polling(TOPIC_RULES_POLL_SECONDS)
+
+
+@app.on_event("shutdown")
+def shutdown() -> None:
+    RULES_REGISTRY.stop_polling()
 
 
 class BuildRequest(BaseModel):
     days: int = Field(default=35, ge=1, le=365)
+    windows: list[Annotated[int, Field(ge=1, le=365)]] = Field(default_factory=list, max_length=8)
+    shard: str | None = Field(default=None, pattern=r"^\d+/\d+$")
+    replay: bool = False
+
+
+class BaselineBatchGetRequest(BaseModel):
+    user_ids: list[str] = Field(min_length=1, max_length=1000)
 
 
 class KeywordReviewItem(BaseModel):
@@ -45,6 +103,14 @@ class KeywordReviewRequest(BaseModel):
 @app.post("/v1/baseline/build")
 async def build_baseline(request: BuildRequest | None = None) -> dict[str, str]:
     days = request.days if request else 35
+    windows = request.windows if request else []
+    replay = request.replay if request else False
+    if replay and FEATURE_CACHE_PATH is None:
+        raise HTTPException(status_code=422, detail="replay needs BASELINE_FEATURE_CACHE")
+    try:
+        shard = ShardSpec.parse(request.shard) if request and request.shard else None
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from None
     status: BuildStatus = app.state.status
 
     if status.state == "running":
@@ -52,175 +118,334 @@ async def build_baseline(request: BuildRequest | None = None) -> dict[str, str]:
 
     async def _runner() -> None:
         async with app.state.lock:
+            snapshots: SnapshotRegistry = app.state.snapshots
+            snapshot = None
             try:
-                base_url = os.getenv("GRAPH_BASE_URL", BASE_URL_DEFAULT)
-                keyword_miner = KeywordMinerClient(
-                    KeywordMinerConfig(
-                        enabled=os.getenv("USE_LLM_KEYWORD_MINER", "false").lower() == "true",
-                        service_url=os.getenv("KEYWORD_MINER_URL", "http://127.0.0.1:8030"),
-                        timeout_seconds=float(os.getenv("KEYWORD_MINER_TIMEOUT_SECONDS", "3.0")),
-                        max_retries=int(os.getenv("KEYWORD_MINER_MAX_RETRIES", "3")),
-                    )
-                )
-                builder = BaselineBuilder(
-                    GraphClient(base_url=base_url),
-                    OUTPUT_PATH,
-                    status,
-                    keyword_miner=keyword_miner,
+                snapshot = snapshots.allocate(OUTPUT_FORMAT) if shard is None else None
+                job = BuildJob(
+                    days=days,
+                    windows=windows,
+                    shard=shard,
+                    feature_cache_path=FEATURE_CACHE_PATH,
+                    replay=replay,
+                    base_url=os.getenv("GRAPH_BASE_URL", BASE_URL_DEFAULT),
+                    output_path=snapshot.path if snapshot is not None else PARTIAL_DIR / shard.partial_name(),
+                    output_format=OUTPUT_FORMAT,
                     keyword_stats_path=KEYWORD_STATS_PATH,
-                    keyword_batch_size=int(os.getenv("KEYWORD_MINER_BATCH_SIZE", "200")),
+                    keyword_cache_path=KEYWORD_CACHE_PATH,
+                    **build_job_settings_from_env(),
                 )
-                await builder.build(days=days)
+                worker: BuildProcess = app.state.build_worker
+                worker.start(job)
+                try:
+                    await worker.wait()
+                finally:
+                    status.users_processed, status.messages_processed = worker.progress()
+                    status.topic_cache = worker.topic_cache
+                    status.metrics = worker.metrics
+                if snapshot is None:
+                    status.state = "completed"
+                    return
+                await asyncio.to_thread(_publish_classifier)
+                snapshots.publish(snapshot)
+                status.generation = snapshot.generation
+                status.state = "completed"
+                await app.state.reload_notifier.notify(snapshot.generation)
+            except BuildCancelled:
+                status.state = "cancelled"
+                logging.info("Baseline build cancelled")
             except Exception as exc:
                 status.state = "failed"
                 status.error = str(exc)
                 logging.exception("Baseline build failed")
-
+            if snapshot is not None and status.state != "completed":
+                snapshots.discard(snapshot)
+
+    status.state = "running"
+    status.users_processed = 0
+    status.messages_processed = 0
+    status.error = None
+    status.topic_cache = None
+    status.metrics = None
     app.state.task = asyncio.create_task(_runner())
     return {"status": "started"}
 
 
+@app.post("/v1/baseline/build/cancel", status_code=202)
+def cancel_baseline_build() -> dict[str, str]:
+    worker: BuildProcess = app.state.build_worker
+    if not worker.cancel():
+        raise HTTPException(status_code=409, detail="no baseline build is running")
+    return {"status": "cancelling"}
+
+
 @app.get("/v1/baseline/status")
-def baseline_status() -> dict[str, int | str]:
+def baseline_status() -> dict[str, Any]:
     status: BuildStatus = app.state.status
+    worker: BuildProcess = app.state.build_worker
+    if status.state == "running":
+        status.users_processed, status.messages_processed = worker.progress()
+        status.metrics = worker.metrics
     return {
         "state": status.state,
         "users_processed": status.users_processed,
         "messages_processed": status.messages_processed,
+        "generation": status.generation,
+        "error": status.error,
+        "topic_cache": status.topic_cache,
+        "metrics": status.metrics,
     }
 
 
-@app.get("/v1/baseline/{user_id}")
-def get_user_baseline(user_id: str) -> dict:
-    if not OUTPUT_PATH.exists():
-        raise HTTPException(status_code=404, detail="baseline.json not found")
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics() -> str:
+    return render_prometheus(baseline_status())
+
 
-    payload = json.loads(OUTPUT_PATH.read_text(encoding="utf-8"))
-    users = payload.get("users", {})
-    if user_id not in users:
+@app.get("/v1/baseline/generations")
+def list_baseline_generations() -> dict:
+    snapshots: SnapshotRegistry = app.state.snapshots
+    current = snapshots.current()
+    return {
+        "current": current.generation if current else None,
+        "value": snapshots.generations(),
+    }
+
+
+@app.post("/v1/baseline/generations/{generation}/activate")
+async def activate_baseline_generation(generation: int) -> dict:
+    snapshots: SnapshotRegistry = app.state.snapshots
+    try:
+        snapshot = snapshots.activate(generation)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"generation {generation} not found") from None
+    notified = await app.state.reload_notifier.notify(snapshot.generation)
+    return {"status": "activated", "generation": snapshot.generation, "notified": notified}
+
+
+@app.post("/v1/baseline/rollback")
+async def rollback_baseline_generation() -> dict:
+    snapshots: SnapshotRegistry = app.state.snapshots
+    try:
+        snapshot = snapshots.rollback()
+    except LookupError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from None
+    notified = await app.state.reload_notifier.notify(snapshot.generation)
+    return {"status": "activated", "generation": snapshot.generation, "notified": notified}
+
+
+@app.post("/v1/baseline/users:batchGet")
+def batch_get_user_baselines(payload: BaselineBatchGetRequest) -> dict:
+    users: dict[str, dict] = {}
+    etags: dict[str, str] = {}
+    missing: list[str] = []
+    with _leased_baseline() as loaded:
+        for user_id in dict.fromkeys(payload.user_ids):
+            found = loaded.get(user_id)
+            if found is None:
+                missing.append(user_id)
+                continue
+            users[user_id], etags[user_id] = found
+    return {"users": users, "etags": etags, "missing": missing}
+
+
+@app.get("/v1/baseline/{user_id}", response_model=None)
+def get_user_baseline(
+    user_id: str,
+    response: Response,
+    if_none_match: str | None = Header(default=None),
+) -> dict | Response:
+    with _leased_baseline() as loaded:
+        found = loaded.get(user_id)
+    if found is None:
         raise HTTPException(status_code=404, detail=f"user '{user_id}' baseline not found")
-    return users[user_id]
+    baseline, etag = found
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return baseline
 
 
 @app.get("/v1/keywords/topics")
 def list_keyword_topics() -> dict[str, list[str]]:
-    stats = _read_keyword_stats()
-    topics = stats.get("topics", {})
-    if not isinstance(topics, dict):
-        return {"topics": []}
-    return {"topics": sorted([str(topic) for topic in topics.keys()])}
+    return {"topics": _synced_keyword_store().topics()}
 
 
 @app.get("/v1/keywords/suggestions")
-def list_keyword_suggestions(topic: str) -> dict[str, list[dict[str, int | str]]]:
-    stats = _read_keyword_stats()
-    topics = stats.get("topics", {})
-    if not isinstance(topics, dict):
-        return {"value": []}
-    topic_data = topics.get(topic, {})
-    if not isinstance(topic_data, dict):
-        return {"value": []}
-
-    rows: list[dict[str, int | str]] = []
-    for raw_type in ("keywords", "phrases"):
-        items = topic_data.get(raw_type, {})
-        if not isinstance(items, dict):
-            continue
-        for term, meta in items.items():
-            if not isinstance(meta, dict):
-                continue
-            if bool(meta.get("ignored", False)):
-                continue
-            rows.append(
-                {
-                    "term": str(term),
-                    "type": "keyword" if raw_type == "keywords" else "phrase",
-                    "score": int(meta.get("occurrences", 0)),
-                }
-            )
-
-    rows.sort(key=lambda row: (-int(row["score"]), str(row["term"])))
-    return {"value": rows}
+def list_keyword_suggestions(
+    topic: str,
+    limit: int = Query(default=200, ge=1, le=1000),
+    offset: int = Query(default=0, ge=0),
+    prefix: str = Query(default="", max_length=200),
+) -> dict[str, Any]:
+    rows, total = _synced_keyword_store().suggestions(topic, limit, offset, prefix)
+    return {"value": rows, "total": total, "limit": limit, "offset": offset}
 
 
 @app.post("/v1/keywords/review")
-def submit_keyword_review(payload: KeywordReviewRequest) -> dict[str, int]:
-    if not payload.items:
-        return {"updated": 0}
-
-    stats = _read_keyword_stats()
-    topics = stats.setdefault("topics", {})
-    if not isinstance(topics, dict):
-        raise HTTPException(status_code=500, detail="keyword_stats.json malformed")
-
-    rules = _read_topic_rules()
-    updated = 0
-
+async def submit_keyword_review(payload: KeywordReviewRequest) -> dict:
+    reclassifier: Reclassifier | None = app.state.reclassifier
+    added_terms = [item.term for item in payload.items if item.action == "add" and item.term.strip()]
+    if reclassifier is not None and added_terms:
+        await asyncio.to_thread(reclassifier.prepare)
+
+    updated, rules_version, rules_changed = await asyncio.to_thread(_apply_keyword_review, payload)
+    response: dict = {"updated": updated, "rules_version": rules_version}
+    if not rules_changed:
+        return response
+    response["classifier_version"] = await asyncio.to_thread(_publish_classifier)
+    generation: int | None = None
+    if reclassifier is not None and added_terms:
+        try:
+            async with app.state.lock:
+                summary = await asyncio.to_thread(_reclassify_and_publish, reclassifier, added_terms)
+        except Exception as exc:
+            logging.exception("Targeted reclassification failed")
+            summary = {"error": str(exc)}
+        generation = summary.get("generation")
+        response["reclassification"] = summary
+    if generation is None:
+        snapshots: SnapshotRegistry = app.state.snapshots
+        current = snapshots.current()
+        generation = current.generation if current is not None else None
+    if generation is not None:
+        await app.state.reload_notifier.notify(generation)
+    return response
+
+
+def _publish_classifier() -> str:
+    return write_classifier_artifact(CLASSIFIER_ARTIFACT_PATH, reload_topic_rules())
+
+
+def _apply_keyword_review(payload: KeywordReviewRequest) -> tuple[int, int, bool]:
+    store: KeywordStatsStore = app.state.keyword_store
+    journal: ReviewJournal = store.journal
+    reviews: list[tuple[str, str, str, int]] = []
     for item in payload.items:
         topic = item.topic.strip().lower()
         term = item.term.strip().lower()
-        if not topic or not term:
-            continue
-
-        topic_stats = topics.setdefault(topic, {"keywords": {}, "phrases": {}})
-        if not isinstance(topic_stats, dict):
-            continue
-        bucket_key = "keywords" if item.termType == "keyword" else "phrases"
-        bucket = topic_stats.setdefault(bucket_key, {})
-        if not isinstance(bucket, dict):
-            continue
-        entry = bucket.setdefault(term, {"occurrences": 0, "ignored": False, "reasonForIgnore": 0})
-        if not isinstance(entry, dict):
-            continue
-
-        entry["ignored"] = True
-        entry["reasonForIgnore"] = 1 if item.action == "add" else 2
-        if "occurrences" not in entry:
-            entry["occurrences"] = 0
-        updated += 1
-
-        if item.action == "add":
-            _add_term_to_rules(rules, topic, term, item.termType)
-
-    _write_keyword_stats(stats)
-    _write_topic_rules(rules)
-    return {"updated": updated}
-
-
-def _read_keyword_stats() -> dict:
-    if not KEYWORD_STATS_PATH.exists():
-        return {"meta": {}, "topics": {}}
-    raw = json.loads(KEYWORD_STATS_PATH.read_text(encoding="utf-8"))
-    return raw if isinstance(raw, dict) else {"meta": {}, "topics": {}}
-
-
-def _write_keyword_stats(payload: dict) -> None:
-    KEYWORD_STATS_PATH.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+        if topic and term:
+            term_type = "keywords" if item.termType == "keyword" else "phrases"
+            reviews.append((topic, term_type, term, REVIEW_REASONS[item.action]))
+    if not reviews:
+        with journal.locked(shared=True):
+            return 0, journal.version(), False
+
+    version, pending = journal.append(reviews)
+    store.sync()
+    if pending >= REVIEW_COMPACT_AFTER:
+        try:
+            _compact_keyword_reviews()
+        except Exception:
+            logging.exception("Keyword review compaction failed; entries stay in the journal")
+    return len(reviews), version, any(reason == REVIEW_REASONS["add"] for _, _, _, reason in reviews)
+
+
+def _compact_keyword_reviews() -> int:
+    store: KeywordStatsStore = app.state.keyword_store
+    journal: ReviewJournal = store.journal
+    with journal.locked():
+        entries = journal.entries()
+        if not entries:
+            return 0
+        rules = _read_topic_rules()
+        add_terms_to_rules(rules, entries)
+        write_json_atomic(topic_rules_path(), rules)
+        stats = json.loads(KEYWORD_STATS_PATH.read_text(encoding="utf-8")) if KEYWORD_STATS_PATH.exists() else {}
+        if not isinstance(stats, dict):
+            stats = {}
+        mark_reviewed(stats, entries)
+        write_json_atomic(KEYWORD_STATS_PATH, stats)
+        journal.reset(entries[-1].version)
+    store.sync()
+    logging.info("Compacted %d keyword review batches up to version %d", len(entries), entries[-1].version)
+    return len(entries)
+
+
+def _reclassify_and_publish(reclassifier: Reclassifier, terms: list[str]) -> dict:
+    result = reclassifier.reclassify(terms)
+    summary: dict = {
+        "terms": result.terms,
+        "candidate_messages": result.candidate_messages,
+        "changed_messages": result.changed_messages,
+        "republished_users": 0,
+        "generation": None,
+    }
+    snapshots: SnapshotRegistry = app.state.snapshots
+    current = snapshots.current()
+    if not result.sender_ids or current is None or FEATURE_CACHE_PATH is None:
+        return summary
+
+    cache: BaselineCache = app.state.baseline_cache
+    with cache.lease(current.path) as loaded:
+        if loaded is None:
+            return summary
+        snapshot = snapshots.allocate(current.format)
+        replacements = _republish(snapshot, current, loaded, result)
+    summary["republished_users"] = len(replacements)
+    summary["generation"] = snapshot.generation
+    return summary
+
+
+def _republish(
+    snapshot: Snapshot,
+    current: Snapshot,
+    loaded: LoadedBaseline,
+    result: ReclassificationResult,
+) -> dict[str, dict]:
+    snapshots: SnapshotRegistry = app.state.snapshots
+    meta = loaded.meta
+    windows = meta.get("windows")
+    job = BuildJob(
+        days=int(meta.get("days", 35)),
+        windows=[int(window) for window in windows] if isinstance(windows, dict) else [],
+        base_url=str(meta.get("base_url") or BASE_URL_DEFAULT),
+        output_path=snapshot.path,
+        output_format=current.format,
+        keyword_stats_path=KEYWORD_STATS_PATH,
+        **build_job_settings_from_env(),
+    )
+    builder = make_builder(job, BuildStatus())
+    try:
+        replacements = builder.rebuild_senders(FEATURE_CACHE_PATH, result.sender_ids, job.days, job.windows or None)
+        reclassified = {"from_generation": current.generation, "terms": result.terms, "users": sorted(replacements)}
+        builder.write_patched({**meta, "reclassified": reclassified}, loaded.items(), replacements)
+        snapshots.publish(snapshot)
+    except Exception:
+        snapshots.discard(snapshot)
+        raise
+    return replacements
+
+
+@contextmanager
+def _leased_baseline() -> Iterator[LoadedBaseline]:
+    output_path = _active_baseline_path()
+    cache: BaselineCache = app.state.baseline_cache
+    with cache.lease(output_path) as loaded:
+        if loaded is None:
+            raise HTTPException(status_code=404, detail=f"{output_path.name} not found")
+        yield loaded
+
+
+def _active_baseline_path() -> Path:
+    snapshots: SnapshotRegistry = app.state.snapshots
+    current = snapshots.current()
+    if current is not None:
+        return current.path
+    return INDEXED_OUTPUT_PATH if OUTPUT_FORMAT == "indexed" else OUTPUT_PATH
+
+
+def _synced_keyword_store() -> KeywordStatsStore:
+    store: KeywordStatsStore = app.state.keyword_store
+    store.sync()
+    return store
 
 
 def _read_topic_rules() -> dict:
-    if not TOPIC_RULES_PATH.exists():
+    path = topic_rules_path()
+    if not path.exists():
         raise HTTPException(status_code=500, detail="topic keywords config missing")
-    raw = json.loads(TOPIC_RULES_PATH.read_text(encoding="utf-8"))
+    raw = json.loads(path.read_text(encoding="utf-8"))
     if not isinstance(raw, dict):
         raise HTTPException(status_code=500, detail="topic keywords config malformed")
     return raw
-
-
-def _write_topic_rules(payload: dict) -> None:
-    TOPIC_RULES_PATH.write_text(json.dumps(payload, indent=2), encoding="utf-8")
-
-
-def _add_term_to_rules(rules: dict, topic: str, term: str, term_type: str) -> None:
-    topics = rules.setdefault("topics", {})
-    if not isinstance(topics, dict):
-        return
-    topic_entry = topics.setdefault(topic, {"single_keywords": [], "phrases": []})
-    if not isinstance(topic_entry, dict):
-        return
-    list_key = "single_keywords" if term_type == "keyword" else "phrases"
-    terms = topic_entry.setdefault(list_key, [])
-    if not isinstance(terms, list):
-        return
-    if term not in [str(item).lower() for item in terms]:
-        terms.append(term)
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import hashlib
+import os
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass
+class RecipientSketchConfig:
+    exact_threshold: int = 2000
+    width: int = 1024
+    depth: int = 4
+    top_k: int = 64
+
+
+def recipient_sketch_config_from_env() -> RecipientSketchConfig | None:
+    threshold = int(os.getenv("BASELINE_SKETCH_THRESHOLD", "0") or "0")
+    if threshold <= 0:
+        return None
+    return RecipientSketchConfig(
+        exact_threshold=threshold,
+        width=int(os.getenv("BASELINE_SKETCH_WIDTH", "1024")),
+        depth=int(os.getenv("BASELINE_SKETCH_DEPTH", "4")),
+        top_k=int(os.getenv("BASELINE_SKETCH_TOP_K", "64")),
+    )
+
+
+class CountMinSketch:
+    def __init__(self, width: int, depth: int, rows: list[list[int]] | None = None, total: int = 0) -> None:
+        if width < 2 or depth < 1:
+            raise ValueError("Count-Min sketch needs width >= 2 and depth >= 1")
+        self.width = width
+        self.depth = depth
+        self.rows = rows if rows is not None else [[0] * width for _ in range(depth)]
+        self.total = total
+
+    def add(self, item: str, count: int = 1) -> int:
+        estimate: int | None = None
+        for row, index in zip(self.rows, bucket_indexes(item, self.width, self.depth)):
+            row[index] += count
+            estimate = row[index] if estimate is None else min(estimate, row[index])
+        self.total += count
+        return estimate or 0
+
+    def estimate(self, item: str) -> int:
+        return min(row[index] for row, index in zip(self.rows, bucket_indexes(item, self.width, self.depth)))
+
+    def merge(self, other: CountMinSketch) -> None:
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("Cannot merge Count-Min sketches with different dimensions")
+        for row, other_row in zip(self.rows, other.rows):
+            for index, value in enumerate(other_row):
+                if value:
+                    row[index] += value
+        self.total += other.total
+
+
+class HeavyHitterSketch:
+    def __init__(self, width: int, depth: int, top_k: int) -> None:
+        self.counts = CountMinSketch(width, depth)
+        self.top_k = max(top_k, 1)
+        self.heavy: dict[str, int] = {}
+        self._floor = 0
+
+    @classmethod
+    def from_counter(cls, counter: Counter[str], config: RecipientSketchConfig) -> HeavyHitterSketch:
+        sketch = cls(config.width, config.depth, config.top_k)
+        for item, count in counter.items():
+            sketch.add(item, count)
+        return sketch
+
+    @classmethod
+    def from_dict(cls, raw: dict[str, Any], heavy_hitters: dict[str, int], top_k: int) -> HeavyHitterSketch:
+        width = int(raw["width"])
+        depth = int(raw["depth"])
+        sketch = cls(width, depth, top_k)
+        rows = [[int(value) for value in row] for row in raw["rows"]]
+        sketch.counts = CountMinSketch(width, depth, rows, int(raw.get("total", 0)))
+        sketch.heavy = {str(item): int(count) for item, count in heavy_hitters.items()}
+        sketch._refresh_floor()
+        return sketch
+
+    def add(self, item: str, count: int = 1) -> None:
+        estimate = self.counts.add(item, count)
+        if item in self.heavy:
+            previous = self.heavy[item]
+            self.heavy[item] = estimate
+            if previous <= self._floor:
+                self._refresh_floor()
+        elif len(self.heavy) < self.top_k:
+            self.heavy[item] = estimate
+            self._refresh_floor()
+        elif estimate > self._floor:
+            evicted = min(self.heavy, key=lambda key: (self.heavy[key], key))
+            del self.heavy[evicted]
+            self.heavy[item] = estimate
+            self._refresh_floor()
+
+    def estimate(self, item: str) -> int:
+        return self.counts.estimate(item)
+
+    def merge(self, other: HeavyHitterSketch) -> None:
+        self.counts.merge(other.counts)
+        candidates = set(self.heavy) | set(other.heavy)
+        ranked = sorted(((self.counts.estimate(item), item) for item in candidates), key=lambda pair: (-pair[0], pair[1]))
+        self.heavy = {item: estimate for estimate, item in ranked[: self.top_k]}
+        self._refresh_floor()
+
+    def heavy_hitters(self) -> dict[str, int]:
+        estimates = {item: self.counts.estimate(item) for item in self.heavy}
+        return {item: estimates[item] for item in sorted(estimates, key=lambda key: (-estimates[key], key))}
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "width": self.counts.width,
+            "depth": self.counts.depth,
+            "total": self.counts.total,
+            "rows": self.counts.rows,
+        }
+
+    def _refresh_floor(self) -> None:
+        self._floor = min(self.heavy.values()) if len(self.heavy) >= self.top_k else 0
+
+
+def bucket_indexes(item: str, width: int, depth: int) -> list[int]:
+    digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+    first = int.from_bytes(digest[:8], "little")
+    second = int.from_bytes(digest[8:], "little") | 1
+    return [(first + row * second) % width for row in range(depth)]
+
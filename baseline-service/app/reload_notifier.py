@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+
+import httpx
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class ReloadNotifierConfig:
+    webhook_urls: list[str] = field(default_factory=list)
+    timeout_seconds: float = 2.0
+    max_retries: int = 2
+
+
+class ReloadNotifier:
+    def __init__(self, config: ReloadNotifierConfig) -> None:
+        self.config = config
+
+    async def notify(self, generation: int) -> dict[str, bool]:
+        if not self.config.webhook_urls:
+            return {}
+        async with httpx.AsyncClient(timeout=self.config.timeout_seconds) as client:
+            results = await asyncio.gather(*(self._post(client, url, generation) for url in self.config.webhook_urls))
+        return dict(zip(self.config.webhook_urls, results))
+
+    async def _post(self, client: httpx.AsyncClient, url: str, generation: int) -> bool:
+        last_error: Exception | None = None
+        for attempt in range(self.config.max_retries + 1):
+            try:
+                response = await client.post(url, json={"generation": generation})
+                response.raise_for_status()
+                LOGGER.info("Notified %s of baseline generation %d", url, generation)
+                return True
+            except httpx.HTTPError as exc:
+                last_error = exc
+                if attempt >= self.config.max_retries:
+                    break
+                await asyncio.sleep(min(0.5 * (2**attempt), 2.0))
+
+        LOGGER.warning("Baseline reload webhook %s failed: %s", url, last_error)
+        return False
+
+
+def parse_webhook_urls(raw: str | None) -> list[str]:
+    if not raw:
+        return []
+    return [url.strip() for url in raw.split(",") if url.strip()]
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import fcntl
+import json
+import logging
+import os
+import tempfile
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from app.baseline_writer import publish_file
+
+LOGGER = logging.getLogger(__name__)
+
+JOURNAL_NAME = "keyword_review.journal"
+ADDED = 1
+
+ReviewedTerm = tuple[str, str, str, int]
+
+
+@dataclass
+class ReviewEntry:
+    version: int
+    items: list[ReviewedTerm]
+
+
+def review_journal_path(rules_path: Path) -> Path:
+    return rules_path.with_name(JOURNAL_NAME)
+
+
+class ReviewJournal:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.lock_path = path.with_name(f"{path.name}.lock")
+        self._tail: tuple[tuple[int, int, int], int, int] | None = None
+
+    @contextmanager
+    def locked(self, shared: bool = False) -> Iterator[None]:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def append(self, items: list[ReviewedTerm]) -> tuple[int, int]:
+        with self.locked():
+            signature = self.signature()
+            if self._tail is not None and self._tail[0] == signature:
+                _, version, pending = self._tail
+            else:
+                base_version, entries = self._read()
+                version = entries[-1].version if entries else base_version
+                pending = len(entries)
+            version += 1
+            line = json.dumps({"version": version, "items": items}, separators=(",", ":")) + "\n"
+            with self.path.open("a", encoding="utf-8") as handle:
+                handle.write(line)
+                handle.flush()
+                os.fsync(handle.fileno())
+            pending += 1
+            self._tail = (self.signature(), version, pending)
+        return version, pending
+
+    def entries(self, after: int = 0) -> list[ReviewEntry]:
+        return [entry for entry in self._read()[1] if entry.version > after]
+
+    def version(self) -> int:
+        base_version, entries = self._read()
+        return entries[-1].version if entries else base_version
+
+    def reset(self, version: int) -> None:
+        fd, raw_path = tempfile.mkstemp(prefix=f".{self.path.name}.", suffix=".tmp", dir=self.path.parent)
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            handle.write(json.dumps({"base_version": version}) + "\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+        publish_file(Path(raw_path), self.path)
+        self._tail = None
+
+    def signature(self) -> tuple[int, int, int] | None:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def _read(self) -> tuple[int, list[ReviewEntry]]:
+        try:
+            lines = self.path.read_text(encoding="utf-8").splitlines()
+        except FileNotFoundError:
+            return 0, []
+        base_version = 0
+        entries: list[ReviewEntry] = []
+        for line in lines:
+            try:
+                raw = json.loads(line)
+            except ValueError:
+                LOGGER.warning("Skipping torn line in %s", self.path)
+                continue
+            if not isinstance(raw, dict):
+                continue
+            if isinstance(raw.get("base_version"), int):
+                base_version = raw["base_version"]
+            elif isinstance(raw.get("version"), int) and isinstance(raw.get("items"), list):
+                items = [(str(topic), str(term_type), str(term), int(reason)) for topic, term_type, term, reason in raw["items"]]
+                entries.append(ReviewEntry(version=raw["version"], items=items))
+        return base_version, entries
+
+
+def add_terms_to_rules(rules: dict[str, Any], entries: list[ReviewEntry]) -> None:
+    topics = rules.setdefault("topics", {})
+    if not isinstance(topics, dict):
+        return
+    for entry in entries:
+        for topic, term_type, term, reason in entry.items:
+            if reason != ADDED:
+                continue
+            topic_entry = topics.setdefault(topic, {"single_keywords": [], "phrases": []})
+            if not isinstance(topic_entry, dict):
+                continue
+            list_key = "single_keywords" if term_type == "keywords" else "phrases"
+            terms = topic_entry.setdefault(list_key, [])
+            if isinstance(terms, list) and term not in [str(item).lower() for item in terms]:
+                terms.append(term)
+
+
+def mark_reviewed(stats: dict[str, Any], entries: list[ReviewEntry]) -> None:
+    topics = stats.setdefault("topics", {})
+    if not isinstance(topics, dict):
+        return
+    for entry in entries:
+        for topic, term_type, term, reason in entry.items:
+            topic_stats = topics.setdefault(topic, {"keywords": {}, "phrases": {}})
+            if not isinstance(topic_stats, dict):
+                continue
+            bucket = topic_stats.setdefault(term_type, {})
+            if not isinstance(bucket, dict):
+                continue
+            meta = bucket.setdefault(term, {"occurrences": 0, "ignored": False, "reasonForIgnore": 0})
+            if isinstance(meta, dict):
+                meta["ignored"] = True
+                meta["reasonForIgnore"] = reason
+
+
+def write_json_atomic(path: Path, payload: Any) -> None:
+    fd, raw_path = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    with os.fdopen(fd, "w", encoding="utf-8") as handle:
+        json.dump(payload, handle, indent=2)
+        handle.flush()
+        os.fsync(handle.fileno())
+    publish_file(Path(raw_path), path)
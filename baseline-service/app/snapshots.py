@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+
+from app.baseline_writer import fsync_directory, publish_file
+
+LOGGER = logging.getLogger(__name__)
+
+POINTER_NAME = "CURRENT"
+SNAPSHOT_PATTERN = re.compile(r"^baseline-(\d{6,})\.(json|bin)$")
+RESERVATION_PATTERN = re.compile(r"^\.baseline-(\d{6,})\.reserved$")
+FORMAT_EXTENSIONS = {"json": "json", "indexed": "bin"}
+
+
+@dataclass
+class Snapshot:
+    generation: int
+    path: Path
+    format: str
+
+
+class SnapshotRegistry:
+    def __init__(self, root: Path, keep: int = 5, mirror_paths: dict[str, Path] | None = None) -> None:
+        self.root = root
+        self.keep = max(keep, 2)
+        self.mirror_paths = mirror_paths or {}
+        self._lock = threading.Lock()
+        self._current: tuple[tuple[int, int, int], Snapshot | None] | None = None
+
+    def allocate(self, output_format: str) -> Snapshot:
+        extension = FORMAT_EXTENSIONS[output_format]
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            generation = max(self._known_generations(), default=0) + 1
+            while True:
+                try:
+                    os.close(os.open(self._reservation(generation), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+                    break
+                except FileExistsError:
+                    generation += 1
+        path = self.root / f"baseline-{generation:06d}.{extension}"
+        return Snapshot(generation=generation, path=path, format=output_format)
+
+    def publish(self, snapshot: Snapshot) -> None:
+        if not snapshot.path.exists():
+            raise FileNotFoundError(f"snapshot {snapshot.path.name} was not written")
+        with self._lock:
+            self._point_to(snapshot)
+            self._reservation(snapshot.generation).unlink(missing_ok=True)
+            self._prune(snapshot.generation)
+        LOGGER.info("Published baseline generation %d (%s)", snapshot.generation, snapshot.path.name)
+
+    def discard(self, snapshot: Snapshot) -> None:
+        with self._lock:
+            if self._read_pointer() != snapshot.generation:
+                snapshot.path.unlink(missing_ok=True)
+            self._reservation(snapshot.generation).unlink(missing_ok=True)
+
+    def activate(self, generation: int) -> Snapshot:
+        with self._lock:
+            snapshot = self._find(generation)
+            if snapshot is None:
+                raise KeyError(generation)
+            self._point_to(snapshot)
+        LOGGER.info("Activated baseline generation %d", generation)
+        return snapshot
+
+    def rollback(self) -> Snapshot:
+        with self._lock:
+            current = self._read_pointer()
+            if current is None:
+                raise LookupError("no active baseline generation")
+            older = [snapshot for snapshot in self._scan() if snapshot.generation < current]
+            if not older:
+                raise LookupError(f"no generation older than {current}")
+            snapshot = older[-1]
+            self._point_to(snapshot)
+        LOGGER.info("Rolled back baseline generation %d -> %d", current, snapshot.generation)
+        return snapshot
+
+    def current(self) -> Snapshot | None:
+        try:
+            stat = os.stat(self.root / POINTER_NAME)
+        except FileNotFoundError:
+            return None
+        signature = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        cached = self._current
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        generation = self._read_pointer()
+        snapshot = self._find(generation) if generation is not None else None
+        self._current = (signature, snapshot)
+        return snapshot
+
+    def generations(self) -> list[dict[str, int | str | bool]]:
+        current = self._read_pointer()
+        rows: list[dict[str, int | str | bool]] = []
+        for snapshot in self._scan():
+            stat = snapshot.path.stat()
+            created_at = datetime.fromtimestamp(stat.st_mtime, UTC).replace(microsecond=0)
+            rows.append(
+                {
+                    "generation": snapshot.generation,
+                    "file": snapshot.path.name,
+                    "format": snapshot.format,
+                    "size_bytes": stat.st_size,
+                    "created_at": created_at.isoformat().replace("+00:00", "Z"),
+                    "active": snapshot.generation == current,
+                }
+            )
+        return rows
+
+    def _point_to(self, snapshot: Snapshot) -> None:
+        fd, raw_path = tempfile.mkstemp(prefix=f".{POINTER_NAME}.", suffix=".tmp", dir=self.root)
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            json.dump({"generation": snapshot.generation, "file": snapshot.path.name, "format": snapshot.format}, handle)
+            handle.flush()
+            os.fsync(handle.fileno())
+        publish_file(Path(raw_path), self.root / POINTER_NAME)
+        mirror = self.mirror_paths.get(snapshot.format)
+        if mirror is not None:
+            _mirror_snapshot(snapshot.path, mirror)
+
+    def _prune(self, newest: int) -> None:
+        current = self._read_pointer()
+        snapshots = self._scan()
+        for snapshot in snapshots[: max(len(snapshots) - self.keep, 0)]:
+            if snapshot.generation in {current, newest}:
+                continue
+            snapshot.path.unlink(missing_ok=True)
+            LOGGER.info("Pruned baseline generation %d", snapshot.generation)
+
+    def _find(self, generation: int) -> Snapshot | None:
+        for snapshot in self._scan():
+            if snapshot.generation == generation:
+                return snapshot
+        return None
+
+    def _scan(self) -> list[Snapshot]:
+        if not self.root.exists():
+            return []
+        snapshots: list[Snapshot] = []
+        for path in self.root.iterdir():
+            match = SNAPSHOT_PATTERN.match(path.name)
+            if match is None:
+                continue
+            output_format = "indexed" if match.group(2) == "bin" else "json"
+            snapshots.append(Snapshot(generation=int(match.group(1)), path=path, format=output_format))
+        return sorted(snapshots, key=lambda snapshot: snapshot.generation)
+
+    def _known_generations(self) -> list[int]:
+        generations = [snapshot.generation for snapshot in self._scan()]
+        for path in self.root.iterdir():
+            match = RESERVATION_PATTERN.match(path.name)
+            if match is not None:
+                generations.append(int(match.group(1)))
+        return generations
+
+    def _reservation(self, generation: int) -> Path:
+        return self.root / f".baseline-{generation:06d}.reserved"
+
+    def _read_pointer(self) -> int | None:
+        try:
+            raw = json.loads((self.root / POINTER_NAME).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        generation = raw.get("generation") if isinstance(raw, dict) else None
+        return generation if isinstance(generation, int) else None
+
+
+def _mirror_snapshot(source: Path, target: Path) -> None:
+    temp_path = target.with_name(f".{target.name}.{source.name}.tmp")
+    temp_path.unlink(missing_ok=True)
+    try:
+        os.link(source, temp_path)
+    except OSError:
+        shutil.copyfile(source, temp_path)
+    os.replace(temp_path, target)
+    fsync_directory(target.parent)
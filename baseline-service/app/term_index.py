@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+from collections import defaultdict
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+from app.feature_cache import FeatureCacheReader, MessageFeatures, RowLocation
+from app.topic_classifier import classify_topic, reload_topic_rules, topic_rules
+
+LOGGER = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"\w+")
+GRAM_SIZE = 3
+
+
+@dataclass
+class ReclassificationResult:
+    terms: list[str]
+    candidate_messages: int
+    changed_messages: int
+    sender_ids: list[str]
+
+
+class TermIndex:
+    def __init__(self, cache_path: Path) -> None:
+        self.cache_path = cache_path
+        self.signature = _file_signature(cache_path)
+        self.postings: dict[str, list[int]] = defaultdict(list)
+        self.grams: dict[str, set[str]] = defaultdict(set)
+        self.locations: list[RowLocation] = []
+        self.senders: list[str] = []
+        self.topics: list[str] = []
+        reader = FeatureCacheReader(cache_path)
+        for row, (location, features, topic) in enumerate(reader.classified_locations(topic_rules())):
+            self.locations.append(location)
+            self.senders.append(features.sender_id)
+            self.topics.append(topic)
+            for token in set(TOKEN_RE.findall(_message_text(features))):
+                self.postings[token].append(row)
+        for token in self.postings:
+            for gram in _grams(token):
+                self.grams[gram].add(token)
+        LOGGER.info("Indexed %d cached messages (%d distinct tokens)", len(self.topics), len(self.postings))
+
+    def candidates(self, term: str) -> set[int]:
+        tokens = TOKEN_RE.findall(term.lower())
+        if not tokens:
+            return set(range(len(self.topics)))
+        result: set[int] | None = None
+        for token in set(tokens):
+            rows: set[int] = set()
+            for indexed_token in self._containing(token):
+                rows.update(self.postings[indexed_token])
+            result = rows if result is None else result & rows
+            if not result:
+                return set()
+        return result or set()
+
+    def _containing(self, token: str) -> Iterable[str]:
+        if len(token) < GRAM_SIZE:
+            return [indexed_token for indexed_token in self.postings if token in indexed_token]
+        pools = sorted((self.grams.get(gram, set()) for gram in _grams(token)), key=len)
+        return [indexed_token for indexed_token in pools[0].intersection(*pools[1:]) if token in indexed_token]
+
+
+class Reclassifier:
+    def __init__(self, cache_path: Path) -> None:
+        self.cache_path = cache_path
+        self._index: TermIndex | None = None
+        self._lock = threading.Lock()
+
+    def prepare(self) -> TermIndex | None:
+        with self._lock:
+            return self._current_index()
+
+    def reclassify(self, terms: Iterable[str]) -> ReclassificationResult:
+        cleaned = sorted({term.strip().lower() for term in terms if term.strip()})
+        with self._lock:
+            index = self._current_index()
+            if index is None or not cleaned:
+                return ReclassificationResult(terms=cleaned, candidate_messages=0, changed_messages=0, sender_ids=[])
+            candidates: set[int] = set()
+            for term in cleaned:
+                candidates |= index.candidates(term)
+
+            rules = reload_topic_rules()
+            changed = 0
+            affected: set[str] = set()
+            ordered = sorted(candidates)
+            fetched = FeatureCacheReader(self.cache_path).rows(index.locations[row] for row in ordered)
+            for row, features in zip(ordered, fetched):
+                text = _message_text(features)
+                if not any(term in text for term in cleaned):
+                    continue
+                topic = classify_topic(features.body, features.attachment_names, rules)
+                if topic != index.topics[row]:
+                    index.topics[row] = topic
+                    affected.add(features.sender_id)
+                    changed += 1
+        LOGGER.info(
+            "Reclassified terms %s: candidates=%d changed=%d senders=%d",
+            cleaned,
+            len(candidates),
+            changed,
+            len(affected),
+        )
+        return ReclassificationResult(
+            terms=cleaned,
+            candidate_messages=len(candidates),
+            changed_messages=changed,
+            sender_ids=sorted(affected),
+        )
+
+    def _current_index(self) -> TermIndex | None:
+        signature = _file_signature(self.cache_path)
+        if signature is None:
+            self._index = None
+        elif self._index is None or self._index.signature != signature:
+            self._index = TermIndex(self.cache_path)
+        return self._index
+
+
+def _grams(token: str) -> set[str]:
+    return {token[start : start + GRAM_SIZE] for start in range(len(token) - GRAM_SIZE + 1)}
+
+
+def _message_text(features: MessageFeatures) -> str:
+    return f"{features.body} {' '.join(features.attachment_names)}".lower()
+
+
+def _file_signature(path: Path) -> tuple[int, int, int] | None:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
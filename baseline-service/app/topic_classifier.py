@@ -1,35 +1,242 @@
 from __future__ import annotations
 
+import hashlib
 import json
+import logging
 import os
+import threading
+from collections import OrderedDict
 from collections.abc import Iterable
-from dataclasses import dataclass
+from contextlib import nullcontext
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any
+
+from app.review_journal import ReviewJournal, add_terms_to_rules, review_journal_path
+
 try:
     import ahocorasick
 except ModuleNotFoundError:  # pragma: no cover
     ahocorasick = None  # type: ignore[assignment]
 
+LOGGER = logging.getLogger(__name__)
+
 DEFAULT_RULES_PATH = Path(__file__).resolve().parent / "config" / "topic_keywords.json"
 RULES_PATH_ENV = "TOPIC_RULES_FILE"
-_RULES_CACHE: "TopicRules | None" = None
-_RULES_MTIME: float | None = None
+CACHE_SIZE_ENV = "TOPIC_CLASSIFIER_CACHE_SIZE"
 
 
-@dataclass
+@dataclass(frozen=True)
 class TopicRules:
     normal_threshold: int
     topics: dict[str, tuple[list[str], list[str]]]
     matcher: Any
     pattern_meta: dict[str, tuple[str, int]]
+    version: int = 0
+    topic_names: tuple[str, ...] = ()
+    pattern_slots: dict[str, tuple[int, int]] = field(default_factory=dict)
 
 
-def classify_topic(body_content: str, attachment_names: Iterable[str]) -> str:
-    rules = _get_topic_rules()
-    text = f"{body_content} {' '.join(attachment_names)}".lower()
-    scores: dict[str, int] = {topic: 0 for topic in rules.topics}
+@dataclass
+class TopicBatch:
+    topic_names: tuple[str, ...]
+    topics: list[str] = field(default_factory=list)
+    scores: list[list[int]] | None = None
+
+
+class ClassificationMemo:
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max(max_entries, 0)
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple[int, bytes], str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple[int, bytes]) -> str | None:
+        with self._lock:
+            topic = self._entries.get(key)
+            if topic is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return topic
+
+    def put(self, key: tuple[int, bytes], topic: str) -> None:
+        if self.max_entries == 0:
+            return
+        with self._lock:
+            self._entries[key] = topic
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict[str, int | float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+_MEMO = ClassificationMemo(int(os.getenv(CACHE_SIZE_ENV, "4096") or "0"))
+
+
+class TopicRulesRegistry:
+    def __init__(self) -> None:
+        self._snapshot: TopicRules | None = None
+        self._configured: str | None = None
+        self._signature: tuple[str, int, int, tuple[int, int, int] | None] | None = None
+        self._version = 0
+        self._lock = threading.Lock()
+        self._poller: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    def current(self) -> TopicRules:
+        snapshot = self._snapshot
+        if snapshot is None or self._configured != os.getenv(RULES_PATH_ENV):
+            return self.reload()
+        return snapshot
+
+    def reload(self) -> TopicRules:
+        with self._lock:
+            configured = os.getenv(RULES_PATH_ENV)
+            path = _resolve_rules_path()
+            journal = ReviewJournal(review_journal_path(path))
+            pending = journal.signature() is not None
+            with journal.locked(shared=True) if pending else nullcontext():
+                stat = path.stat()
+                signature = (str(path), stat.st_mtime_ns, stat.st_size, journal.signature())
+                if self._snapshot is not None and self._signature == signature:
+                    return self._snapshot
+                raw = json.loads(path.read_text(encoding="utf-8"))
+                entries = journal.entries() if pending else []
+            if entries and isinstance(raw, dict):
+                add_terms_to_rules(raw, entries)
+            self._version += 1
+            snapshot = _parse_rules(raw, self._version)
+            _MEMO.clear()
+            self._snapshot = snapshot
+            self._configured = configured
+            self._signature = signature
+            LOGGER.info("Loaded topic rules version %d from %s", snapshot.version, path)
+            return snapshot
+
+    def start_polling(self, interval_seconds: float) -> None:
+        if interval_seconds <= 0 or self._poller is not None:
+            return
+        self._stop.clear()
+        self._poller = threading.Thread(target=self._poll, args=(interval_seconds,), name="topic-rules-poller", daemon=True)
+        self._poller.start()
+
+    def stop_polling(self) -> None:
+        if self._poller is None:
+            return
+        self._stop.set()
+        self._poller.join()
+        self._poller = None
+
+    def _poll(self, interval_seconds: float) -> None:
+        while not self._stop.wait(interval_seconds):
+            try:
+                self.reload()
+            except Exception:
+                LOGGER.exception("Topic rules reload failed; keeping version %s", self._version)
+
+
+RULES_REGISTRY = TopicRulesRegistry()
+
+
+def topic_rules() -> TopicRules:
+    return RULES_REGISTRY.current()
+
+
+def reload_topic_rules() -> TopicRules:
+    return RULES_REGISTRY.reload()
+
+
+def topic_rules_path() -> Path:
+    return _resolve_rules_path()
+
+
+def classify_topic(body_content: str, attachment_names: Iterable[str], rules: TopicRules | None = None) -> str:
+    if rules is None:
+        rules = RULES_REGISTRY.current()
+    names = list(attachment_names)
+    key = (rules.version, _content_key(body_content, names))
+    topic = _MEMO.get(key)
+    if topic is None:
+        topic = _score(rules, body_content, names, [0] * len(rules.topic_names), set())
+        _MEMO.put(key, topic)
+    return topic
+
+
+def classify_topics(
+    batch: Iterable[tuple[str, Iterable[str]]],
+    rules: TopicRules | None = None,
+    with_scores: bool = False,
+) -> TopicBatch:
+    if rules is None:
+        rules = RULES_REGISTRY.current()
+    result = TopicBatch(topic_names=rules.topic_names, scores=[] if with_scores else None)
+    scores = [0] * len(rules.topic_names)
     seen_patterns: set[str] = set()
+    for body_content, attachment_names in batch:
+        names = list(attachment_names)
+        if result.scores is not None:
+            result.topics.append(_score(rules, body_content, names, scores, seen_patterns))
+            result.scores.append(scores.copy())
+            continue
+        key = (rules.version, _content_key(body_content, names))
+        topic = _MEMO.get(key)
+        if topic is None:
+            topic = _score(rules, body_content, names, scores, seen_patterns)
+            _MEMO.put(key, topic)
+        result.topics.append(topic)
+    return result
+
+
+def topic_cache_stats() -> dict[str, int | float]:
+    return _MEMO.stats()
+
+
+def reset_topic_cache() -> None:
+    _MEMO.reset()
+
+
+def _content_key(body_content: str, attachment_names: list[str]) -> bytes:
+    digest = hashlib.blake2b(body_content.encode("utf-8"), digest_size=16)
+    for name in attachment_names:
+        digest.update(b"\x00")
+        digest.update(name.encode("utf-8"))
+    return digest.digest()
+
+
+def _score(
+    rules: TopicRules,
+    body_content: str,
+    attachment_names: list[str],
+    scores: list[int],
+    seen_patterns: set[str],
+) -> str:
+    text = f"{body_content} {' '.join(attachment_names)}".lower()
+    for slot in range(len(scores)):
+        scores[slot] = 0
+    seen_patterns.clear()
 
     if ahocorasick is not None:
         for _, pattern in rules.matcher.iter(text):
@@ -40,26 +247,13 @@ def classify_topic(body_content: str, attachment_names: Iterable[str]) -> str:
                 seen_patterns.add(pattern)
 
     for pattern in seen_patterns:
-        topic, weight = rules.pattern_meta[pattern]
-        scores[topic] += weight
+        slot, weight = rules.pattern_slots[pattern]
+        scores[slot] += weight
 
-    best_topic = max(scores, key=scores.get)
-    if scores[best_topic] < rules.normal_threshold:
+    best = max(range(len(scores)), key=scores.__getitem__)
+    if scores[best] < rules.normal_threshold:
         return "normal"
-    return best_topic
-
-
-def _get_topic_rules() -> TopicRules:
-    global _RULES_CACHE, _RULES_MTIME
-    path = _resolve_rules_path()
-    mtime = path.stat().st_mtime
-    if _RULES_CACHE is not None and _RULES_MTIME == mtime:
-        return _RULES_CACHE
-
-    raw = json.loads(path.read_text(encoding="utf-8"))
-    _RULES_CACHE = _parse_rules(raw)
-    _RULES_MTIME = mtime
-    return _RULES_CACHE
+    return rules.topic_names[best]
 
 
 def _resolve_rules_path() -> Path:
@@ -69,7 +263,7 @@ def _resolve_rules_path() -> Path:
     return DEFAULT_RULES_PATH
 
 
-def _parse_rules(raw: Any) -> TopicRules:
+def _parse_rules(raw: Any, version: int = 0) -> TopicRules:
     if not isinstance(raw, dict):
         raise ValueError("Topic rules config must be an object")
 
@@ -98,7 +292,17 @@ def _parse_rules(raw: Any) -> TopicRules:
         for phrase in cleaned_phrases:
             pattern_meta[phrase] = (topic, 2)
     matcher = _build_matcher(pattern_meta.keys())
-    return TopicRules(normal_threshold=threshold, topics=topics, matcher=matcher, pattern_meta=pattern_meta)
+    topic_names = tuple(topics)
+    slots = {topic: slot for slot, topic in enumerate(topic_names)}
+    return TopicRules(
+        normal_threshold=threshold,
+        topics=topics,
+        matcher=matcher,
+        pattern_meta=pattern_meta,
+        version=version,
+        topic_names=topic_names,
+        pattern_slots={pattern: (slots[topic], weight) for pattern, (topic, weight) in pattern_meta.items()},
+    )
 
 
 def _build_matcher(patterns: Iterable[str]) -> Any:
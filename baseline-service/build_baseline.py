@@ -2,49 +2,277 @@ from __future__ import annotations
 
 import argparse
 import asyncio
+import cProfile
+import json
 import os
+import tempfile
+import time
 from pathlib import Path
 
-from app.baseline_builder import BaselineBuilder, BuildStatus
-from app.graph_client import GraphClient
-from app.keyword_miner import KeywordMinerClient, KeywordMinerConfig
+from app.baseline_builder import BaselineBuilder, BuildStatus, ShardSpec
+from app.build_profiling import MemoryTracer, bench_report, profile_summary
+from app.build_worker import BuildJob, build_job_settings_from_env, make_builder
+from app.classifier_artifact import ARTIFACT_NAME, write_classifier_artifact
+from app.reload_notifier import ReloadNotifier, ReloadNotifierConfig, parse_webhook_urls
+from app.snapshots import SnapshotRegistry
+from app.topic_classifier import reload_topic_rules, reset_topic_cache, topic_cache_stats
 
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Build baseline.json from Graph mock history")
     parser.add_argument("--days", type=int, default=35, help="Historical window in days")
+    parser.add_argument(
+        "--windows",
+        type=_parse_windows,
+        default=[],
+        help="Extra comma-separated windows in days (e.g. 7,90) built from the same Graph pull",
+    )
     parser.add_argument(
         "--base-url",
         type=str,
         default=os.getenv("GRAPH_BASE_URL", "http://127.0.0.1:8000"),
         help="Graph mock base URL",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--format",
+        choices=["json", "indexed"],
+        default=os.getenv("BASELINE_OUTPUT_FORMAT", "json"),
+        help="Output format: baseline.json or indexed baseline.bin",
+    )
+    parser.add_argument(
+        "--snapshot-dir",
+        type=Path,
+        default=Path(os.getenv("BASELINE_SNAPSHOT_DIR", str(Path(__file__).resolve().parent / "snapshots"))),
+        help="Directory for generation-numbered baseline snapshots",
+    )
+    parser.add_argument(
+        "--partial-dir",
+        type=Path,
+        default=Path(os.getenv("BASELINE_PARTIAL_DIR", str(Path(__file__).resolve().parent / "partials"))),
+        help="Directory for shard partial accumulator files",
+    )
+    parser.add_argument(
+        "--feature-cache",
+        type=Path,
+        default=Path(os.environ["BASELINE_FEATURE_CACHE"]) if os.getenv("BASELINE_FEATURE_CACHE") else None,
+        help="Local message feature cache written during builds and read by --replay",
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--shard",
+        type=_parse_shard,
+        default=None,
+        help="Build only shard i of N (e.g. 0/4) into a partial accumulator file",
+    )
+    mode.add_argument(
+        "--merge",
+        type=Path,
+        nargs="+",
+        default=None,
+        metavar="PARTIAL",
+        help="Merge shard partial files into the final baseline and keyword stats",
+    )
+    mode.add_argument(
+        "--replay",
+        action="store_true",
+        help="Recompute the baseline from --feature-cache without calling Graph",
+    )
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        nargs="?",
+        const=Path("baseline_build.prof"),
+        default=None,
+        metavar="PSTATS",
+        help="Run under cProfile, dump pstats to PSTATS (default baseline_build.prof) and print the top functions",
+    )
+    parser.add_argument("--profile-top", type=int, default=30, help="Functions shown in the --profile summary")
+    parser.add_argument(
+        "--tracemalloc",
+        action="store_true",
+        help="Trace allocations and report peak memory and top allocation sites per build phase",
+    )
+    parser.add_argument(
+        "--bench",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Repeat the build N times without publishing and write wall time and messages/sec statistics as JSON",
+    )
+    parser.add_argument(
+        "--bench-output",
+        type=Path,
+        default=Path("baseline_bench.json"),
+        help="Where --bench writes its JSON report",
+    )
+    args = parser.parse_args()
+    if args.replay and args.feature_cache is None:
+        parser.error("--replay requires --feature-cache or BASELINE_FEATURE_CACHE")
+    if args.bench < 0:
+        parser.error("--bench must be positive")
+    if args.bench and (args.shard is not None or args.merge):
+        parser.error("--bench cannot be combined with --shard or --merge")
+    return args
+
+
+def _parse_shard(raw: str) -> ShardSpec:
+    try:
+        return ShardSpec.parse(raw)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc)) from None
+
+
+def _parse_windows(raw: str) -> list[int]:
+    try:
+        windows = [int(part) for part in raw.split(",") if part.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid windows: {raw}") from None
+    if any(window < 1 for window in windows):
+        raise argparse.ArgumentTypeError("windows must be at least 1 day")
+    return windows
+
+
+def _make_builder(
+    args: argparse.Namespace,
+    output_path: Path,
+    keyword_stats_path: Path,
+    keyword_cache_path: Path | None,
+    feature_cache_path: Path | None,
+) -> BaselineBuilder:
+    job = BuildJob(
+        days=args.days,
+        windows=args.windows,
+        base_url=args.base_url,
+        output_path=output_path,
+        output_format=args.format,
+        keyword_stats_path=keyword_stats_path,
+        keyword_cache_path=keyword_cache_path,
+        shard=args.shard,
+        feature_cache_path=feature_cache_path,
+        **build_job_settings_from_env(),
+    )
+    return make_builder(job, BuildStatus())
+
+
+async def _run(builder: BaselineBuilder, args: argparse.Namespace) -> None:
+    if args.merge:
+        builder.merge(args.merge)
+    elif args.replay:
+        builder.replay(args.feature_cache, days=args.days, windows=args.windows)
+    else:
+        await builder.build(days=args.days, windows=args.windows)
+
+
+async def _instrumented_run(builder: BaselineBuilder, args: argparse.Namespace) -> None:
+    tracer = MemoryTracer() if args.tracemalloc else None
+    profiler = cProfile.Profile() if args.profile is not None else None
+    if tracer is not None:
+        tracer.start(builder.metrics)
+    if profiler is not None:
+        profiler.enable()
+    try:
+        await _run(builder, args)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        if tracer is not None:
+            tracer.stop(builder.metrics)
+    if profiler is not None:
+        print(profile_summary(profiler, args.profile, args.profile_top))
+        print(f"Wrote cProfile stats to {args.profile}")
+    if tracer is not None:
+        print(f"Peak traced memory by phase: {json.dumps(tracer.report(), indent=2)}")
+
+
+async def _bench(args: argparse.Namespace) -> None:
+    runs = []
+    with tempfile.TemporaryDirectory(prefix="baseline-bench-") as raw_dir:
+        scratch = Path(raw_dir)
+        for run in range(1, args.bench + 1):
+            output_path = scratch / ("baseline.bin" if args.format == "indexed" else "baseline.json")
+            builder = _make_builder(args, output_path, scratch / "keyword_stats.json", None, None)
+            reset_topic_cache()
+            started = time.perf_counter()
+            await _instrumented_run(builder, args)
+            wall = time.perf_counter() - started
+            snapshot = builder.metrics.snapshot()
+            cache_stats = topic_cache_stats()
+            runs.append(
+                {
+                    "run": run,
+                    "wall_seconds": round(wall, 4),
+                    "messages": builder.status.messages_processed,
+                    "messages_per_second": round(builder.status.messages_processed / wall, 2) if wall > 0 else 0.0,
+                    "phase_seconds": snapshot["phase_seconds"],
+                    "peak_rss_bytes": snapshot["peak_rss_bytes"],
+                    "topic_cache_hits": cache_stats["hits"],
+                    "topic_cache_misses": cache_stats["misses"],
+                }
+            )
+            print(f"Bench run {run}/{args.bench}: {wall:.3f}s, {runs[-1]['messages_per_second']} messages/s")
+    settings = {
+        "days": args.days,
+        "windows": args.windows,
+        "format": args.format,
+        "base_url": args.base_url,
+        "replay": args.replay,
+        "columnar": os.getenv("BASELINE_COLUMNAR_FINALIZE", "false").lower() == "true",
+    }
+    report = bench_report(runs, settings)
+    args.bench_output.parent.mkdir(parents=True, exist_ok=True)
+    args.bench_output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(json.dumps({key: report[key] for key in ("runs", "messages", "wall_seconds", "messages_per_second")}))
+    print(f"Wrote benchmark report to {args.bench_output}")
 
 
 async def _main() -> None:
     args = parse_args()
-    status = BuildStatus()
-    output_path = Path(__file__).resolve().parent / "baseline.json"
-    keyword_stats_path = Path(__file__).resolve().parent / "keyword_stats.json"
-    keyword_miner = KeywordMinerClient(
-        KeywordMinerConfig(
-            enabled=os.getenv("USE_LLM_KEYWORD_MINER", "false").lower() == "true",
-            service_url=os.getenv("KEYWORD_MINER_URL", "http://127.0.0.1:8030"),
-            timeout_seconds=float(os.getenv("KEYWORD_MINER_TIMEOUT_SECONDS", "3.0")),
-            max_retries=int(os.getenv("KEYWORD_MINER_MAX_RETRIES", "3")),
-        )
-    )
-    builder = BaselineBuilder(
-        GraphClient(base_url=args.base_url),
-        output_path,
-        status,
-        keyword_miner=keyword_miner,
-        keyword_stats_path=keyword_stats_path,
-        keyword_batch_size=int(os.getenv("KEYWORD_MINER_BATCH_SIZE", "200")),
+    if args.bench:
+        await _bench(args)
+        return
+    root = Path(__file__).resolve().parent
+    snapshots = SnapshotRegistry(
+        args.snapshot_dir,
+        keep=int(os.getenv("BASELINE_SNAPSHOT_KEEP", "5")),
+        mirror_paths={"json": root / "baseline.json", "indexed": root / "baseline.bin"},
     )
-    await builder.build(days=args.days)
-    print(f"Wrote baseline to {output_path}")
+    snapshot = None
+    if args.shard is not None:
+        output_path = args.partial_dir / args.shard.partial_name()
+    else:
+        snapshot = snapshots.allocate(args.format)
+        output_path = snapshot.path
+    try:
+        keyword_cache = os.getenv("KEYWORD_MINER_CACHE", str(root / "keyword_cache.sqlite"))
+        builder = _make_builder(
+            args,
+            output_path,
+            root / "keyword_stats.json",
+            Path(keyword_cache) if keyword_cache else None,
+            None if args.replay else args.feature_cache,
+        )
+        await _instrumented_run(builder, args)
+        phases = ", ".join(f"{phase}={seconds:.2f}s" for phase, seconds in builder.metrics.phase_seconds.items() if seconds)
+        print(f"Build phases: {phases or 'none'}; {builder.metrics.snapshot()['messages_per_second']} messages/s")
+        cache_stats = topic_cache_stats()
+        if cache_stats["hits"] or cache_stats["misses"]:
+            print(f"Topic classification cache: hits={cache_stats['hits']} misses={cache_stats['misses']} hit_rate={cache_stats['hit_rate']}")
+        if snapshot is None:
+            print(f"Wrote baseline shard {args.shard} to {output_path}")
+            return
+
+        artifact_path = Path(os.getenv("TOPIC_CLASSIFIER_ARTIFACT", str(root / ARTIFACT_NAME)))
+        classifier_version = write_classifier_artifact(artifact_path, reload_topic_rules())
+        snapshots.publish(snapshot)
+    except BaseException:
+        if snapshot is not None:
+            snapshots.discard(snapshot)
+        raise
+    print(f"Published baseline generation {snapshot.generation} to {snapshot.path}")
+    print(f"Published topic classifier {classifier_version} to {artifact_path}")
+    notifier = ReloadNotifier(ReloadNotifierConfig(webhook_urls=parse_webhook_urls(os.getenv("BASELINE_RELOAD_WEBHOOKS"))))
+    for url, delivered in (await notifier.notify(snapshot.generation)).items():
+        print(f"Reload webhook {url}: {'ok' if delivered else 'failed'}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from app.accumulator_store import AccumulatorStore, SpillingAccumulatorStore
+from app.recipient_sketch import RecipientSketchConfig
+
+
+def _feed(store: AccumulatorStore) -> None:
+    messages = [
+        ("u1", 9, ["u2", "u3"], "finance"),
+        ("u1", 10, ["u2"], "normal"),
+        ("u2", 23, ["u1"], "finance"),
+        ("u1", 9, ["u2", "u3", "u4"], "finance"),
+    ]
+    for sender_id, hour, recipients, topic in messages:
+        accumulator = store[sender_id]
+        accumulator.message_count += 1
+        accumulator.hour_histogram[hour] += 1
+        accumulator.recipient_count_histogram[len(recipients)] += 1
+        accumulator.topic_histogram[topic] += 1
+        for recipient in recipients:
+            accumulator.add_participant(recipient, None)
+            accumulator.add_topic_recipient(topic, recipient, None)
+        store.record_updates(1 + len(recipients))
+
+
+def test_spilling_store_merges_partial_counters(tmp_path: Path) -> None:
+    memory = AccumulatorStore(["u1", "u2", "u3"])
+    spilling = SpillingAccumulatorStore(["u1", "u2", "u3"], tmp_path, memory_budget=2)
+    _feed(memory)
+    _feed(spilling)
+
+    assert spilling.flush_count >= 2
+    assert dict(spilling.items()) == dict(memory.items())
+    spilling.close()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_known_participants_are_capped_to_heavy_hitters(tmp_path: Path) -> None:
+    config = RecipientSketchConfig(exact_threshold=5, width=64, depth=4, top_k=3)
+    memory = AccumulatorStore(["broadcast"])
+    spilling = SpillingAccumulatorStore(["broadcast"], tmp_path, memory_budget=7, sketch_config=config)
+    for store in (memory, spilling):
+        for index in range(40):
+            recipients = ["boss", "team-lead", "assistant", f"member-{index}"]
+            for recipient in recipients:
+                store["broadcast"].add_participant(recipient, config)
+            store.record_updates(len(recipients))
+
+    accumulator = memory["broadcast"]
+    assert accumulator.known_participants == {}
+    assert accumulator.participants() == ["assistant", "boss", "team-lead"]
+    assert dict(spilling.items())["broadcast"].participants() == ["assistant", "boss", "team-lead"]
+    spilling.close()
+
+
+def test_store_rejects_unknown_senders(tmp_path: Path) -> None:
+    store = SpillingAccumulatorStore(["u1"], tmp_path)
+    assert "u1" in store
+    assert "u9" not in store
+    store.close()
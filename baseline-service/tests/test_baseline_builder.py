@@ -0,0 +1,329 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from app.baseline_builder import BaselineBuilder, BuildStatus, ShardSpec
+from app.build_metrics import BuildMetrics
+from app.feature_cache import FeatureCacheReader
+from app.keyword_miner import KeywordMinerClient, KeywordMinerConfig
+from app.keyword_store import KeywordStatsStore, keyword_store_path
+
+USERS = [
+    {"id": "u001", "mail": "ana@company.com"},
+    {"id": "u002", "mail": "ben@company.com"},
+    {"id": "u003", "mail": "cy@partner.org"},
+]
+CHATS = [
+    {"id": "c1", "members": [{"userId": "u001"}, {"userId": "u002"}]},
+    {"id": "c2", "members": [{"userId": "u001"}, {"userId": "u003"}]},
+]
+
+
+def message(message_id: str, chat_id: str, sender: str, timestamp: str, text: str) -> dict[str, Any]:
+    return {
+        "id": message_id,
+        "chatId": chat_id,
+        "createdDateTime": timestamp,
+        "lastModifiedDateTime": timestamp,
+        "from": {"user": {"id": sender}},
+        "body": {"content": text},
+        "attachments": [],
+    }
+
+
+MESSAGES = [
+    message("m1", "c1", "u001", "2026-02-12T09:00:00Z", "lunch today?"),
+    message("m2", "c1", "u002", "2026-02-10T10:00:00Z", "sure"),
+    message("m3", "c2", "u001", "2026-01-20T11:00:00Z", "please review the invoice payment"),
+    message("m4", "c2", "u003", "2025-12-01T12:00:00Z", "contract draft attached"),
+]
+
+
+class FakeGraph:
+    base_url = "http://graph.test"
+
+    def __init__(self) -> None:
+        self.message_calls = 0
+
+    async def list_users(self) -> list[dict[str, Any]]:
+        return USERS
+
+    async def list_user_chats(self, user_id: str) -> list[dict[str, Any]]:
+        return [chat for chat in CHATS if any(member["userId"] == user_id for member in chat["members"])]
+
+    async def list_chat_messages_since(self, chat_id: str, cutoff_iso: str) -> list[dict[str, Any]]:
+        self.message_calls += 1
+        return [item for item in MESSAGES if item["chatId"] == chat_id and item["lastModifiedDateTime"] >= cutoff_iso]
+
+
+def build(
+    tmp_path: Path,
+    name: str,
+    days: int,
+    windows: list[int] | None = None,
+    columnar: bool = False,
+) -> tuple[dict[str, Any], FakeGraph]:
+    graph = FakeGraph()
+    output = tmp_path / name
+    builder = BaselineBuilder(
+        graph, output, BuildStatus(), keyword_stats_path=tmp_path / "keyword_stats.json", columnar=columnar
+    )
+    asyncio.run(builder.build(days=days, windows=windows))
+    return json.loads(output.read_text(encoding="utf-8")), graph
+
+
+def build_shards(tmp_path: Path, count: int, windows: list[int] | None = None) -> list[Path]:
+    paths: list[Path] = []
+    for index in range(count):
+        shard = ShardSpec(index, count)
+        output = tmp_path / "partials" / shard.partial_name()
+        builder = BaselineBuilder(
+            FakeGraph(), output, BuildStatus(), keyword_stats_path=tmp_path / "unused.json", shard=shard
+        )
+        asyncio.run(builder.build(days=35, windows=windows))
+        paths.append(output)
+    return paths
+
+
+def test_multi_window_build_matches_separate_builds_with_one_pull(tmp_path: Path) -> None:
+    combined, graph = build(tmp_path, "combined.json", 35, [7, 90])
+    separate = {days: build(tmp_path, f"{days}.json", days)[0] for days in (7, 35, 90)}
+
+    assert graph.message_calls == 4
+    assert combined["meta"]["message_count"] == separate[35]["meta"]["message_count"] == 3
+    assert combined["meta"]["windows"]["7"] == {"days": 7, "message_count": 2}
+    assert combined["meta"]["windows"]["90"] == {"days": 90, "message_count": 4}
+    for user_id, payload in combined["users"].items():
+        windows = payload.pop("windows")
+        assert payload == separate[35]["users"][user_id]
+        assert windows["7"] == separate[7]["users"][user_id]
+        assert windows["90"] == separate[90]["users"][user_id]
+
+
+def test_single_window_output_has_no_window_keys(tmp_path: Path) -> None:
+    single, _ = build(tmp_path, "single.json", 35)
+
+    assert "windows" not in single["meta"]
+    assert all("windows" not in payload for payload in single["users"].values())
+
+
+def test_shard_partials_merge_into_the_unsharded_baseline(tmp_path: Path) -> None:
+    expected, _ = build(tmp_path, "single.json", 35, [7])
+    partials = build_shards(tmp_path, 3, [7])
+    merged_path = tmp_path / "merged.json"
+    builder = BaselineBuilder(FakeGraph(), merged_path, BuildStatus(), keyword_stats_path=tmp_path / "merged_stats.json")
+
+    meta = builder.merge(partials)
+
+    merged = json.loads(merged_path.read_text(encoding="utf-8"))
+    assert meta["shards"] == 3
+    assert merged["users"] == expected["users"]
+    assert merged["meta"]["windows"] == expected["meta"]["windows"]
+    with pytest.raises(ValueError, match="Expected shards"):
+        builder.merge(partials[:2])
+
+
+def test_shard_spec_partitions_chats() -> None:
+    shards = [ShardSpec.parse(f"{index}/4") for index in range(4)]
+    chat_ids = [f"chat-{index}" for index in range(100)]
+
+    assert all(sum(shard.owns(chat_id) for shard in shards) == 1 for chat_id in chat_ids)
+    with pytest.raises(ValueError):
+        ShardSpec.parse("4/4")
+    with pytest.raises(ValueError):
+        ShardSpec.parse("x/2")
+
+
+def test_replay_from_feature_cache_matches_graph_build(tmp_path: Path) -> None:
+    cache_path = tmp_path / "features.bin"
+    builder = BaselineBuilder(
+        FakeGraph(),
+        tmp_path / "graph.json",
+        BuildStatus(),
+        keyword_stats_path=tmp_path / "keyword_stats.json",
+        feature_cache_path=cache_path,
+    )
+    asyncio.run(builder.build(days=90))
+    expected, _ = build(tmp_path, "expected.json", 35, [7])
+    replayed_path = tmp_path / "replayed.json"
+    replayer = BaselineBuilder(FakeGraph(), replayed_path, BuildStatus(), keyword_stats_path=tmp_path / "unused.json")
+
+    meta = replayer.replay(cache_path, days=35, windows=[7])
+
+    assert meta["replayed_from"] == "features.bin"
+    assert json.loads(replayed_path.read_text(encoding="utf-8"))["users"] == expected["users"]
+    with pytest.raises(ValueError, match="does not cover"):
+        replayer.replay(cache_path, days=120)
+
+
+class GraphWithoutChatIds(FakeGraph):
+    async def list_chat_messages_since(self, chat_id: str, cutoff_iso: str) -> list[dict[str, Any]]:
+        messages = await super().list_chat_messages_since(chat_id, cutoff_iso)
+        return [{key: value for key, value in item.items() if key != "chatId"} for item in messages]
+
+
+def test_feature_cache_rows_take_the_chat_id_from_the_chat(tmp_path: Path) -> None:
+    cache_path = tmp_path / "features.bin"
+    builder = BaselineBuilder(
+        GraphWithoutChatIds(),
+        tmp_path / "graph.json",
+        BuildStatus(),
+        keyword_stats_path=tmp_path / "keyword_stats.json",
+        feature_cache_path=cache_path,
+    )
+    asyncio.run(builder.build(days=90))
+
+    assert {features.message_id: features.chat_id for features in FeatureCacheReader(cache_path)} == {
+        "m1": "c1",
+        "m2": "c1",
+        "m3": "c2",
+        "m4": "c2",
+    }
+
+
+def test_patched_baseline_replaces_only_rebuilt_senders(tmp_path: Path) -> None:
+    cache_path = tmp_path / "features.bin"
+    builder = BaselineBuilder(
+        FakeGraph(),
+        tmp_path / "graph.json",
+        BuildStatus(),
+        keyword_stats_path=tmp_path / "keyword_stats.json",
+        feature_cache_path=cache_path,
+    )
+    asyncio.run(builder.build(days=35, windows=[7]))
+    original = json.loads((tmp_path / "graph.json").read_text(encoding="utf-8"))
+    patched_path = tmp_path / "patched.json"
+    patcher = BaselineBuilder(FakeGraph(), patched_path, BuildStatus(), keyword_stats_path=tmp_path / "unused.json")
+
+    replacements = patcher.rebuild_senders(cache_path, ["u002"], 35, [7])
+    stale = {user_id: {"stale": True} for user_id in original["users"]}
+    patcher.write_patched(original["meta"], stale.items(), replacements)
+
+    patched = json.loads(patched_path.read_text(encoding="utf-8"))
+    assert replacements == {"u002": original["users"]["u002"]}
+    assert patched["users"]["u002"] == original["users"]["u002"]
+    assert patched["users"]["u001"] == {"stale": True}
+    assert list(patched["users"]) == list(original["users"])
+
+
+def test_columnar_finalize_matches_counter_finalize(tmp_path: Path) -> None:
+    counters, _ = build(tmp_path, "counters.json", 35, [7, 90])
+    columnar, _ = build(tmp_path, "columnar.json", 35, [7, 90], columnar=True)
+
+    assert columnar["users"] == counters["users"]
+    assert columnar["users"]["u001"]["topic_histogram"] == {"normal": 1, "finance": 1}
+
+
+def test_build_records_phase_metrics(tmp_path: Path) -> None:
+    published: list[dict[str, Any]] = []
+    metrics = BuildMetrics(publish_interval=0)
+    metrics.publisher = published.append
+    builder = BaselineBuilder(
+        FakeGraph(), tmp_path / "baseline.json", BuildStatus(), keyword_stats_path=tmp_path / "stats.json", metrics=metrics
+    )
+    asyncio.run(builder.build(days=35))
+
+    snapshot = published[-1]
+    assert metrics.messages_processed == 3
+    assert metrics.finished_at is not None
+    assert all(metrics.phase_seconds[phase] > 0 for phase in ("list_users", "list_chats", "fetch_messages", "classify", "write"))
+    assert snapshot["peak_rss_bytes"] > 0
+
+
+class EchoMiner(KeywordMinerClient):
+    def __init__(self) -> None:
+        super().__init__(KeywordMinerConfig(enabled=True, service_url="http://miner.test", concurrency=2))
+        self.mined: list[str] = []
+
+    async def _post(self, messages: list[str]) -> dict[str, dict[str, dict[str, int]]]:
+        await asyncio.sleep(0.01)
+        self.mined.extend(messages)
+        return {"topics": {"finance": {"keywords": {"invoice": 7, "lunch": 7}, "phrases": {"invoice payment": 7}}}}
+
+
+def mine(tmp_path: Path, miner: EchoMiner, cache: bool = True) -> dict[str, Any]:
+    builder = BaselineBuilder(
+        FakeGraph(),
+        tmp_path / "baseline.json",
+        BuildStatus(),
+        keyword_miner=miner,
+        keyword_stats_path=tmp_path / "stats.json",
+        keyword_cache_path=tmp_path / "keyword_cache.sqlite" if cache else None,
+    )
+    asyncio.run(builder.build(days=35))
+    return json.loads((tmp_path / "stats.json").read_text(encoding="utf-8"))
+
+
+def test_keyword_mining_is_drained_before_stats_are_written(tmp_path: Path) -> None:
+    miner = EchoMiner()
+    stats = mine(tmp_path, miner)
+
+    assert len(miner.mined) == 3
+    finance = stats["topics"]["finance"]
+    assert finance["keywords"]["invoice"]["occurrences"] == 1
+    assert finance["keywords"]["lunch"]["occurrences"] == 1
+    assert finance["phrases"]["invoice payment"]["occurrences"] == 1
+
+
+def test_keyword_cache_skips_mined_messages_without_double_counting(tmp_path: Path) -> None:
+    mine(tmp_path, EchoMiner())
+    raw = json.loads((tmp_path / "stats.json").read_text(encoding="utf-8"))
+    raw["topics"]["finance"]["keywords"]["lunch"].update({"ignored": True, "reasonForIgnore": 2})
+    (tmp_path / "stats.json").write_text(json.dumps(raw), encoding="utf-8")
+
+    second = EchoMiner()
+    stats = mine(tmp_path, second)
+
+    assert second.mined == []
+    assert stats["meta"]["cached_messages"] == 3
+    assert stats["topics"]["finance"]["keywords"]["invoice"]["occurrences"] == 1
+    assert stats["topics"]["finance"]["keywords"]["lunch"] == {"occurrences": 1, "ignored": True, "reasonForIgnore": 2}
+
+
+
+def test_mining_without_cache_keeps_llm_counts(tmp_path: Path) -> None:
+    class AuditMiner(EchoMiner):
+        async def _post(self, messages: list[str]) -> dict[str, dict[str, dict[str, int]]]:
+            self.mined.extend(messages)
+            return {"topics": {"finance": {"keywords": {"invoice": 7, "Audit Trail": 2}, "phrases": {}}}}
+
+    miner = AuditMiner()
+    keywords = mine(tmp_path, miner, cache=False)["topics"]["finance"]["keywords"]
+
+    assert len(miner.mined) == 3
+    assert keywords["invoice"]["occurrences"] == 7
+    assert keywords["audit trail"]["occurrences"] == 2
+    assert not (tmp_path / "keyword_cache.sqlite").exists()
+
+
+def test_keyword_cache_stores_batches_that_returned_no_terms(tmp_path: Path) -> None:
+    class EmptyMiner(EchoMiner):
+        async def _post(self, messages: list[str]) -> dict[str, dict[str, dict[str, int]]]:
+            self.mined.extend(messages)
+            return {"topics": {}}
+
+    first = EmptyMiner()
+    mine(tmp_path, first)
+    second = EmptyMiner()
+    stats = mine(tmp_path, second)
+
+    assert len(first.mined) == 3
+    assert second.mined == []
+    assert stats["meta"]["cached_messages"] == 3
+
+
+def test_build_keeps_review_flags_from_the_keyword_store(tmp_path: Path) -> None:
+    stats_path = tmp_path / "stats.json"
+    store = KeywordStatsStore(keyword_store_path(stats_path))
+    store.apply_review([("finance", "keywords", "lunch", 2)])
+    store.close()
+
+    stats = mine(tmp_path, EchoMiner(), cache=False)
+
+    assert stats["topics"]["finance"]["keywords"]["lunch"] == {"occurrences": 7, "ignored": True, "reasonForIgnore": 2}
+    assert stats["topics"]["finance"]["keywords"]["invoice"]["ignored"] is False
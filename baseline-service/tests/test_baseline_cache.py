@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+
+from app.baseline_cache import BaselineCache, etag_matches
+from app.baseline_writer import IndexedBaselineWriter
+
+
+def test_cache_reuses_parsed_baseline_until_file_changes(tmp_path: Path) -> None:
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps({"meta": {}, "users": {"u001": {"recipient_mean": 1.0}}}), encoding="utf-8")
+    cache = BaselineCache()
+
+    first = cache.get(path)
+    assert first is not None
+    baseline, etag = first.get("u001")
+    assert baseline == {"recipient_mean": 1.0}
+    assert cache.get(path) is first
+    assert cache.loads == 1
+
+    path.write_text(json.dumps({"meta": {}, "users": {"u001": {"recipient_mean": 2.0}}}), encoding="utf-8")
+    os.utime(path, ns=(1, 1))
+    second = cache.get(path)
+    assert second is not first
+    assert cache.loads == 2
+    assert second.get("u001")[1] != etag
+    assert second.get("u404") is None
+    assert cache.get(tmp_path / "missing.json") is None
+
+
+def test_etags_match_across_output_formats(tmp_path: Path) -> None:
+    users = {"u001": {"rare_topics": ["legal"], "recipient_mean": 1.5}}
+    json_path = tmp_path / "baseline.json"
+    json_path.write_text(json.dumps({"meta": {}, "users": users}, indent=2), encoding="utf-8")
+    indexed_path = tmp_path / "baseline.bin"
+    with IndexedBaselineWriter(indexed_path, {}) as writer:
+        writer.write_user("u001", users["u001"])
+    cache = BaselineCache()
+
+    json_etag = cache.get(json_path).get("u001")[1]
+    indexed_baseline, indexed_etag = cache.get(indexed_path).get("u001")
+
+    assert indexed_baseline == users["u001"]
+    assert indexed_etag == json_etag
+    assert etag_matches(f'W/{json_etag}, "other"', json_etag)
+    assert etag_matches("*", json_etag)
+    assert not etag_matches(None, json_etag)
+
+
+def write_indexed(path: Path, mean: float) -> None:
+    with IndexedBaselineWriter(path, {}) as writer:
+        writer.write_user("u001", {"recipient_mean": mean})
+
+
+def test_replaced_indexed_baseline_is_closed_after_its_last_lease(tmp_path: Path) -> None:
+    path = tmp_path / "baseline.bin"
+    write_indexed(path, 1.0)
+    cache = BaselineCache()
+    with cache.lease(path) as first:
+        write_indexed(path, 2.0)
+        with cache.lease(path) as second:
+            assert second is not first
+            assert second.get("u001")[0] == {"recipient_mean": 2.0}
+        assert first.get("u001")[0] == {"recipient_mean": 1.0}
+    assert not first.acquire()
+
+    write_indexed(path, 3.0)
+    assert cache.get(path).get("u001")[0] == {"recipient_mean": 3.0}
+    assert not second.acquire()
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+from app.baseline_reader import IndexedBaselineReader, is_indexed_baseline
+from app.baseline_writer import IndexedBaselineWriter, JsonBaselineWriter
+
+USERS = {
+    "u001": {"known_participants": ["u002"], "hour_histogram": {"9": 3}, "topic_recipient_counts": {}},
+    "u002": {"known_participants": [], "hour_histogram": {}, "topic_recipient_counts": {"finance": {"u001": 2}}},
+}
+META = {"days": 35, "user_count": 2}
+
+
+def test_streamed_output_matches_single_dump(tmp_path: Path) -> None:
+    path = tmp_path / "baseline.json"
+    with JsonBaselineWriter(path, META, indent=2) as writer:
+        for user_id, payload in USERS.items():
+            writer.write_user(user_id, payload)
+
+    assert path.read_text(encoding="utf-8") == json.dumps({"meta": META, "users": USERS}, indent=2)
+
+
+def test_compact_and_empty_outputs_parse(tmp_path: Path) -> None:
+    compact = tmp_path / "compact.json"
+    with JsonBaselineWriter(compact, META, indent=None) as writer:
+        writer.write_user("u001", USERS["u001"])
+    assert "\n" not in compact.read_text(encoding="utf-8")
+    assert json.loads(compact.read_text(encoding="utf-8"))["users"] == {"u001": USERS["u001"]}
+
+    empty = tmp_path / "empty.json"
+    with JsonBaselineWriter(empty, META):
+        pass
+    assert empty.read_text(encoding="utf-8") == json.dumps({"meta": META, "users": {}}, indent=2)
+
+
+def test_recipient_sketch_rows_are_written_on_one_line(tmp_path: Path) -> None:
+    path = tmp_path / "baseline.json"
+    sketches = {"finance": {"width": 4, "depth": 2, "total": 3, "rows": [[1, 0, 2, 0], [0, 3, 0, 0]]}}
+    payload = {**USERS["u001"], "topic_recipient_sketches": sketches}
+    with JsonBaselineWriter(path, META, indent=2) as writer:
+        writer.write_user("u001", payload)
+
+    text = path.read_text(encoding="utf-8")
+    assert '      "topic_recipient_sketches": {"finance":{"width":4,"depth":2,"total":3,"rows":[[1,0,2,0],[0,3,0,0]]}}' in text
+    assert '      "hour_histogram": {\n        "9": 3\n      },' in text
+    assert json.loads(text)["users"]["u001"] == payload
+
+
+def test_failed_write_keeps_previous_file(tmp_path: Path) -> None:
+    path = tmp_path / "baseline.json"
+    path.write_text('{"meta": {}, "users": {}}', encoding="utf-8")
+
+    with pytest.raises(RuntimeError):
+        with JsonBaselineWriter(path, META) as writer:
+            writer.write_user("u001", USERS["u001"])
+            raise RuntimeError("boom")
+
+    assert path.read_text(encoding="utf-8") == '{"meta": {}, "users": {}}'
+    assert [item.name for item in tmp_path.iterdir()] == ["baseline.json"]
+
+
+def test_indexed_output_supports_random_access(tmp_path: Path) -> None:
+    path = tmp_path / "baseline.bin"
+    with IndexedBaselineWriter(path, META) as writer:
+        for user_id, payload in USERS.items():
+            writer.write_user(user_id, payload)
+
+    assert is_indexed_baseline(path)
+    assert not is_indexed_baseline(tmp_path / "missing.bin")
+    reader = IndexedBaselineReader(path)
+    try:
+        assert reader.meta == META
+        assert reader.user_ids() == ["u001", "u002"]
+        assert reader.get("u002") == USERS["u002"]
+        assert reader.get("u404") is None
+    finally:
+        reader.close()
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from app.build_metrics import BuildMetrics, LatencyHistogram, render_prometheus
+
+
+def test_latency_histogram_is_cumulative() -> None:
+    histogram = LatencyHistogram()
+    for seconds in (0.002, 0.03, 0.03, 20.0):
+        histogram.observe(seconds)
+    payload = histogram.to_dict()
+    assert payload["buckets"]["0.005"] == 1
+    assert payload["buckets"]["0.05"] == 3
+    assert payload["buckets"]["10.0"] == 3
+    assert payload["buckets"]["+Inf"] == payload["count"] == 4
+
+
+def test_prometheus_rendering() -> None:
+    metrics = BuildMetrics()
+    metrics.add_phase("fetch_messages", 1.5)
+    metrics.observe_graph("messages", 0.2)
+    metrics.record_retry("messages")
+    status = {"state": "completed", "users_processed": 3, "messages_processed": 3, "metrics": metrics.snapshot()}
+    text = render_prometheus(status)
+    assert 'baseline_build_state{state="completed"} 1' in text
+    assert 'baseline_build_state{state="running"} 0' in text
+    assert 'baseline_build_phase_seconds{phase="fetch_messages"} 1.5' in text
+    assert 'baseline_graph_request_duration_seconds_bucket{endpoint="messages",le="0.25"} 1' in text
+    assert 'baseline_graph_request_duration_seconds_count{endpoint="messages"} 1' in text
+    assert 'baseline_graph_retries_total{endpoint="messages"} 1' in text
+    assert "baseline_build_peak_rss_bytes" in text
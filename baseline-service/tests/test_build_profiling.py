@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import cProfile
+from pathlib import Path
+
+from app.build_metrics import BuildMetrics
+from app.build_profiling import MemoryTracer, bench_report, profile_summary
+
+
+def _run(wall: float, rate: float) -> dict:
+    return {
+        "wall_seconds": wall,
+        "messages": 100,
+        "messages_per_second": rate,
+        "phase_seconds": {"fetch_messages": wall / 2},
+        "peak_rss_bytes": int(wall * 1000),
+    }
+
+
+def test_bench_report_statistics() -> None:
+    runs = [_run(wall, 100 / wall) for wall in (1.0, 2.0, 3.0, 4.0)]
+    report = bench_report(runs, {"days": 30})
+    assert report["runs"] == 4
+    assert report["settings"] == {"days": 30}
+    assert report["wall_seconds"] == {"mean": 2.5, "p95": 4.0, "min": 1.0, "max": 4.0}
+    assert report["messages_per_second"]["p95"] == 100.0
+    assert report["phase_seconds_mean"] == {"fetch_messages": 1.25}
+    assert report["peak_rss_bytes"] == 4000
+
+
+def test_memory_tracer_records_phase_peaks() -> None:
+    metrics = BuildMetrics()
+    tracer = MemoryTracer(top_n=3)
+    tracer.start(metrics)
+    try:
+        with metrics.phase("finalize"):
+            payload = [bytearray(1024) for _ in range(512)]
+        del payload
+    finally:
+        tracer.stop(metrics)
+    report = tracer.report()
+    assert report["finalize"]["peak_bytes"] >= 512 * 1024
+    assert 0 < len(report["finalize"]["top_sites"]) <= 3
+    assert metrics.phase_listener is None
+
+
+def test_profile_summary_dumps_stats(tmp_path: Path) -> None:
+    profiler = cProfile.Profile()
+    profiler.enable()
+    sorted(range(1000), key=lambda value: -value)
+    profiler.disable()
+    output = tmp_path / "build.prof"
+    summary = profile_summary(profiler, output, 5)
+    assert output.exists()
+    assert "cumulative" in summary
+
+
+def test_deferred_phases_reach_the_tracer_once_per_flush() -> None:
+    metrics = BuildMetrics()
+    ended: list[str] = []
+    metrics.phase_listener = ended.append
+    for _ in range(100):
+        metrics.defer_phase("classify", 0.001)
+        metrics.defer_phase("keyword_mining", 0.002)
+    assert ended == []
+
+    metrics.flush_deferred_phases()
+    metrics.flush_deferred_phases()
+    assert ended == ["classify", "keyword_mining"]
+    assert round(metrics.phase_seconds["classify"], 6) == 0.1
+    assert round(metrics.phase_seconds["keyword_mining"], 6) == 0.2
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import socket
+import time
+from pathlib import Path
+
+import pytest
+
+from app.build_worker import BuildCancelled, BuildJob, BuildProcess, SharedBuildStatus
+from app.keyword_miner import KeywordMinerConfig
+
+
+def make_job(tmp_path: Path, base_url: str) -> BuildJob:
+    return BuildJob(
+        days=35,
+        base_url=base_url,
+        output_path=tmp_path / "baseline.json",
+        output_format="json",
+        keyword_miner=KeywordMinerConfig(enabled=False, service_url="http://127.0.0.1:8030"),
+        keyword_stats_path=tmp_path / "keyword_stats.json",
+    )
+
+
+def test_shared_status_writes_through_to_shared_counters() -> None:
+    counters = multiprocessing.get_context("spawn").Array("q", 2, lock=False)
+    counters[0] = 1
+    status = SharedBuildStatus(counters)
+
+    status.users_processed += 2
+    status.messages_processed += 5
+
+    assert list(counters) == [3, 5]
+    assert (status.state, status.error, status.generation) == ("idle", None, None)
+    assert {"topic_cache", "metrics"} <= set(vars(status))
+
+
+def test_build_worker_can_be_cancelled(tmp_path: Path) -> None:
+    with socket.socket() as listener:
+        listener.bind(("127.0.0.1", 0))
+        listener.listen()
+        host, port = listener.getsockname()
+        worker = BuildProcess(poll_interval=0.05)
+        worker.start(make_job(tmp_path, f"http://{host}:{port}"))
+
+        async def cancel_and_wait() -> None:
+            await asyncio.sleep(1.0)
+            assert worker.cancel()
+            await worker.wait()
+
+        started = time.monotonic()
+        with pytest.raises(BuildCancelled):
+            asyncio.run(cancel_and_wait())
+
+    assert time.monotonic() - started < 10
+    assert not worker.is_running()
+    assert not worker.cancel()
+    assert not (tmp_path / "baseline.json").exists()
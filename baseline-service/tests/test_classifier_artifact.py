@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import json
+import pickle
+from pathlib import Path
+
+from _pytest.monkeypatch import MonkeyPatch
+
+from app.classifier_artifact import ARTIFACT_FORMAT, write_classifier_artifact
+from app.topic_classifier import reload_topic_rules
+
+
+def test_classifier_artifact_round_trips_compiled_rules(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    rules_file = tmp_path / "rules.json"
+    rules_file.write_text(
+        json.dumps({"normal_threshold": 2, "topics": {"legal": {"single_keywords": ["nda"], "phrases": ["legal notice"]}}}),
+        encoding="utf-8",
+    )
+    monkeypatch.setenv("TOPIC_RULES_FILE", str(rules_file))
+    artifact_path = tmp_path / "out" / "topic_classifier.pkl"
+
+    version = write_classifier_artifact(artifact_path, reload_topic_rules())
+    assert write_classifier_artifact(artifact_path, reload_topic_rules()) == version
+
+    artifact = pickle.loads(artifact_path.read_bytes())
+    assert artifact["format"] == ARTIFACT_FORMAT
+    assert artifact["version"] == version
+    assert artifact["normal_threshold"] == 2
+    assert artifact["topics"] == ["legal"]
+    assert artifact["pattern_meta"] == {"nda": ("legal", 1), "legal notice": ("legal", 2)}
+    assert sorted(pattern for _, pattern in artifact["matcher"].iter("nda and legal notice")) == ["legal notice", "nda"]
+    assert list(artifact_path.parent.iterdir()) == [artifact_path]
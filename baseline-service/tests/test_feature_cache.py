@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from app.feature_cache import FeatureCacheReader, FeatureCacheWriter, MessageFeatures
+
+
+def features(index: int) -> MessageFeatures:
+    return MessageFeatures(
+        message_id=f"m{index}",
+        chat_id="c1",
+        sender_id="u001",
+        created="2026-02-10T09:00:00Z",
+        modified=1770714000.0 + index,
+        recipient_ids=["u002", "u003"],
+        attachment_kind="pdf" if index % 2 else "none",
+        attachment_names=["q1.pdf"] if index % 2 else [],
+        body_hash=f"{index:016x}",
+        body=f"message {index}",
+    )
+
+
+def test_feature_cache_round_trips_across_chunks(tmp_path: Path) -> None:
+    path = tmp_path / "features.bin"
+    rows = [features(index) for index in range(7)]
+    with FeatureCacheWriter(path, {"cutoff": "2026-01-11T00:00:00Z"}, [{"id": "u001"}], chunk_rows=3) as writer:
+        for row in rows:
+            writer.append(row)
+
+    reader = FeatureCacheReader(path)
+
+    assert reader.meta == {"cutoff": "2026-01-11T00:00:00Z"}
+    assert reader.users == [{"id": "u001"}]
+    assert list(reader) == rows
+    assert list(reader) == rows
+
+
+def test_truncated_feature_cache_is_rejected(tmp_path: Path) -> None:
+    path = tmp_path / "features.bin"
+    with FeatureCacheWriter(path, {}, [], chunk_rows=2) as writer:
+        for index in range(4):
+            writer.append(features(index))
+    path.write_bytes(path.read_bytes()[:-5])
+
+    with pytest.raises(ValueError, match="Truncated"):
+        list(FeatureCacheReader(path))
+    (tmp_path / "other.bin").write_bytes(b"not a cache")
+    with pytest.raises(ValueError):
+        FeatureCacheReader(tmp_path / "other.bin")
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from app.keyword_cache import KeywordCountCache, attribute_counts, content_hash
+
+
+def test_attribute_counts_splits_batch_terms_per_message() -> None:
+    result = {"topics": {"legal": {"keywords": {"NDA": 3, "missing": 1}, "phrases": {"signed nda": 1}}}}
+    counts = attribute_counts(["Signed NDA attached, nda v2", "agenda for today", "nda"], result)
+
+    assert counts[0] == {"legal": {"keywords": {"nda": 2}, "phrases": {"signed nda": 1}}}
+    assert counts[1] == {}
+    assert counts[2] == {"legal": {"keywords": {"nda": 1}, "phrases": {}}}
+
+
+def test_cache_round_trip_and_lru_eviction(tmp_path: Path) -> None:
+    path = tmp_path / "cache.sqlite"
+    cache = KeywordCountCache(path, max_entries=2)
+    cache._stamp = 1
+    cache.put_many([(content_hash("old"), {}), (content_hash("kept"), {"hr": {"keywords": {"payroll": 1}, "phrases": {}}})])
+    cache.close()
+
+    cache = KeywordCountCache(path, max_entries=2)
+    cache._stamp = 2
+    assert cache.get(content_hash("kept")) == {"hr": {"keywords": {"payroll": 1}, "phrases": {}}}
+    assert cache.get(content_hash("unseen")) is None
+    cache.put_many([(content_hash("new"), {})])
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close()
+
+    cache = KeywordCountCache(path, max_entries=2)
+    assert len(cache) == 2
+    assert cache.get(content_hash("old")) is None
+    assert cache.get(content_hash("kept")) is not None
+    cache.close()
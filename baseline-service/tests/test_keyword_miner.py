@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+
+from app.keyword_miner import KeywordMinerClient, KeywordMinerConfig, KeywordMiningPool
+
+
+class SlowMiner(KeywordMinerClient):
+    def __init__(self, concurrency: int, max_pending_batches: int = 2) -> None:
+        super().__init__(
+            KeywordMinerConfig(
+                enabled=True,
+                service_url="http://miner.test",
+                concurrency=concurrency,
+                max_pending_batches=max_pending_batches,
+            )
+        )
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    async def _post(self, messages: list[str]) -> dict[str, dict[str, dict[str, int]]]:
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        await asyncio.sleep(0.02)
+        self.in_flight -= 1
+        return {"topics": {"normal": {"keywords": {messages[0]: 1}, "phrases": {}}}}
+
+
+def test_pool_runs_batches_concurrently_and_drains() -> None:
+    miner = SlowMiner(concurrency=3)
+    merged: list[str] = []
+
+    async def run() -> None:
+        pool = KeywordMiningPool(miner, lambda batch, result: merged.extend(result["topics"]["normal"]["keywords"]))
+        for index in range(9):
+            await pool.submit([f"batch-{index}"])
+        await pool.drain()
+
+    asyncio.run(run())
+    assert sorted(merged) == [f"batch-{index}" for index in range(9)]
+    assert miner.peak_in_flight == 3
+
+
+def test_pool_queue_is_bounded() -> None:
+    miner = SlowMiner(concurrency=1, max_pending_batches=1)
+
+    async def run() -> int:
+        pool = KeywordMiningPool(miner, lambda batch, result: None)
+        await pool.submit(["first"])
+        await asyncio.sleep(0)
+        await pool.submit(["second"])
+        blocked = asyncio.create_task(pool.submit(["third"]))
+        await asyncio.sleep(0.005)
+        waiting = 0 if blocked.done() else 1
+        await blocked
+        await pool.drain()
+        return waiting
+
+    assert asyncio.run(run()) == 1
+
+
+class ScriptedMiner(KeywordMinerClient):
+    def __init__(self, failures: dict[int, Exception], **overrides: int) -> None:
+        settings = {"token_budget": 100, "min_token_budget": 10, "max_token_budget": 400, "max_retries": 1}
+        settings.update(overrides)
+        super().__init__(KeywordMinerConfig(enabled=True, service_url="http://miner.test", timeout_seconds=4.0, **settings))
+        self.failures = failures
+        self.requests: list[list[str]] = []
+
+    async def _post(self, messages: list[str]) -> dict[str, dict[str, dict[str, int]]]:
+        self.requests.append(messages)
+        limit = min(self.failures, default=None)
+        if limit is not None and len(messages) > limit:
+            raise self.failures[limit]
+        return {"topics": {"normal": {"keywords": {message: 1 for message in messages}, "phrases": {}}}}
+
+
+def overload(status: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "http://miner.test/v1/keywords/extract")
+    return httpx.HTTPStatusError("overloaded", request=request, response=httpx.Response(status, request=request))
+
+
+def test_split_respects_token_budget_and_message_cap() -> None:
+    miner = ScriptedMiner({}, max_batch_messages=3)
+    messages = ["x" * 156] * 5 + ["short"] * 5
+
+    chunks = miner.split(messages)
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 3, 3]
+    assert sum(chunks, []) == messages
+
+
+def test_overloaded_batch_is_bisected_and_budget_shrinks() -> None:
+    miner = ScriptedMiner({2: overload(429)})
+    messages = [f"m{index}" for index in range(8)]
+
+    mined = asyncio.run(miner.mine(messages))
+
+    assert all(result is not None for _, result in mined)
+    assert [chunk for chunk, _ in mined] == [messages[index : index + 2] for index in range(0, 8, 2)]
+    assert miner.token_budget < 100
+
+
+def test_timeout_shrinks_budget_without_splitting_or_retrying() -> None:
+    miner = ScriptedMiner({1: httpx.ReadTimeout("slow")})
+
+    mined = asyncio.run(miner.mine(["a", "b", "c", "d"]))
+
+    assert mined == [(["a", "b", "c", "d"], None)]
+    assert len(miner.requests) == 1
+    assert miner.token_budget < 100
+
+
+def test_miner_that_always_times_out_gives_up_after_failure_budget() -> None:
+    miner = ScriptedMiner({0: httpx.ReadTimeout("slow")}, max_retries=3, max_batch_messages=2)
+    messages = [f"m{index}" for index in range(200)]
+
+    mined = asyncio.run(miner.mine(messages))
+
+    assert len(miner.requests) == miner.config.max_consecutive_failures
+    assert sum((chunk for chunk, _ in mined), []) == messages
+    assert all(result is None for _, result in mined)
+
+
+def test_overload_split_depth_is_capped() -> None:
+    miner = ScriptedMiner({0: overload(503)}, max_retries=0, max_split_depth=2)
+    messages = [f"m{index}" for index in range(8)]
+
+    mined = asyncio.run(miner.mine(messages))
+
+    assert [len(chunk) for chunk, _ in mined] == [2, 2, 2, 2]
+    assert len(miner.requests) == 7
+
+
+def test_fast_responses_grow_budget_up_to_max() -> None:
+    miner = ScriptedMiner({})
+    for _ in range(20):
+        asyncio.run(miner.mine(["a"]))
+    assert miner.token_budget == 400
+
+
+def test_single_message_failure_is_reported_not_dropped_silently() -> None:
+    miner = ScriptedMiner({0: overload(413)}, max_retries=0)
+
+    mined = asyncio.run(miner.mine(["a", "b"]))
+
+    assert mined == [(["a"], None), (["b"], None)]
+    assert miner.token_budget == 12
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+
+from app.keyword_store import KeywordStatsStore, keyword_store_path
+from app.review_journal import ReviewJournal
+
+
+def write_stats(path: Path, keywords: dict[str, dict], phrases: dict[str, dict] | None = None) -> None:
+    path.write_text(json.dumps({"meta": {}, "topics": {"finance": {"keywords": keywords, "phrases": phrases or {}}}}), encoding="utf-8")
+
+
+def term(occurrences: int, reason: int = 0) -> dict:
+    return {"occurrences": occurrences, "ignored": reason != 0, "reasonForIgnore": reason}
+
+
+def test_suggestions_are_ranked_paged_and_prefix_filtered(tmp_path: Path) -> None:
+    stats_path = tmp_path / "keyword_stats.json"
+    write_stats(
+        stats_path,
+        {"invoice": term(9), "invoices": term(4), "budget": term(7), "lunch": term(20, reason=2)},
+        {"invoice payment": term(4)},
+    )
+    store = KeywordStatsStore(keyword_store_path(stats_path), stats_path)
+    assert store.path.name == "keyword_stats.sqlite"
+    assert store.sync()
+    assert not store.sync()
+
+    assert store.topics() == ["finance"]
+    rows, total = store.suggestions("finance", limit=2)
+    assert total == 4
+    assert rows == [{"term": "invoice", "type": "keyword", "score": 9}, {"term": "budget", "type": "keyword", "score": 7}]
+    rows, _ = store.suggestions("finance", limit=2, offset=2)
+    assert [row["term"] for row in rows] == ["invoice payment", "invoices"]
+    rows, total = store.suggestions("Finance", limit=10, prefix="Invoice ")
+    assert (total, rows[0]["type"]) == (1, "phrase")
+    assert store.suggestions("legal", limit=10) == ([], 0)
+    store.close()
+
+
+def test_reviews_are_row_updates_that_survive_reimport(tmp_path: Path) -> None:
+    stats_path = tmp_path / "keyword_stats.json"
+    write_stats(stats_path, {"invoice": term(9), "budget": term(7), "stale": term(1)})
+    store = KeywordStatsStore(keyword_store_path(stats_path), stats_path)
+    store.sync()
+
+    assert store.apply_review([("finance", "keywords", "invoice", 1), ("finance", "phrases", "net thirty", 2)]) == 2
+    assert [row["term"] for row in store.suggestions("finance", limit=10)[0]] == ["budget", "stale"]
+
+    write_stats(stats_path, {"invoice": term(12), "budget": term(3)})
+    os.utime(stats_path, ns=(1, 1))
+    assert store.sync()
+    assert store.suggestions("finance", limit=10) == ([{"term": "budget", "type": "keyword", "score": 3}], 1)
+    assert sorted(store.reviewed()) == [("finance", "keywords", "invoice", 1), ("finance", "phrases", "net thirty", 2)]
+    store.close()
+
+
+def test_store_replays_pending_journal_entries(tmp_path: Path) -> None:
+    stats_path = tmp_path / "keyword_stats.json"
+    write_stats(stats_path, {"invoice": term(9), "budget": term(7)})
+    journal = ReviewJournal(tmp_path / "keyword_review.journal")
+    store = KeywordStatsStore(keyword_store_path(stats_path), stats_path, journal)
+    store.sync()
+
+    journal.append([("finance", "keywords", "invoice", 1)])
+    assert store.sync()
+    assert not store.sync()
+    assert store.suggestions("finance", limit=10)[1] == 1
+
+    with journal.locked():
+        journal.reset(journal.version())
+    journal.append([("finance", "keywords", "budget", 2)])
+    store.sync()
+    assert store.suggestions("finance", limit=10) == ([], 0)
+    store.close()
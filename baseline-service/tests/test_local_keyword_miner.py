@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from app.baseline_builder import BaselineBuilder, BuildStatus
+from app.keyword_miner import KeywordMinerClient, KeywordMinerConfig
+from app.local_keyword_miner import LocalKeywordMiner
+
+
+def test_local_miner_ranks_distinctive_terms_per_topic() -> None:
+    miner = LocalKeywordMiner(top_terms=5, min_count=2)
+    for _ in range(20):
+        miner.add("finance", "Please approve the invoice payment before the quarter close")
+        miner.add("legal", "The contract draft needs a signed NDA before the meeting")
+        miner.add("normal", "See you at the meeting, lunch before")
+
+    topics = miner.result()["topics"]
+
+    assert "normal" not in topics
+    assert topics["finance"]["keywords"]["invoice"] == 20
+    assert "invoice payment" in topics["finance"]["phrases"]
+    assert "nda" in topics["legal"]["keywords"]
+    assert "meeting" not in topics["legal"]["keywords"]
+    assert "before" not in topics["finance"]["keywords"]
+    assert len(topics["finance"]["keywords"]) <= 5
+
+
+def test_local_miner_respects_min_count() -> None:
+    miner = LocalKeywordMiner(min_count=3)
+    miner.add("finance", "invoice")
+    miner.add("normal", "lunch")
+    assert miner.result() == {"topics": {}}
+
+
+def test_builder_rejects_unknown_engine(tmp_path: Path) -> None:
+    client = KeywordMinerClient(KeywordMinerConfig(enabled=False, service_url="", engine="bayes"))
+    with pytest.raises(ValueError):
+        BaselineBuilder(object(), tmp_path / "baseline.json", BuildStatus(), keyword_miner=client)
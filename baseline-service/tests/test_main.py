@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from _pytest.monkeypatch import MonkeyPatch
+from fastapi.testclient import TestClient
+
+from app.baseline_cache import BaselineCache
+from app import main
+from app.keyword_store import KeywordStatsStore, keyword_store_path
+from app.main import app
+from app.reload_notifier import ReloadNotifier, ReloadNotifierConfig
+from app.review_journal import ReviewJournal, review_journal_path
+from app.snapshots import SnapshotRegistry
+from app.topic_classifier import topic_rules
+
+
+class RecordingNotifier(ReloadNotifier):
+    def __init__(self) -> None:
+        super().__init__(ReloadNotifierConfig(webhook_urls=[]))
+        self.generations: list[int] = []
+
+    async def notify(self, generation: int) -> dict[str, bool]:
+        self.generations.append(generation)
+        return {}
+
+
+def serve(tmp_path: Path, monkeypatch: MonkeyPatch) -> TestClient:
+    registry = SnapshotRegistry(tmp_path / "snapshots")
+    snapshot = registry.allocate("json")
+    users = {"u001": {"recipient_mean": 1.5}, "u002": {"recipient_mean": 3.0}}
+    snapshot.path.write_text(json.dumps({"meta": {}, "users": users}), encoding="utf-8")
+    registry.publish(snapshot)
+    monkeypatch.setattr(app.state, "snapshots", registry)
+    monkeypatch.setattr(app.state, "baseline_cache", BaselineCache())
+    return TestClient(app)
+
+
+def test_get_user_baseline_honours_if_none_match(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    client = serve(tmp_path, monkeypatch)
+
+    first = client.get("/v1/baseline/u001")
+    assert first.status_code == 200
+    assert first.json() == {"recipient_mean": 1.5}
+    etag = first.headers["ETag"]
+
+    cached = client.get("/v1/baseline/u001", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+    assert cached.content == b""
+    assert client.get("/v1/baseline/u001", headers={"If-None-Match": '"stale"'}).status_code == 200
+    assert client.get("/v1/baseline/u404").status_code == 404
+
+
+def test_batch_get_returns_users_etags_and_missing(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    client = serve(tmp_path, monkeypatch)
+    etag = client.get("/v1/baseline/u002").headers["ETag"]
+
+    response = client.post("/v1/baseline/users:batchGet", json={"user_ids": ["u002", "u404", "u001", "u002"]})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["users"] == {"u002": {"recipient_mean": 3.0}, "u001": {"recipient_mean": 1.5}}
+    assert body["etags"]["u002"] == etag
+    assert set(body["etags"]) == {"u001", "u002"}
+    assert body["missing"] == ["u404"]
+    assert client.post("/v1/baseline/users:batchGet", json={"user_ids": []}).status_code == 422
+
+
+def test_keyword_suggestions_page_through_the_store(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    stats_path = tmp_path / "keyword_stats.json"
+    keywords = {f"term{index:02d}": {"occurrences": index, "ignored": False, "reasonForIgnore": 0} for index in range(30)}
+    stats_path.write_text(json.dumps({"meta": {}, "topics": {"finance": {"keywords": keywords, "phrases": {}}}}), encoding="utf-8")
+    monkeypatch.setattr(app.state, "keyword_store", KeywordStatsStore(keyword_store_path(stats_path), stats_path))
+    client = TestClient(app)
+
+    assert client.get("/v1/keywords/topics").json() == {"topics": ["finance"]}
+    page = client.get("/v1/keywords/suggestions", params={"topic": "finance", "limit": 5, "offset": 5}).json()
+    assert [row["term"] for row in page["value"]] == ["term24", "term23", "term22", "term21", "term20"]
+    assert (page["total"], page["limit"], page["offset"]) == (30, 5, 5)
+    filtered = client.get("/v1/keywords/suggestions", params={"topic": "finance", "prefix": "term2"}).json()
+    assert filtered["total"] == 10
+    assert client.get("/v1/keywords/suggestions", params={"topic": "finance", "limit": 5000}).status_code == 422
+
+
+def test_keyword_reviews_are_journaled_and_compacted(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    rules_path = tmp_path / "topic_keywords.json"
+    rules_path.write_text(json.dumps({"normal_threshold": 1, "topics": {"finance": {"single_keywords": ["invoice"], "phrases": []}}}), encoding="utf-8")
+    stats_path = tmp_path / "keyword_stats.json"
+    keywords = {term: {"occurrences": 5, "ignored": False, "reasonForIgnore": 0} for term in ("budget", "lunch", "payroll")}
+    stats_path.write_text(json.dumps({"meta": {}, "topics": {"finance": {"keywords": keywords, "phrases": {}}}}), encoding="utf-8")
+    monkeypatch.setenv("TOPIC_RULES_FILE", str(rules_path))
+    journal = ReviewJournal(review_journal_path(rules_path))
+    monkeypatch.setattr(app.state, "keyword_store", KeywordStatsStore(keyword_store_path(stats_path), stats_path, journal))
+    monkeypatch.setattr(app.state, "snapshots", SnapshotRegistry(tmp_path / "snapshots"))
+    monkeypatch.setattr(app.state, "reclassifier", None)
+    monkeypatch.setattr(main, "KEYWORD_STATS_PATH", stats_path)
+    monkeypatch.setattr(main, "CLASSIFIER_ARTIFACT_PATH", tmp_path / "topic_classifier.pkl")
+    monkeypatch.setattr(main, "REVIEW_COMPACT_AFTER", 2)
+    client = TestClient(app)
+
+    def review(term: str, action: str) -> dict:
+        item = {"topic": "finance", "term": term, "termType": "keyword", "action": action}
+        return client.post("/v1/keywords/review", json={"items": [item]}).json()
+
+    assert review("budget", "add")["rules_version"] == 1
+    assert json.loads(rules_path.read_text(encoding="utf-8"))["topics"]["finance"]["single_keywords"] == ["invoice"]
+    assert "budget" in topic_rules().topics["finance"][0]
+    assert [row["term"] for row in client.get("/v1/keywords/suggestions", params={"topic": "finance"}).json()["value"]] == ["lunch", "payroll"]
+
+    assert review("lunch", "ignore")["rules_version"] == 2
+    assert json.loads(rules_path.read_text(encoding="utf-8"))["topics"]["finance"]["single_keywords"] == ["invoice", "budget"]
+    compacted = json.loads(stats_path.read_text(encoding="utf-8"))["topics"]["finance"]["keywords"]
+    assert compacted["lunch"] == {"occurrences": 5, "ignored": True, "reasonForIgnore": 2}
+    assert journal.entries() == []
+
+    assert review("payroll", "ignore")["rules_version"] == 3
+    assert client.get("/v1/keywords/suggestions", params={"topic": "finance"}).json()["total"] == 0
+
+
+def test_empty_keyword_review_does_not_republish_or_notify(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    serve(tmp_path, monkeypatch)
+    notifier = RecordingNotifier()
+    artifact_path = tmp_path / "topic_classifier.pkl"
+    monkeypatch.setattr(app.state, "reload_notifier", notifier)
+    monkeypatch.setattr(app.state, "reclassifier", None)
+    monkeypatch.setattr(main, "CLASSIFIER_ARTIFACT_PATH", artifact_path)
+    client = TestClient(app)
+
+    item = {"topic": "finance", "term": "   ", "termType": "keyword", "action": "add"}
+    response = client.post("/v1/keywords/review", json={"items": [item]}).json()
+
+    assert response["updated"] == 0
+    assert "classifier_version" not in response
+    assert notifier.generations == []
+    assert not artifact_path.exists()
+
+
+def test_only_reviews_that_add_terms_republish_and_notify(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    serve(tmp_path, monkeypatch)
+    rules_path = tmp_path / "topic_keywords.json"
+    rules_path.write_text(json.dumps({"normal_threshold": 1, "topics": {"finance": {"single_keywords": ["invoice"], "phrases": []}}}), encoding="utf-8")
+    stats_path = tmp_path / "keyword_stats.json"
+    journal = ReviewJournal(review_journal_path(rules_path))
+    notifier = RecordingNotifier()
+    artifact_path = tmp_path / "topic_classifier.pkl"
+    monkeypatch.setenv("TOPIC_RULES_FILE", str(rules_path))
+    monkeypatch.setattr(app.state, "keyword_store", KeywordStatsStore(keyword_store_path(stats_path), stats_path, journal))
+    monkeypatch.setattr(app.state, "reload_notifier", notifier)
+    monkeypatch.setattr(app.state, "reclassifier", None)
+    monkeypatch.setattr(main, "KEYWORD_STATS_PATH", stats_path)
+    monkeypatch.setattr(main, "CLASSIFIER_ARTIFACT_PATH", artifact_path)
+    client = TestClient(app)
+
+    def review(term: str, action: str) -> dict:
+        item = {"topic": "finance", "term": term, "termType": "keyword", "action": action}
+        return client.post("/v1/keywords/review", json={"items": [item]}).json()
+
+    ignored = review("lunch", "ignore")
+    assert (ignored["updated"], ignored["rules_version"]) == (1, 1)
+    assert "classifier_version" not in ignored
+    assert notifier.generations == []
+    assert not artifact_path.exists()
+
+    added = review("budget", "add")
+    assert added["rules_version"] == 2
+    assert "classifier_version" in added
+    assert artifact_path.exists()
+    assert notifier.generations == [app.state.snapshots.current().generation]
+
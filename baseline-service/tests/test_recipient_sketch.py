@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from collections import Counter
+
+from app.baseline_builder import SenderAccumulator
+from app.recipient_sketch import HeavyHitterSketch, RecipientSketchConfig
+
+
+def test_accumulator_switches_to_sketch_above_threshold() -> None:
+    config = RecipientSketchConfig(exact_threshold=3, width=64, depth=4, top_k=2)
+    accumulator = SenderAccumulator()
+    for recipient in ["u1", "u1", "u1", "u2", "u3"]:
+        accumulator.add_topic_recipient("finance", recipient, config)
+    assert "finance" not in accumulator.topic_recipient_sketches
+    assert accumulator.topic_recipient_counts["finance"]["u1"] == 3
+
+    accumulator.add_topic_recipient("finance", "u4", config)
+    assert "finance" not in accumulator.topic_recipient_counts
+    sketch = accumulator.topic_recipient_sketches["finance"]
+    assert sketch.counts.total == 6
+    assert list(sketch.heavy_hitters())[0] == "u1"
+    assert len(sketch.heavy_hitters()) == 2
+
+
+def test_heavy_hitters_track_top_recipients() -> None:
+    sketch = HeavyHitterSketch(width=256, depth=4, top_k=3)
+    for index in range(500):
+        sketch.add(f"broadcast-{index}")
+    for _ in range(40):
+        sketch.add("boss")
+    for _ in range(25):
+        sketch.add("team-lead")
+
+    top = sketch.heavy_hitters()
+    assert list(top)[:2] == ["boss", "team-lead"]
+    assert top["boss"] >= 40
+
+
+def test_sketch_merge_matches_single_pass() -> None:
+    config = RecipientSketchConfig(exact_threshold=1, width=128, depth=3, top_k=4)
+    left = HeavyHitterSketch.from_counter(Counter({"a": 10, "b": 2}), config)
+    right = HeavyHitterSketch.from_counter(Counter({"a": 5, "c": 7}), config)
+    whole = HeavyHitterSketch.from_counter(Counter({"a": 15, "b": 2, "c": 7}), config)
+
+    left.merge(right)
+    assert left.counts.rows == whole.counts.rows
+    assert left.heavy_hitters() == whole.heavy_hitters()
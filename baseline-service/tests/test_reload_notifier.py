@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+
+from app.reload_notifier import ReloadNotifier, ReloadNotifierConfig, parse_webhook_urls
+
+
+def test_parse_webhook_urls_skips_blanks() -> None:
+    assert parse_webhook_urls(None) == []
+    assert parse_webhook_urls(" http://a/notify, ,http://b/notify ") == ["http://a/notify", "http://b/notify"]
+
+
+def test_notify_posts_generation_and_reports_failures(monkeypatch) -> None:
+    received: list[tuple[str, bytes]] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        received.append((str(request.url), request.content))
+        return httpx.Response(200 if request.url.host == "ok" else 503)
+
+    original_client = httpx.AsyncClient
+
+    def client_factory(*args, **kwargs) -> httpx.AsyncClient:
+        return original_client(transport=httpx.MockTransport(handler), **kwargs)
+
+    monkeypatch.setattr(httpx, "AsyncClient", client_factory)
+    notifier = ReloadNotifier(ReloadNotifierConfig(webhook_urls=["http://ok/notify", "http://down/notify"], max_retries=1))
+
+    async def no_sleep(_: float) -> None:
+        return None
+
+    monkeypatch.setattr(asyncio, "sleep", no_sleep)
+    results = asyncio.run(notifier.notify(7))
+
+    assert results == {"http://ok/notify": True, "http://down/notify": False}
+    assert received.count(("http://ok/notify", b'{"generation":7}')) == 1
+    assert sum(1 for url, _ in received if url == "http://down/notify") == 2
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+
+from app.review_journal import ReviewEntry, ReviewJournal, add_terms_to_rules, mark_reviewed, review_journal_path
+
+
+def test_versions_stay_monotonic_across_writers_and_compaction(tmp_path: Path) -> None:
+    path = review_journal_path(tmp_path / "topic_keywords.json")
+    first = ReviewJournal(path)
+    second = ReviewJournal(path)
+
+    assert first.append([("finance", "keywords", "invoice", 1)]) == (1, 1)
+    assert second.append([("finance", "phrases", "net thirty", 2)]) == (2, 2)
+    assert first.append([("legal", "keywords", "nda", 1)]) == (3, 3)
+    assert [entry.version for entry in second.entries(after=1)] == [2, 3]
+
+    with first.locked():
+        first.reset(first.version())
+    assert second.entries() == []
+    assert second.append([("legal", "keywords", "msa", 1)]) == (4, 1)
+
+    with path.open("a", encoding="utf-8") as handle:
+        handle.write('{"version": 5, "items": [["legal", "keyw')
+    assert [entry.version for entry in first.entries()] == [4]
+
+
+def test_concurrent_appends_get_distinct_versions(tmp_path: Path) -> None:
+    path = tmp_path / "keyword_review.journal"
+    versions: list[int] = []
+
+    def review(worker: int) -> None:
+        journal = ReviewJournal(path)
+        for index in range(10):
+            versions.append(journal.append([("finance", "keywords", f"t{worker}-{index}", 2)])[0])
+
+    threads = [threading.Thread(target=review, args=(worker,)) for worker in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(versions) == list(range(1, 61))
+    assert len(ReviewJournal(path).entries()) == 60
+
+
+def test_entries_fold_into_rules_and_stats() -> None:
+    entries = [
+        ReviewEntry(version=1, items=[("finance", "keywords", "invoice", 1), ("finance", "keywords", "lunch", 2)]),
+        ReviewEntry(version=2, items=[("finance", "phrases", "net thirty", 1), ("finance", "keywords", "invoice", 1)]),
+    ]
+    rules = {"topics": {"finance": {"single_keywords": ["Budget"], "phrases": []}}}
+    add_terms_to_rules(rules, entries)
+    assert rules["topics"]["finance"] == {"single_keywords": ["Budget", "invoice"], "phrases": ["net thirty"]}
+
+    stats = {"topics": {"finance": {"keywords": {"lunch": {"occurrences": 4, "ignored": False, "reasonForIgnore": 0}}}}}
+    mark_reviewed(stats, entries)
+    assert stats["topics"]["finance"]["keywords"]["lunch"] == {"occurrences": 4, "ignored": True, "reasonForIgnore": 2}
+    assert stats["topics"]["finance"]["phrases"]["net thirty"] == {"occurrences": 0, "ignored": True, "reasonForIgnore": 1}
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+
+from app.snapshots import SnapshotRegistry
+
+
+def publish(registry: SnapshotRegistry, label: str) -> int:
+    snapshot = registry.allocate("json")
+    snapshot.path.write_text(json.dumps({"meta": {"label": label}, "users": {}}), encoding="utf-8")
+    registry.publish(snapshot)
+    return snapshot.generation
+
+
+def test_publish_prunes_old_generations_and_mirrors_current(tmp_path: Path) -> None:
+    mirror = tmp_path / "baseline.json"
+    registry = SnapshotRegistry(tmp_path / "snapshots", keep=2, mirror_paths={"json": mirror})
+
+    generations = [publish(registry, label) for label in ("a", "b", "c")]
+
+    assert generations == [1, 2, 3]
+    current = registry.current()
+    assert current is not None and current.generation == 3
+    assert [row["generation"] for row in registry.generations()] == [2, 3]
+    assert json.loads(mirror.read_text(encoding="utf-8"))["meta"]["label"] == "c"
+
+
+def test_rollback_and_activate_swap_pointer(tmp_path: Path) -> None:
+    mirror = tmp_path / "baseline.json"
+    registry = SnapshotRegistry(tmp_path / "snapshots", keep=5, mirror_paths={"json": mirror})
+    for label in ("a", "b", "c"):
+        publish(registry, label)
+
+    assert registry.rollback().generation == 2
+    assert registry.rollback().generation == 1
+    assert json.loads(mirror.read_text(encoding="utf-8"))["meta"]["label"] == "a"
+    with pytest.raises(LookupError):
+        registry.rollback()
+
+    assert registry.activate(3).generation == 3
+    assert [row["active"] for row in registry.generations()] == [False, False, True]
+    with pytest.raises(KeyError):
+        registry.activate(42)
+    assert publish(registry, "d") == 4
+
+
+def test_allocate_reserves_generation_before_it_is_written(tmp_path: Path) -> None:
+    root = tmp_path / "snapshots"
+    build = SnapshotRegistry(root).allocate("json")
+    review = SnapshotRegistry(root).allocate("json")
+
+    assert (build.generation, review.generation) == (1, 2)
+    assert build.path != review.path
+
+    review.path.write_text(json.dumps({"meta": {}, "users": {}}), encoding="utf-8")
+    registry = SnapshotRegistry(root)
+    registry.publish(review)
+    registry.discard(build)
+    assert registry.allocate("json").generation == 3
+    assert sorted(path.name for path in root.iterdir()) == [".baseline-000003.reserved", "CURRENT", "baseline-000002.json"]
+
+
+def test_current_is_cached_until_the_pointer_changes(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    registry = SnapshotRegistry(tmp_path / "snapshots")
+    first = publish(registry, "first")
+    assert registry.current().generation == first
+
+    scans: list[int] = []
+    original_scan = registry._scan
+    monkeypatch.setattr(registry, "_scan", lambda: scans.append(1) or original_scan())
+    assert registry.current().generation == first
+    assert scans == []
+
+    second = publish(registry, "second")
+    scans.clear()
+    assert registry.current().generation == second
+    assert registry.current().generation == second
+    assert len(scans) == 1
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+
+from _pytest.monkeypatch import MonkeyPatch
+
+from app.feature_cache import FeatureCacheWriter, MessageFeatures
+from app.term_index import Reclassifier
+
+
+def write_rules(path: Path, single_keywords: list[str]) -> None:
+    path.write_text(
+        json.dumps({"normal_threshold": 1, "topics": {"legal": {"single_keywords": single_keywords, "phrases": []}}}),
+        encoding="utf-8",
+    )
+
+
+def features(index: int, sender_id: str, body: str) -> MessageFeatures:
+    return MessageFeatures(
+        message_id=f"m{index}",
+        chat_id="c1",
+        sender_id=sender_id,
+        created="2026-02-10T09:00:00Z",
+        modified=1770714000.0,
+        recipient_ids=[],
+        attachment_kind="none",
+        attachment_names=[],
+        body_hash="",
+        body=body,
+    )
+
+
+def test_reclassifier_only_touches_messages_containing_new_terms(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    rules = tmp_path / "rules.json"
+    write_rules(rules, ["contract"])
+    monkeypatch.setenv("TOPIC_RULES_FILE", str(rules))
+    cache_path = tmp_path / "features.bin"
+    rows = [
+        features(0, "u001", "contract draft attached"),
+        features(1, "u002", "see the renewals tracker"),
+        features(2, "u003", "lunch today?"),
+        features(3, "u002", "renewal call moved"),
+    ]
+    with FeatureCacheWriter(cache_path, {"cutoff": "2026-01-01T00:00:00Z"}, []) as writer:
+        for row in rows:
+            writer.append(row)
+    reclassifier = Reclassifier(cache_path)
+    index = reclassifier.prepare()
+    assert index is not None
+    assert index.topics == ["legal", "normal", "normal", "normal"]
+    assert index.candidates("renewal") == {1, 3}
+    assert index.candidates("renewal call") == {3}
+
+    write_rules(rules, ["contract", "renewal"])
+    os.utime(rules, ns=(1, 1))
+    result = reclassifier.reclassify(["Renewal"])
+
+    assert result.terms == ["renewal"]
+    assert result.candidate_messages == 2
+    assert result.changed_messages == 2
+    assert result.sender_ids == ["u002"]
+    assert reclassifier.reclassify(["renewal"]).changed_messages == 0
+
+
+def test_reclassifier_seeks_to_candidate_rows_across_chunks(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    rules = tmp_path / "rules.json"
+    write_rules(rules, ["contract"])
+    monkeypatch.setenv("TOPIC_RULES_FILE", str(rules))
+    cache_path = tmp_path / "features.bin"
+    bodies = ["weekly sync", "escalation pending", "lunch", "escalations queue", "de-escalate now", "ok"]
+    with FeatureCacheWriter(cache_path, {"cutoff": "2026-01-01T00:00:00Z"}, [], chunk_rows=2) as writer:
+        for row, body in enumerate(bodies):
+            writer.append(features(row, f"u{row:03d}", body))
+    reclassifier = Reclassifier(cache_path)
+    index = reclassifier.prepare()
+    assert index is not None
+    assert len({offset for offset, _ in index.locations}) == 3
+    assert index.candidates("escalat") == {1, 3, 4}
+    assert index.candidates("es") == {1, 3, 4}
+    assert index.candidates("zzz") == set()
+
+    write_rules(rules, ["contract", "escalat"])
+    os.utime(rules, ns=(1, 1))
+    result = reclassifier.reclassify(["escalat"])
+
+    assert result.candidate_messages == 3
+    assert result.sender_ids == ["u001", "u003", "u004"]
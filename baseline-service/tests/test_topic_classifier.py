@@ -1,11 +1,22 @@
 from __future__ import annotations
 
 import json
+import os
+import time
 from pathlib import Path
 
 from _pytest.monkeypatch import MonkeyPatch
 
-from app.topic_classifier import classify_topic
+from app.review_journal import ReviewJournal, review_journal_path
+from app.topic_classifier import (
+    TopicRulesRegistry,
+    classify_topic,
+    classify_topics,
+    reload_topic_rules,
+    reset_topic_cache,
+    topic_cache_stats,
+    topic_rules,
+)
 
 
 def test_topic_classifier_hr_compensation() -> None:
@@ -46,3 +57,107 @@ def test_topic_classifier_uses_json_rules_override(tmp_path: Path, monkeypatch:
     monkeypatch.setenv("TOPIC_RULES_FILE", str(rules_file))
     topic = classify_topic("please share roadmap", [])
     assert topic == "custom_topic"
+
+
+def test_topic_classifier_memo_is_invalidated_on_rules_reload(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    rules_file = tmp_path / "rules.json"
+
+    def write_rules(keyword: str, mtime: int) -> None:
+        rules_file.write_text(
+            json.dumps({"normal_threshold": 1, "topics": {"custom_topic": {"single_keywords": [keyword], "phrases": []}}}),
+            encoding="utf-8",
+        )
+        os.utime(rules_file, (mtime, mtime))
+
+    monkeypatch.setenv("TOPIC_RULES_FILE", str(rules_file))
+    write_rules("roadmap", 1_700_000_000)
+    before = topic_cache_stats()
+    assert classify_topic("please share roadmap", []) == "custom_topic"
+    assert classify_topic("please share roadmap", []) == "custom_topic"
+    after = topic_cache_stats()
+    assert after["misses"] - before["misses"] == 1
+    assert after["hits"] - before["hits"] == 1
+
+    write_rules("budget", 1_700_000_100)
+    assert classify_topic("please share roadmap", []) == "custom_topic"
+    reload_topic_rules()
+    assert classify_topic("please share roadmap", []) == "normal"
+    assert topic_cache_stats()["size"] == 1
+
+
+def test_reset_topic_cache_clears_entries_and_counters() -> None:
+    classify_topic("invoice payment wire transfer", [])
+    classify_topic("invoice payment wire transfer", [])
+
+    reset_topic_cache()
+
+    stats = topic_cache_stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (0, 0, 0)
+    classify_topic("invoice payment wire transfer", [])
+    assert topic_cache_stats()["misses"] == 1
+
+
+def test_rules_snapshot_is_stable_until_reload(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    rules_file = tmp_path / "rules.json"
+    rules_file.write_text(json.dumps({"topics": {"legal": {"single_keywords": ["contract"]}}}), encoding="utf-8")
+    monkeypatch.setenv("TOPIC_RULES_FILE", str(rules_file))
+    snapshot = topic_rules()
+    assert topic_rules() is snapshot
+    assert reload_topic_rules() is snapshot
+
+    rules_file.write_text(json.dumps({"topics": {"legal": {"single_keywords": ["contract", "clause"]}}}), encoding="utf-8")
+    os.utime(rules_file, ns=(1, 1))
+    assert topic_rules() is snapshot
+    reloaded = reload_topic_rules()
+    assert reloaded.version > snapshot.version
+    assert "clause" in reloaded.pattern_meta
+    assert "clause" not in snapshot.pattern_meta
+
+
+def test_rules_poller_picks_up_changes(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    rules_file = tmp_path / "rules.json"
+    rules_file.write_text(json.dumps({"topics": {"legal": {"single_keywords": ["contract"]}}}), encoding="utf-8")
+    monkeypatch.setenv("TOPIC_RULES_FILE", str(rules_file))
+    registry = TopicRulesRegistry()
+    first = registry.current()
+    registry.start_polling(0.01)
+    try:
+        rules_file.write_text(json.dumps({"topics": {"legal": {"single_keywords": ["clause"]}}}), encoding="utf-8")
+        os.utime(rules_file, ns=(1, 1))
+        deadline = time.monotonic() + 5
+        while registry.current() is first and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        registry.stop_polling()
+    assert "clause" in registry.current().pattern_meta
+
+
+def test_batch_classification_matches_single_calls() -> None:
+    batch = [
+        ("Payroll update for salary revision and bonus confirmation", []),
+        ("Please share customer list and phone number export", ["contacts_dump.csv"]),
+        ("Can we sync tomorrow morning?", ["notes.txt"]),
+    ]
+    result = classify_topics(batch, with_scores=True)
+    assert result.topics == [classify_topic(text, names) for text, names in batch]
+    assert result.scores is not None
+    assert result.scores[0][result.topic_names.index("hr_compensation")] >= 3
+    assert max(result.scores[2]) < 2
+
+
+def test_pending_review_journal_entries_are_applied_on_reload(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    rules_file = tmp_path / "rules.json"
+    rules_file.write_text(
+        json.dumps({"normal_threshold": 1, "topics": {"legal": {"single_keywords": ["contract"], "phrases": []}}}),
+        encoding="utf-8",
+    )
+    monkeypatch.setenv("TOPIC_RULES_FILE", str(rules_file))
+    assert classify_topic("renewal terms", [], reload_topic_rules()) == "normal"
+
+    journal = ReviewJournal(review_journal_path(rules_file))
+    journal.append([("legal", "keywords", "renewal", 1), ("legal", "keywords", "lunch", 2)])
+    rules = reload_topic_rules()
+
+    assert rules.topics["legal"] == (["contract", "renewal"], [])
+    assert classify_topic("renewal terms", [], rules) == "legal"
+    assert reload_topic_rules() is rules
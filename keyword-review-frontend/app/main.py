@@ -5,7 +5,7 @@ from pathlib import Path
 from typing import Any
 
 import httpx
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.responses import HTMLResponse
 from pydantic import BaseModel, Field
 
@@ -37,8 +37,14 @@ async def api_topics() -> dict[str, Any]:
 
 
 @app.get("/api/suggestions")
-async def api_suggestions(topic: str) -> dict[str, Any]:
-    return await _proxy_get(f"/v1/keywords/suggestions?topic={topic}")
+async def api_suggestions(
+    topic: str,
+    limit: int = Query(default=200, ge=1, le=1000),
+    offset: int = Query(default=0, ge=0),
+    prefix: str = "",
+) -> dict[str, Any]:
+    params = {"topic": topic, "limit": limit, "offset": offset, "prefix": prefix}
+    return await _proxy_get("/v1/keywords/suggestions", params)
 
 
 @app.post("/api/submit")
@@ -46,10 +52,10 @@ async def api_submit(payload: ReviewSubmitRequest) -> dict[str, Any]:
     return await _proxy_post("/v1/keywords/review", payload.model_dump())
 
 
-async def _proxy_get(path: str) -> dict[str, Any]:
+async def _proxy_get(path: str, params: dict[str, Any] | None = None) -> dict[str, Any]:
     url = f"{BASELINE_SERVICE_URL.rstrip('/')}{path}"
     async with httpx.AsyncClient(timeout=10.0) as client:
-        response = await client.get(url)
+        response = await client.get(url, params=params)
     if response.status_code >= 400:
         raise HTTPException(status_code=response.status_code, detail=response.text)
     raw = response.json()
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import json
+import mmap
+import struct
+from pathlib import Path
+from typing import Any
+
+INDEXED_MAGIC = b"BLIDX\x00\x00\x01"
+INDEXED_HEADER = struct.Struct("<8sQQ")
+
+
+class IndexedBaselineReader:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with path.open("rb") as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, index_offset, index_length = INDEXED_HEADER.unpack_from(self._map, 0)
+            if magic != INDEXED_MAGIC or index_offset == 0:
+                raise ValueError(f"{path} is not a complete indexed baseline")
+            index = json.loads(self._map[index_offset : index_offset + index_length])
+        except Exception:
+            self._map.close()
+            raise
+        meta = index.get("meta", {}) if isinstance(index, dict) else {}
+        users = index.get("users", {}) if isinstance(index, dict) else {}
+        self.meta: dict[str, Any] = meta if isinstance(meta, dict) else {}
+        self._index: dict[str, tuple[int, int]] = {}
+        if isinstance(users, dict):
+            for user_id, entry in users.items():
+                if isinstance(entry, list) and len(entry) == 2:
+                    self._index[str(user_id)] = (int(entry[0]), int(entry[1]))
+
+    def __contains__(self, user_id: object) -> bool:
+        return user_id in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def get(self, user_id: str) -> dict[str, Any] | None:
+        entry = self._index.get(user_id)
+        if entry is None:
+            return None
+        offset, length = entry
+        payload = json.loads(self._map[offset : offset + length])
+        return payload if isinstance(payload, dict) else None
+
+    def close(self) -> None:
+        self._map.close()
+
+
+def is_indexed_baseline(path: Path) -> bool:
+    try:
+        with path.open("rb") as handle:
+            return handle.read(len(INDEXED_MAGIC)) == INDEXED_MAGIC
+    except OSError:
+        return False
@@ -1,38 +1,81 @@
 from __future__ import annotations
 
 import json
+import logging
 import threading
+from collections import OrderedDict
 from pathlib import Path
 from typing import Any
 
+from app.baseline_reader import IndexedBaselineReader, is_indexed_baseline
+from app.topic_classifier import CompiledClassifier, load_classifier_artifact
+
+LOGGER = logging.getLogger(__name__)
+
+POINTER_NAME = "CURRENT"
+
 
 class BaselineStore:
-    def __init__(self, baseline_path: Path) -> None:
+    def __init__(
+        self,
+        baseline_path: Path,
+        hot_sender_limit: int = 1024,
+        snapshot_dir: Path | None = None,
+        classifier_artifact: Path | None = None,
+    ) -> None:
         self._path = baseline_path
+        self._snapshot_dir = snapshot_dir
+        self._classifier_artifact = classifier_artifact
         self._lock = threading.Lock()
         self._payload: dict[str, Any] = {"meta": {}, "users": {}}
+        self._reader: IndexedBaselineReader | None = None
+        self._generation: int | None = None
+        self._loaded = False
+        self._hot_senders: OrderedDict[str, dict[str, Any] | None] = OrderedDict()
+        self._hot_sender_limit = max(hot_sender_limit, 1)
+        self._reload_lock = threading.Lock()
+        self._reload_pending = False
+        self._reload_thread: threading.Thread | None = None
 
     def load(self) -> None:
         self.reload()
 
     def reload(self) -> None:
+        path, generation = self._resolve_path()
+        payload, reader = _load_baseline(path, allow_missing=not self._loaded)
         with self._lock:
-            if not self._path.exists():
-                self._payload = {"meta": {}, "users": {}}
-                return
-            raw = json.loads(self._path.read_text(encoding="utf-8"))
-            if not isinstance(raw, dict):
-                self._payload = {"meta": {}, "users": {}}
-                return
-            users = raw.get("users", {})
-            meta = raw.get("meta", {})
-            self._payload = {
-                "meta": meta if isinstance(meta, dict) else {},
-                "users": users if isinstance(users, dict) else {},
-            }
+            previous = self._reader
+            self._payload = payload
+            self._reader = reader
+            self._generation = generation
+            self._loaded = True
+            self._hot_senders.clear()
+            if previous is not None:
+                previous.close()
+        self.refresh_classifier()
+
+    def refresh_classifier(self) -> CompiledClassifier:
+        return load_classifier_artifact(self._classifier_artifact)
+
+    def reload_in_background(self) -> bool:
+        with self._reload_lock:
+            self._reload_pending = True
+            if self._reload_thread is not None:
+                return False
+            self._reload_thread = threading.Thread(target=self._reload_worker, name="baseline-reload", daemon=True)
+            self._reload_thread.start()
+            return True
+
+    def wait_for_reload(self, timeout: float | None = None) -> None:
+        with self._reload_lock:
+            thread = self._reload_thread
+        if thread is not None:
+            thread.join(timeout)
 
     def get_sender_baseline(self, sender_user_id: str) -> dict[str, Any] | None:
         with self._lock:
+            if self._reader is not None:
+                return self._get_indexed(self._reader, sender_user_id)
             users = self._payload.get("users", {})
             if not isinstance(users, dict):
                 return None
@@ -43,6 +86,8 @@ class BaselineStore:
 
     def user_count(self) -> int:
         with self._lock:
+            if self._reader is not None:
+                return len(self._reader)
             users = self._payload.get("users", {})
             return len(users) if isinstance(users, dict) else 0
 
@@ -50,3 +95,64 @@ class BaselineStore:
         with self._lock:
             meta = self._payload.get("meta", {})
             return dict(meta) if isinstance(meta, dict) else {}
+
+    def generation(self) -> int | None:
+        with self._lock:
+            return self._generation
+
+    def _reload_worker(self) -> None:
+        while True:
+            with self._reload_lock:
+                if not self._reload_pending:
+                    self._reload_thread = None
+                    return
+                self._reload_pending = False
+            try:
+                self.reload()
+                LOGGER.info("Reloaded baseline generation %s", self.generation())
+            except Exception:
+                LOGGER.exception("Background baseline reload failed")
+
+    def _resolve_path(self) -> tuple[Path, int | None]:
+        if self._snapshot_dir is None:
+            return self._path, None
+        try:
+            pointer = json.loads((self._snapshot_dir / POINTER_NAME).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return self._path, None
+        if not isinstance(pointer, dict) or not isinstance(pointer.get("file"), str):
+            return self._path, None
+        generation = pointer.get("generation")
+        path = self._snapshot_dir / Path(pointer["file"]).name
+        return path, generation if isinstance(generation, int) else None
+
+    def _get_indexed(self, reader: IndexedBaselineReader, sender_user_id: str) -> dict[str, Any] | None:
+        if sender_user_id in self._hot_senders:
+            self._hot_senders.move_to_end(sender_user_id)
+            return self._hot_senders[sender_user_id]
+        if sender_user_id not in reader:
+            return None
+        baseline = reader.get(sender_user_id)
+        self._hot_senders[sender_user_id] = baseline
+        if len(self._hot_senders) > self._hot_sender_limit:
+            self._hot_senders.popitem(last=False)
+        return baseline
+
+
+def _load_baseline(path: Path, allow_missing: bool) -> tuple[dict[str, Any], IndexedBaselineReader | None]:
+    if not path.exists():
+        if not allow_missing:
+            raise FileNotFoundError(f"Baseline {path} does not exist")
+        return {"meta": {}, "users": {}}, None
+    if is_indexed_baseline(path):
+        reader = IndexedBaselineReader(path)
+        return {"meta": reader.meta, "users": {}}, reader
+    raw = json.loads(path.read_text(encoding="utf-8"))
+    if not isinstance(raw, dict):
+        raise ValueError(f"Baseline {path} is not a JSON object")
+    users = raw.get("users", {})
+    meta = raw.get("meta", {})
+    return {
+        "meta": meta if isinstance(meta, dict) else {},
+        "users": users if isinstance(users, dict) else {},
+    }, None
@@ -9,8 +9,9 @@ from fastapi import FastAPI
 from app.baseline_store import BaselineStore
 from app.explanations import build_allow_explanation, build_fallback_explanation
 from app.llm_explainer import LLMExplainer, LLMExplainerConfig
-from app.models import PreSendCheckRequest, PreSendCheckResponse
+from app.models import BaselineNotification, PreSendCheckRequest, PreSendCheckResponse
 from app.scoring import evaluate_pre_send
+from app.topic_classifier import active_classifier, topic_cache_stats
 from app.user_directory import UserDirectory
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
@@ -18,11 +19,21 @@ LOGGER = logging.getLogger(__name__)
 
 GRAPH_BASE_URL = os.getenv("GRAPH_BASE_URL", "http://127.0.0.1:8000")
 BASELINE_PATH = Path(os.getenv("BASELINE_PATH", "./baseline.json")).resolve()
+BASELINE_HOT_SENDERS = int(os.getenv("BASELINE_HOT_SENDERS", "1024"))
+BASELINE_SNAPSHOT_DIR = Path(os.environ["BASELINE_SNAPSHOT_DIR"]).resolve() if os.getenv("BASELINE_SNAPSHOT_DIR") else None
+TOPIC_CLASSIFIER_ARTIFACT = Path(
+    os.getenv("TOPIC_CLASSIFIER_ARTIFACT", str(BASELINE_PATH.parent / "topic_classifier.pkl"))
+).resolve()
 USE_LLM_EXPLAINER = os.getenv("USE_LLM_EXPLAINER", "false").lower() == "true"
 LLM_EXPLAINER_URL = os.getenv("LLM_EXPLAINER_URL", "http://127.0.0.1:8030")
 
 app = FastAPI(title="Misdelivery Detection Service", version="1.0.0")
-app.state.baseline_store = BaselineStore(BASELINE_PATH)
+app.state.baseline_store = BaselineStore(
+    BASELINE_PATH,
+    hot_sender_limit=BASELINE_HOT_SENDERS,
+    snapshot_dir=BASELINE_SNAPSHOT_DIR,
+    classifier_artifact=TOPIC_CLASSIFIER_ARTIFACT,
+)
 app.state.user_directory = UserDirectory(base_url=GRAPH_BASE_URL)
 app.state.llm_explainer = LLMExplainer(
     LLMExplainerConfig(
@@ -50,7 +61,10 @@ def health() -> dict:
         "status": "ok",
         "baseline_path": str(BASELINE_PATH),
         "baseline_user_count": baseline_store.user_count(),
+        "baseline_generation": baseline_store.generation(),
         "directory_user_count": user_directory.count(),
+        "topic_classifier_version": active_classifier().version,
+        "topic_cache": topic_cache_stats(),
     }
 
 
@@ -61,10 +75,22 @@ def reload_baseline() -> dict:
     return {
         "status": "reloaded",
         "baseline_user_count": baseline_store.user_count(),
+        "baseline_generation": baseline_store.generation(),
+        "topic_classifier_version": active_classifier().version,
         "meta": baseline_store.meta(),
     }
 
 
+@app.post("/v1/baseline/notify", status_code=202)
+def notify_baseline(payload: BaselineNotification) -> dict:
+    baseline_store: BaselineStore = app.state.baseline_store
+    if payload.generation is not None and payload.generation == baseline_store.generation():
+        baseline_store.refresh_classifier()
+        return {"status": "current", "baseline_generation": payload.generation}
+    started = baseline_store.reload_in_background()
+    return {"status": "scheduled" if started else "coalesced", "baseline_generation": baseline_store.generation()}
+
+
 @app.post("/v1/users/reload")
 async def reload_users() -> dict:
     user_directory: UserDirectory = app.state.user_directory
@@ -43,3 +43,7 @@ class PreSendCheckResponse(BaseModel):
     signals: dict[str, Any]
     explanation: str
     confusion_candidates: list[ConfusionCandidate]
+
+
+class BaselineNotification(BaseModel):
+    generation: int | None = None
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import hashlib
+from statistics import median
+from typing import Any
+
+
+def estimate_count(sketch: dict[str, Any], item: str) -> int:
+    width = _as_int(sketch.get("width"))
+    depth = _as_int(sketch.get("depth"))
+    total = _as_int(sketch.get("total"))
+    rows = sketch.get("rows")
+    if width < 2 or depth < 1 or not isinstance(rows, list) or len(rows) < depth:
+        return 0
+    try:
+        cells = [int(rows[row][index]) for row, index in enumerate(bucket_indexes(item, width, depth))]
+    except (IndexError, TypeError, ValueError):
+        return 0
+    # Count-Mean-Min: subtract each row's expected collision noise and take the median,
+    # capped by the plain Count-Min upper bound.
+    debiased = [cell - (total - cell) / (width - 1) for cell in cells]
+    return max(0, min(min(cells), round(median(debiased))))
+
+
+def bucket_indexes(item: str, width: int, depth: int) -> list[int]:
+    digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+    first = int.from_bytes(digest[:8], "little")
+    second = int.from_bytes(digest[8:], "little") | 1
+    return [(first + row * second) % width for row in range(depth)]
+
+
+def _as_int(value: Any) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
@@ -7,6 +7,7 @@ from typing import Any
 from app.attachment_utils import detect_attachment_kind
 from app.models import AttachmentInput, ConfusionCandidate, PreSendCheckRequest
 from app.name_similarity import SimilarityCandidate, normalized_similarity
+from app.recipient_sketch import estimate_count
 from app.topic_classifier import SENSITIVE_TOPICS, classify_topic
 from app.user_directory import UserDirectory, UserRecord
 
@@ -46,6 +47,7 @@ def evaluate_pre_send(
 
     sender_known = set(_safe_list(sender_baseline, "known_participants")) if sender_baseline else set()
     topic_recipient_counts = _safe_nested(sender_baseline, "topic_recipient_counts") if sender_baseline else {}
+    topic_recipient_sketches = _safe_nested(sender_baseline, "topic_recipient_sketches") if sender_baseline else {}
     topic_external_counts = _safe_nested(sender_baseline, "topic_external_domain_counts") if sender_baseline else {}
     known_external_domains = set(_safe_list(sender_baseline, "known_external_domains")) if sender_baseline else set()
 
@@ -54,7 +56,7 @@ def evaluate_pre_send(
 
     for record in recipient_records:
         expected_by_sender = record.user_id in sender_known if record.user_id else False
-        expected_by_topic = _expected_by_topic(record.user_id, topic, topic_recipient_counts)
+        expected_by_topic = _expected_by_topic(record.user_id, topic, topic_recipient_counts, topic_recipient_sketches)
         recipient_unexpected = (not expected_by_sender) or (topic != "normal" and not expected_by_topic)
         if recipient_unexpected:
             unexpected_recipients.append(record)
@@ -200,7 +202,12 @@ def _is_external(domain: str, user_type: str) -> bool:
     return user_type == "Guest" or (domain != "" and domain != COMPANY_DOMAIN)
 
 
-def _expected_by_topic(recipient_id: str | None, topic: str, topic_recipient_counts: dict[str, Any]) -> bool:
+def _expected_by_topic(
+    recipient_id: str | None,
+    topic: str,
+    topic_recipient_counts: dict[str, Any],
+    topic_recipient_sketches: dict[str, Any] | None = None,
+) -> bool:
     if recipient_id is None:
         return False
     if not isinstance(topic_recipient_counts, dict):
@@ -208,7 +215,14 @@ def _expected_by_topic(recipient_id: str | None, topic: str, topic_recipient_cou
     topic_map = topic_recipient_counts.get(topic, {})
     if not isinstance(topic_map, dict):
         return False
-    return int(topic_map.get(recipient_id, 0)) >= MIN_TOPIC_COUNT
+    if recipient_id in topic_map:
+        return int(topic_map.get(recipient_id, 0)) >= MIN_TOPIC_COUNT
+
+    # Approximate baselines keep only heavy hitters exactly; everyone else is estimated from the sketch.
+    sketch = topic_recipient_sketches.get(topic) if isinstance(topic_recipient_sketches, dict) else None
+    if not isinstance(sketch, dict):
+        return False
+    return estimate_count(sketch, recipient_id) >= MIN_TOPIC_COUNT
 
 
 def _safe_list(sender_baseline: dict[str, Any] | None, key: str) -> list[str]:
@@ -1,12 +1,24 @@
 from __future__ import annotations
 
+import hashlib
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
 from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
 from typing import Any
 try:
     import ahocorasick
 except ModuleNotFoundError:  # pragma: no cover
     ahocorasick = None  # type: ignore[assignment]
 
+LOGGER = logging.getLogger(__name__)
+
+ARTIFACT_FORMAT = 1
+
 TOPIC_KEYWORDS: dict[str, tuple[list[str], list[str]]] = {
     "hr_compensation": (
         [
@@ -87,27 +99,214 @@ if ahocorasick is not None:
     MATCHER = automaton
 
 
+@dataclass(frozen=True)
+class CompiledClassifier:
+    version: str
+    topics: tuple[str, ...]
+    pattern_meta: dict[str, tuple[str, int]]
+    matcher: Any
+    normal_threshold: int
+    min_total_signal: int | None = None
+    pattern_slots: dict[str, tuple[int, int]] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        slots = {topic: slot for slot, topic in enumerate(self.topics)}
+        pattern_slots = {pattern: (slots[topic], weight) for pattern, (topic, weight) in self.pattern_meta.items()}
+        object.__setattr__(self, "pattern_slots", pattern_slots)
+
+
+@dataclass
+class TopicBatch:
+    topic_names: tuple[str, ...]
+    topics: list[str] = field(default_factory=list)
+    scores: list[list[int]] | None = None
+
+
+BUILTIN_CLASSIFIER = CompiledClassifier(
+    version="builtin",
+    topics=tuple(TOPIC_KEYWORDS),
+    pattern_meta=PATTERN_META,
+    matcher=MATCHER,
+    normal_threshold=2,
+    min_total_signal=2,
+)
+
+
+class ClassificationMemo:
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max(max_entries, 0)
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple[str, bytes], str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple[str, bytes]) -> str | None:
+        with self._lock:
+            topic = self._entries.get(key)
+            if topic is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return topic
+
+    def put(self, key: tuple[str, bytes], topic: str) -> None:
+        if self.max_entries == 0:
+            return
+        with self._lock:
+            self._entries[key] = topic
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int | float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+_MEMO = ClassificationMemo(int(os.getenv("TOPIC_CLASSIFIER_CACHE_SIZE", "4096") or "0"))
+_ACTIVE = BUILTIN_CLASSIFIER
+_ARTIFACT_SIGNATURE: tuple[int, int, int] | None = None
+_LOAD_LOCK = threading.Lock()
+
+
 def classify_topic(message_text: str, attachment_names: Iterable[str]) -> str:
-    text = f"{message_text} {' '.join(attachment_names)}".lower()
-    scores: dict[str, int] = {topic: 0 for topic in TOPIC_KEYWORDS}
+    classifier = _ACTIVE
+    names = list(attachment_names)
+    key = (classifier.version, _content_key(message_text, names))
+    topic = _MEMO.get(key)
+    if topic is None:
+        topic = _score(classifier, message_text, names, [0] * len(classifier.topics), set())
+        _MEMO.put(key, topic)
+    return topic
+
+
+def classify_topics(batch: Iterable[tuple[str, Iterable[str]]], with_scores: bool = False) -> TopicBatch:
+    classifier = _ACTIVE
+    result = TopicBatch(topic_names=classifier.topics, scores=[] if with_scores else None)
+    scores = [0] * len(classifier.topics)
     seen_patterns: set[str] = set()
+    for message_text, attachment_names in batch:
+        names = list(attachment_names)
+        if result.scores is not None:
+            result.topics.append(_score(classifier, message_text, names, scores, seen_patterns))
+            result.scores.append(scores.copy())
+            continue
+        key = (classifier.version, _content_key(message_text, names))
+        topic = _MEMO.get(key)
+        if topic is None:
+            topic = _score(classifier, message_text, names, scores, seen_patterns)
+            _MEMO.put(key, topic)
+        result.topics.append(topic)
+    return result
+
+
+def active_classifier() -> CompiledClassifier:
+    return _ACTIVE
+
+
+def load_classifier_artifact(path: Path | None) -> CompiledClassifier:
+    with _LOAD_LOCK:
+        try:
+            stat = path.stat() if path is not None else None
+        except FileNotFoundError:
+            stat = None
+        if stat is None:
+            if _ACTIVE is not BUILTIN_CLASSIFIER:
+                LOGGER.info("Topic classifier artifact is gone; using built-in rules")
+                _activate(BUILTIN_CLASSIFIER, None)
+            return _ACTIVE
+        signature = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if signature == _ARTIFACT_SIGNATURE:
+            return _ACTIVE
+        try:
+            classifier = _read_artifact(path)
+        except Exception:
+            LOGGER.exception("Could not load topic classifier artifact %s; keeping %s", path, _ACTIVE.version)
+            return _ACTIVE
+        _activate(classifier, signature)
+        LOGGER.info("Loaded topic classifier %s (%d patterns) from %s", classifier.version, len(classifier.pattern_meta), path)
+        return _ACTIVE
+
+
+def topic_cache_stats() -> dict[str, int | float]:
+    return _MEMO.stats()
+
 
-    if MATCHER is not None:
-        for _, pattern in MATCHER.iter(text):
+def _content_key(message_text: str, attachment_names: list[str]) -> bytes:
+    digest = hashlib.blake2b(message_text.encode("utf-8"), digest_size=16)
+    for name in attachment_names:
+        digest.update(b"\x00")
+        digest.update(name.encode("utf-8"))
+    return digest.digest()
+
+
+def _activate(classifier: CompiledClassifier, signature: tuple[int, int, int] | None) -> None:
+    global _ACTIVE, _ARTIFACT_SIGNATURE
+    _ACTIVE = classifier
+    _ARTIFACT_SIGNATURE = signature
+    _MEMO.clear()
+
+
+def _read_artifact(path: Path) -> CompiledClassifier:
+    with path.open("rb") as handle:
+        raw = pickle.load(handle)
+    if not isinstance(raw, dict) or raw.get("format") != ARTIFACT_FORMAT:
+        raise ValueError(f"Unsupported topic classifier artifact format in {path}")
+    pattern_meta = {str(pattern): (str(topic), int(weight)) for pattern, (topic, weight) in raw["pattern_meta"].items()}
+    matcher = raw.get("matcher")
+    if matcher is None and ahocorasick is not None:
+        matcher = ahocorasick.Automaton()
+        for pattern in pattern_meta:
+            matcher.add_word(pattern, pattern)
+        matcher.make_automaton()
+    return CompiledClassifier(
+        version=str(raw["version"]),
+        topics=tuple(str(topic) for topic in raw["topics"]),
+        pattern_meta=pattern_meta,
+        matcher=matcher if ahocorasick is not None else None,
+        normal_threshold=int(raw["normal_threshold"]),
+    )
+
+
+def _score(
+    classifier: CompiledClassifier,
+    message_text: str,
+    attachment_names: list[str],
+    scores: list[int],
+    seen_patterns: set[str],
+) -> str:
+    text = f"{message_text} {' '.join(attachment_names)}".lower()
+    for slot in range(len(scores)):
+        scores[slot] = 0
+    seen_patterns.clear()
+
+    if classifier.matcher is not None:
+        for _, pattern in classifier.matcher.iter(text):
             seen_patterns.add(str(pattern))
     else:
-        for pattern in PATTERN_META:
+        for pattern in classifier.pattern_meta:
             if pattern in text:
                 seen_patterns.add(pattern)
 
     for pattern in seen_patterns:
-        topic, weight = PATTERN_META[pattern]
-        scores[topic] += weight
-
-    best_topic = max(scores, key=scores.get)
-    total_signal = sum(scores.values())
-    if scores[best_topic] >= 2:
-        return best_topic
-    if total_signal >= 2:
-        return best_topic
+        slot, weight = classifier.pattern_slots[pattern]
+        scores[slot] += weight
+
+    best = max(range(len(scores)), key=scores.__getitem__)
+    if scores[best] >= classifier.normal_threshold:
+        return classifier.topics[best]
+    if classifier.min_total_signal is not None and sum(scores) >= classifier.min_total_signal:
+        return classifier.topics[best]
     return "normal"
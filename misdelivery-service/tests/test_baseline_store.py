@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import json
+import struct
+import threading
+from pathlib import Path
+
+import pytest
+
+from app.baseline_reader import INDEXED_HEADER, INDEXED_MAGIC
+from app.baseline_store import BaselineStore
+
+
+def write_indexed(path: Path, meta: dict, users: dict[str, dict]) -> None:
+    body = bytearray(INDEXED_HEADER.size)
+    index: dict[str, list[int]] = {}
+    for user_id, payload in users.items():
+        record = json.dumps(payload).encode("utf-8")
+        body += struct.pack("<I", len(record))
+        index[user_id] = [len(body), len(record)]
+        body += record
+    index_bytes = json.dumps({"meta": meta, "users": index}).encode("utf-8")
+    body[: INDEXED_HEADER.size] = INDEXED_HEADER.pack(INDEXED_MAGIC, len(body), len(index_bytes))
+    path.write_bytes(bytes(body) + index_bytes)
+
+
+def test_json_baseline_is_loaded(tmp_path: Path) -> None:
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps({"meta": {"days": 35}, "users": {"u001": {"rare_topics": []}}}), encoding="utf-8")
+    store = BaselineStore(path)
+    store.load()
+
+    assert store.user_count() == 1
+    assert store.meta() == {"days": 35}
+    assert store.get_sender_baseline("u001") == {"rare_topics": []}
+    assert store.get_sender_baseline("u404") is None
+
+
+def test_indexed_baseline_is_decoded_lazily_with_bounded_cache(tmp_path: Path) -> None:
+    path = tmp_path / "baseline.bin"
+    users = {f"u{index:03d}": {"recipient_mean": float(index)} for index in range(5)}
+    write_indexed(path, {"days": 35, "user_count": 5}, users)
+    store = BaselineStore(path, hot_sender_limit=2)
+    store.load()
+
+    assert store.user_count() == 5
+    assert store.meta()["user_count"] == 5
+    assert store.get_sender_baseline("u003") == {"recipient_mean": 3.0}
+    assert store.get_sender_baseline("u001") == {"recipient_mean": 1.0}
+    assert store.get_sender_baseline("u004") == {"recipient_mean": 4.0}
+    assert list(store._hot_senders) == ["u001", "u004"]
+    assert store.get_sender_baseline("u404") is None
+
+
+def test_store_follows_snapshot_pointer_and_keeps_data_on_failed_reload(tmp_path: Path) -> None:
+    fallback = tmp_path / "baseline.json"
+    fallback.write_text(json.dumps({"meta": {}, "users": {"u001": {"source": "legacy"}}}), encoding="utf-8")
+    snapshots = tmp_path / "snapshots"
+    snapshots.mkdir()
+    (snapshots / "baseline-000002.json").write_text(
+        json.dumps({"meta": {"days": 35}, "users": {"u001": {"source": "gen2"}}}), encoding="utf-8"
+    )
+    store = BaselineStore(fallback, snapshot_dir=snapshots)
+
+    store.load()
+    assert store.generation() is None
+    assert store.get_sender_baseline("u001") == {"source": "legacy"}
+
+    (snapshots / "CURRENT").write_text(json.dumps({"generation": 2, "file": "baseline-000002.json"}), encoding="utf-8")
+    store.reload()
+    assert store.generation() == 2
+    assert store.get_sender_baseline("u001") == {"source": "gen2"}
+
+    (snapshots / "CURRENT").write_text(json.dumps({"generation": 3, "file": "baseline-000003.bin"}), encoding="utf-8")
+    (snapshots / "baseline-000003.bin").write_bytes(b"BLIDX\x00\x00\x01truncated")
+    with pytest.raises(Exception):
+        store.reload()
+    assert store.generation() == 2
+    assert store.get_sender_baseline("u001") == {"source": "gen2"}
+
+
+def test_pointer_to_missing_snapshot_keeps_previous_generation(tmp_path: Path) -> None:
+    snapshots = tmp_path / "snapshots"
+    snapshots.mkdir()
+    (snapshots / "baseline-000002.json").write_text(
+        json.dumps({"meta": {}, "users": {"u001": {"source": "gen2"}}}), encoding="utf-8"
+    )
+    (snapshots / "CURRENT").write_text(json.dumps({"generation": 2, "file": "baseline-000002.json"}), encoding="utf-8")
+    store = BaselineStore(tmp_path / "baseline.json", snapshot_dir=snapshots)
+    store.load()
+
+    (snapshots / "CURRENT").write_text(json.dumps({"generation": 3, "file": "baseline-000003.json"}), encoding="utf-8")
+    with pytest.raises(FileNotFoundError):
+        store.reload()
+
+    assert store.generation() == 2
+    assert store.user_count() == 1
+    assert store.get_sender_baseline("u001") == {"source": "gen2"}
+
+
+def test_missing_baseline_is_empty_only_at_startup(tmp_path: Path) -> None:
+    store = BaselineStore(tmp_path / "baseline.json")
+
+    store.load()
+
+    assert store.user_count() == 0
+    with pytest.raises(FileNotFoundError):
+        store.reload()
+
+
+def test_background_reloads_are_coalesced(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps({"meta": {}, "users": {"u001": {"version": 1}}}), encoding="utf-8")
+    store = BaselineStore(path)
+    store.load()
+
+    started = threading.Event()
+    release = threading.Event()
+    calls: list[int] = []
+    original_reload = store.reload
+
+    def slow_reload() -> None:
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        original_reload()
+
+    monkeypatch.setattr(store, "reload", slow_reload)
+    path.write_text(json.dumps({"meta": {}, "users": {"u001": {"version": 2}}}), encoding="utf-8")
+
+    assert store.reload_in_background() is True
+    assert started.wait(5)
+    assert store.reload_in_background() is False
+    assert store.reload_in_background() is False
+    release.set()
+    store.wait_for_reload(5)
+
+    assert len(calls) == 2
+    assert store.get_sender_baseline("u001") == {"version": 2}
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 from app.models import AttachmentInput, PreSendCheckRequest, RecipientInput
-from app.scoring import evaluate_pre_send
+from app.recipient_sketch import bucket_indexes
+from app.scoring import _expected_by_topic, evaluate_pre_send
 from app.user_directory import UserDirectory, UserRecord
 
 
@@ -91,3 +92,18 @@ def test_block_when_confusion_sensitive_external() -> None:
     assert result.signals["confusion_detected"] is True
     assert len(result.confusion_candidates) >= 1
     assert "name_confusion_possible" in result.reasons
+
+
+def test_sketched_topic_counts_are_read_from_heavy_hitters_and_sketch() -> None:
+    width, depth = 64, 4
+    rows = [[0] * width for _ in range(depth)]
+    for recipient, count in {"u003": 6, "u002": 1}.items():
+        for row, index in enumerate(bucket_indexes(recipient, width, depth)):
+            rows[row][index] += count
+    topic_recipient_counts = {"finance": {"u003": 6}}
+    topic_recipient_sketches = {"finance": {"width": width, "depth": depth, "total": 7, "rows": rows}}
+
+    assert _expected_by_topic("u003", "finance", topic_recipient_counts, topic_recipient_sketches)
+    assert not _expected_by_topic("u002", "finance", topic_recipient_counts, topic_recipient_sketches)
+    assert not _expected_by_topic("u099", "finance", topic_recipient_counts, topic_recipient_sketches)
+    assert not _expected_by_topic("u003", "legal", topic_recipient_counts, topic_recipient_sketches)
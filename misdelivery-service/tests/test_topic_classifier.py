@@ -1,4 +1,16 @@
-from app.topic_classifier import classify_topic
+import pickle
+from pathlib import Path
+
+import ahocorasick
+
+from app.topic_classifier import (
+    BUILTIN_CLASSIFIER,
+    ClassificationMemo,
+    classify_topic,
+    classify_topics,
+    load_classifier_artifact,
+    topic_cache_stats,
+)
 
 
 def test_finance_topic_detected() -> None:
@@ -14,3 +26,72 @@ def test_normal_when_low_score() -> None:
 def test_mixed_signals_not_normal() -> None:
     topic = classify_topic("Please review payroll and invoice before release", [])
     assert topic in {"hr_compensation", "finance", "technical"}
+
+
+def test_repeated_messages_hit_the_memo() -> None:
+    before = topic_cache_stats()
+    first = classify_topic("Quarterly invoice for purchase order 1182", ["invoice.pdf"])
+    second = classify_topic("Quarterly invoice for purchase order 1182", ["invoice.pdf"])
+    after = topic_cache_stats()
+    assert first == second == "finance"
+    assert after["hits"] - before["hits"] == 1
+
+
+def test_memo_evicts_least_recently_used() -> None:
+    memo = ClassificationMemo(max_entries=2)
+    memo.put((1, b"a"), "finance")
+    memo.put((1, b"b"), "legal")
+    assert memo.get((1, b"a")) == "finance"
+    memo.put((1, b"c"), "normal")
+    assert memo.get((1, b"b")) is None
+    assert memo.get((1, b"a")) == "finance"
+    assert memo.stats()["size"] == 2
+
+
+def write_artifact(path: Path, version: str, pattern_meta: dict[str, tuple[str, int]], threshold: int = 1) -> None:
+    matcher = ahocorasick.Automaton()
+    for pattern in pattern_meta:
+        matcher.add_word(pattern, pattern)
+    matcher.make_automaton()
+    artifact = {
+        "format": 1,
+        "version": version,
+        "normal_threshold": threshold,
+        "topics": sorted({topic for topic, _ in pattern_meta.values()}),
+        "pattern_meta": pattern_meta,
+        "matcher": matcher,
+    }
+    path.write_bytes(pickle.dumps(artifact))
+
+
+def test_classifier_artifact_replaces_builtin_rules(tmp_path: Path) -> None:
+    artifact = tmp_path / "topic_classifier.pkl"
+    write_artifact(artifact, "abc123", {"roadmap": ("planning", 1), "invoice": ("finance", 1)})
+    try:
+        assert load_classifier_artifact(artifact).version == "abc123"
+        assert classify_topic("please share the roadmap", []) == "planning"
+        assert classify_topic("Can we sync later", ["notes.txt"]) == "normal"
+
+        artifact.write_bytes(b"not a pickle")
+        assert load_classifier_artifact(artifact).version == "abc123"
+
+        artifact.unlink()
+        assert load_classifier_artifact(artifact) is BUILTIN_CLASSIFIER
+        assert classify_topic("please share the roadmap", []) == "normal"
+    finally:
+        load_classifier_artifact(None)
+
+
+def test_batch_classification_matches_single_calls() -> None:
+    batch = [
+        ("Please review invoice and payment status", []),
+        ("Can we sync later", ["notes.txt"]),
+        ("Rotate the api key and ssh password", ["creds.pem"]),
+    ]
+    result = classify_topics(batch, with_scores=True)
+    assert result.topics == [classify_topic(text, names) for text, names in batch]
+    assert result.scores is not None
+    finance = result.topic_names.index("finance")
+    assert result.scores[0][finance] == 2
+    assert sum(result.scores[1]) == 0
+    assert classify_topics(batch).scores is None